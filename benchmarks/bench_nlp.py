@@ -0,0 +1,73 @@
+"""
+Benchmark: per-query intent matching cost as the menu and FAQ grow.
+
+Compares the compiled IntentMatcher with the previous approach (normalize
+the query again for every rule, substring-scan every keyword, then loop
+over every dish).
+
+Usage:
+    python benchmarks/bench_nlp.py
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.nlp.matcher import Intent, IntentMatcher
+from src.nlp.processor import INTENT_TABLE
+
+QUERIES = [
+    "dzień dobry co polecacie",
+    "ile kosztuje karkandak z mięsem",
+    "a gdzie was można znaleźć",
+    "jakie macie godziny otwarcia w weekend",
+    "poproszę coś słodkiego dla dziecka",
+    "czy jest dowóz na osiedle",
+]
+
+
+def synthetic_intents(dishes, faq):
+    rng = random.Random(dishes * 7919 + faq)
+    word = lambda: "".join(rng.choice("abcdefghijklmnoprstuwyz") for _ in range(rng.randint(5, 10)))
+    intents = []
+    for entry in INTENT_TABLE:
+        if entry == 'dishes':
+            intents += [Intent('dish', (f"karkandak z {word()}",)) for _ in range(dishes)]
+        else:
+            intents.append(entry)
+    intents += [Intent(f'faq_{i}', tuple(word() for _ in range(4))) for i in range(faq)]
+    return intents
+
+
+def linear_match(intents, query):
+    """The old if/elif chain: re-normalize per rule, scan every keyword."""
+    for intent in intents:
+        text = re.sub(r'[^\w\s]', '', query.lower()).strip()
+        if any(k in text for k in intent.keywords) and not any(k in text for k in intent.excludes):
+            return intent
+    return None
+
+
+def per_query_us(fn, repeat=2000):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(QUERIES[i % len(QUERIES)])
+    return 1e6 * (time.perf_counter() - start) / repeat
+
+
+def main():
+    print(f"{'dania':>6} {'faq':>6} {'słowa':>7} {'liniowo µs':>11} {'automat µs':>11}")
+    for dishes, faq in [(7, 0), (50, 50), (200, 200), (1000, 1000)]:
+        intents = synthetic_intents(dishes, faq)
+        matcher = IntentMatcher(intents)
+        keywords = len(matcher.automaton.keywords)
+        linear = per_query_us(lambda q: linear_match(intents, q), repeat=300)
+        compiled = per_query_us(matcher.match)
+        print(f"{dishes:>6} {faq:>6} {keywords:>7} {linear:>11.1f} {compiled:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: idle CPU of the wake phrase detector against WAKE_CPU_BUDGET.
+
+Streams simulated fair-floor audio through WakeWordDetector with the real
+keyword recognizer, faster than real time: hall noise, with the corpus
+recordings (people talking next to the stand) every few seconds and,
+with --wake, a recording of the wake phrase among them. Reports the
+detector's CPU as % of one core per second of audio, the share of audio
+that reached the recognizer and how many times it fired. Exit code 1
+when the CPU share is over the budget.
+
+Usage:
+    python benchmarks/bench_wake.py --minutes 10 --wake hej_araks.wav
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.stt.wake import WAKE_CPU_BUDGET, WakeWordDetector
+from src.stt.wavio import TARGET_RATE, read_wav
+
+AUDIO_DIR = Path("data/audio")
+BLOCK = 1600  # jak STT_BLOCK_SIZE poza sesją
+
+
+def floor_audio(seconds, clips, noise=60.0, every_s=8.0, seed=0):
+    """Hall noise with a clip mixed in every ~every_s seconds (int16)."""
+    rng = np.random.default_rng(seed)
+    out = rng.normal(0.0, noise, int(seconds * TARGET_RATE)).astype(np.float32)
+    at = int(rng.uniform(1.0, every_s) * TARGET_RATE)
+    while clips and at < len(out):
+        clip = clips[rng.integers(len(clips))]
+        end = min(len(out), at + len(clip))
+        out[at:end] += clip[:end - at]
+        at = end + int(rng.uniform(0.5, every_s) * TARGET_RATE)
+    return np.clip(out, -32768, 32767).astype("<i2")
+
+
+def run(detector, audio):
+    data = audio.tobytes()
+    size = BLOCK * 2
+    for start in range(0, len(data) - size + 1, size):
+        detector.process(data[start:start + size])
+    return detector.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Idle CPU of the wake phrase detector")
+    parser.add_argument("--model", default="src/assets/models/vosk-model-pl")
+    parser.add_argument("--audio", default=str(AUDIO_DIR), help="background talk (WAV)")
+    parser.add_argument("--wake", action="append", default=[], help="recording of the wake phrase (repeatable)")
+    parser.add_argument("--minutes", type=float, default=10.0)
+    parser.add_argument("--noise", type=float, default=60.0, help="hall noise (int16 std)")
+    parser.add_argument("--budget", type=float, default=WAKE_CPU_BUDGET, help="% of one core")
+    args = parser.parse_args(argv)
+
+    from src.stt.engine import STTEngine
+    from src.stt.wake import WAKE_PHRASES
+
+    clips = [read_wav(p) for p in sorted(Path(args.audio).glob("*.wav"))] + [read_wav(p) for p in args.wake]
+    stt = STTEngine(model_path=args.model, capture=False)
+    detector = WakeWordDetector(stt.keyword_recognizer(WAKE_PHRASES), cpu_budget=args.budget)
+    stats = run(detector, floor_audio(args.minutes * 60, clips, args.noise))
+    print(json.dumps(stats, indent=1))
+    if stats["cpu_pct"] > args.budget:
+        print(f"❌ CPU {stats['cpu_pct']:.2f}% > budżet {args.budget:.2f}%")
+        return 1
+    print(f"✅ CPU {stats['cpu_pct']:.2f}% (budżet {args.budget:.2f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Load test of the shared speech backend: how many kiosk screens per core.
+
+Starts src.stt.server in-process on a temporary socket and opens N
+sessions through RemoteRecognizer, each streaming the fair corpus
+(data/audio/*.wav, looped) in STT_BLOCK_SIZE blocks at real-time pace,
+like a microphone would. For every N it reports the round-trip latency of
+a block (p50/p99), how many blocks came back later than the next block
+was due (the session falls behind), pool waits and CPU seconds per
+second of audio. Sessions per core = 1 / (CPU per audio second): the
+number of real-time streams one core sustains with the pool unsaturated.
+
+CPU is measured for the whole process, so the client threads are
+counted too; the figure is a slight underestimate of server capacity.
+
+Usage:
+    python benchmarks/load_stt_server.py [--model PATH] [--sessions 1,2,4,8] [--seconds 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.stt.remote import RemoteRecognizer
+from src.stt.server import SpeechServer, vosk_factory
+from src.stt.wavio import TARGET_RATE, blocks, read_wav
+
+try:
+    from src.config.settings import STT_BLOCK_SIZE, STT_SERVER_POOL, STT_SERVER_WORKERS
+except ImportError:
+    STT_BLOCK_SIZE, STT_SERVER_POOL, STT_SERVER_WORKERS = 1600, 8, os.cpu_count() or 2
+
+AUDIO_DIR = Path("data/audio")
+
+
+class ServerThread:
+    """SpeechServer on its own event loop thread, as a separate process would run it."""
+
+    def __init__(self, factory, pool_size, workers, nlp=None):
+        self.path = os.path.join(tempfile.mkdtemp(prefix="kiosk-stt-"), "stt.sock")
+        self.server = SpeechServer(factory, nlp, pool_size, workers)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="stt-server", daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(self.path), self.loop).result(timeout=30)
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result(timeout=10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+
+def session(path, clips, seconds, block_size, offset, latencies, late):
+    """Stream clips at real-time pace for `seconds`; appends block latencies (s)."""
+    recognizer = RemoteRecognizer(path)
+    block_s = block_size / TARGET_RATE
+    remaining = round(seconds / block_s)
+    due = time.perf_counter()
+    i = offset
+    try:
+        while remaining > 0:
+            for block in blocks(clips[i % len(clips)], block_size):
+                wait = due - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+                sent = time.perf_counter()
+                recognizer.AcceptWaveform(block)
+                took = time.perf_counter() - sent
+                latencies.append(took)
+                if sent + took > due + block_s:
+                    late.append(took)
+                due += block_s
+                remaining -= 1
+                if not remaining:
+                    break
+            recognizer.FinalResult()
+            i += 1
+    finally:
+        recognizer.close()
+
+
+def run_load(factory, clips, sessions, seconds=20.0, block_size=STT_BLOCK_SIZE,
+             pool_size=STT_SERVER_POOL, workers=STT_SERVER_WORKERS):
+    """One load level: `sessions` concurrent real-time streams; returns the report dict."""
+    latencies, late = [], []
+    with ServerThread(factory, pool_size, workers) as server:
+        cpu, wall = time.process_time(), time.perf_counter()
+        threads = [threading.Thread(target=session, args=(server.path, clips, seconds, block_size, n, latencies, late))
+                   for n in range(sessions)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+        pool = server.server.pool.stats()
+    audio_s = len(latencies) * block_size / TARGET_RATE
+    cpu_per_audio_s = cpu / audio_s if audio_s else 0.0
+    ms = np.array(latencies or [0.0]) * 1000
+    p50, p99 = np.percentile(ms, [50, 99])
+    return {
+        "sessions": sessions,
+        "blocks": len(latencies),
+        "audio_s": round(audio_s, 1),
+        "wall_s": round(wall, 1),
+        "block_ms": {"p50": round(float(p50), 2), "p99": round(float(p99), 2), "max": round(float(ms.max()), 2)},
+        "late_blocks": len(late),
+        "pool": pool,
+        "cpu_per_audio_s": round(cpu_per_audio_s, 4),
+        "sessions_per_core": round(1 / cpu_per_audio_s, 1) if cpu_per_audio_s else None,
+    }
+
+
+def load_corpus(audio_dir=AUDIO_DIR):
+    return [read_wav(p) for p in sorted(Path(audio_dir).glob("*.wav"))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent sessions per core of the shared STT backend")
+    parser.add_argument("--model", default="src/assets/models/vosk-model-pl")
+    parser.add_argument("--audio", default=str(AUDIO_DIR))
+    parser.add_argument("--sessions", default="1,2,4,8", help="comma-separated load levels")
+    parser.add_argument("--seconds", type=float, default=20.0, help="audio per session and level")
+    parser.add_argument("--pool", type=int, default=STT_SERVER_POOL)
+    parser.add_argument("--workers", type=int, default=STT_SERVER_WORKERS)
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    clips = load_corpus(args.audio)
+    if not clips:
+        print(f"❌ Brak nagrań w {args.audio}")
+        return 1
+    factory = vosk_factory(args.model)
+    report = {"cores": os.cpu_count(), "block_size": STT_BLOCK_SIZE, "pool": args.pool, "workers": args.workers,
+              "levels": []}
+    for n in (int(x) for x in args.sessions.split(",")):
+        level = run_load(factory, clips, n, args.seconds, pool_size=args.pool, workers=args.workers)
+        report["levels"].append(level)
+        print(f"{n:3d} sesji: blok p50 {level['block_ms']['p50']:7.2f} ms, p99 {level['block_ms']['p99']:7.2f} ms, "
+              f"spóźnione {level['late_blocks']:4d}, CPU/s audio {level['cpu_per_audio_s']:.3f} "
+              f"-> {level['sessions_per_core']} sesji/rdzeń")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Offline end-to-end replay of the recorded fair corpus.
+
+Every data/audio/*.wav is resampled to 16 kHz and pushed block by block
+through STTEngine's recognition path (VAD + Vosk, no microphone) as fast
+as the CPU allows, the recognized text goes through NLPProcessor and the
+answer to a stub TTS. The report (JSON) holds word error rate against
+data/transcripts, per-stage latency percentiles and CPU seconds per
+second of audio, so two releases can be compared file to file.
+
+The transcripts were written by the earlier cloud recognizer, so WER is
+a regression signal between releases rather than an absolute accuracy.
+
+Usage:
+    python benchmarks/replay.py [--model PATH] [--output report.json] [--baseline old.json]
+    python benchmarks/replay.py --archive data/archive --since 20260218_120000
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.nlp.matcher import normalize
+from src.stt.wavio import TARGET_RATE, blocks, read_wav, resample
+
+try:
+    from src.config.settings import STT_BLOCK_SIZE
+except ImportError:
+    STT_BLOCK_SIZE = 1600
+
+AUDIO_DIR = Path("data/audio")
+TRANSCRIPTS_DIR = Path("data/transcripts")
+STAMP = "%Y%m%d_%H%M%S"
+_STAMP_RE = re.compile(r"(\d{8}_\d{6})")
+STAGES = ("stt_decode", "stt_final", "nlp", "tts", "response")
+
+
+class StubTTS:
+    """Records what would be spoken; replay measures the pipeline, not the speakers."""
+
+    def __init__(self):
+        self.spoken = []
+
+    def speak_wait(self, text):
+        self.spoken.append(text)
+
+
+def _stamp(name):
+    found = _STAMP_RE.search(name)
+    return datetime.strptime(found.group(1), STAMP) if found else None
+
+
+def load_transcripts(directory=TRANSCRIPTS_DIR):
+    """(time, text) of every 'YYYYmmdd_HHMMSS: text' line in the transcript files."""
+    entries = []
+    for path in sorted(Path(directory).glob("transcript_*.txt")):
+        for line in path.read_text(encoding="utf-8").splitlines():
+            stamp, sep, text = line.partition(": ")
+            when = _stamp(stamp)
+            if sep and when and text.strip():
+                entries.append((when, text.strip()))
+    return sorted(entries)
+
+
+def pair_recordings(audio_dir=AUDIO_DIR, transcripts=None, window=3):
+    """(wav path, reference text or None) per recording.
+
+    Transcript stamps are written when recognition finishes, so they lag
+    the recording stamp by a second or two; each transcript is used once.
+    """
+    transcripts = load_transcripts() if transcripts is None else transcripts
+    unused = list(transcripts)
+    pairs = []
+    for path in sorted(Path(audio_dir).glob("*.wav")):
+        started = _stamp(path.name)
+        best = None
+        if started:
+            candidates = [t for t in unused
+                          if started - timedelta(seconds=1) <= t[0] <= started + timedelta(seconds=window)]
+            best = min(candidates, key=lambda t: abs(t[0] - started), default=None)
+        if best:
+            unused.remove(best)
+        pairs.append((path, best[1] if best else None))
+    return pairs
+
+
+def word_errors(reference, hypothesis):
+    """(substitutions + deletions + insertions, reference length) over normalized words."""
+    ref, hyp = normalize(reference).split(), normalize(hypothesis).split()
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (r != h))
+    return row[-1], len(ref)
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    ms = np.asarray(values) * 1000
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {"p50": round(p50, 2), "p90": round(p90, 2), "p99": round(p99, 2),
+            "max": round(float(ms.max()), 2), "mean": round(float(ms.mean()), 2)}
+
+
+def archive_pairs(archive, since=None, until=None):
+    """(utterance id, text recognized live) for archived utterances, plus their loader."""
+    def load(entry_id, rate):
+        samples, source_rate = archive.read(entry_id)
+        out = resample(samples, source_rate, rate)
+        return np.clip(np.round(out), -32768, 32767).astype(np.int16)
+
+    pairs = [(e.id, e.meta.get("text") or None) for e in archive.find(since, until)]
+    return pairs, load
+
+
+def replay(pairs, stt, nlp, tts, block_size=STT_BLOCK_SIZE, load=read_wav):
+    """Run every recording through stt -> nlp -> tts and build the report."""
+    timings = {stage: [] for stage in STAGES}
+    files = []
+    edits = ref_words = 0
+    audio_seconds = 0.0
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+
+    for source, reference in pairs:
+        samples = load(source, TARGET_RATE)
+        duration = len(samples) / TARGET_RATE
+        audio_seconds += duration
+
+        stt.start_listening()
+        t0 = time.perf_counter()
+        for block in blocks(samples, block_size):
+            stt.feed(block)
+        t1 = time.perf_counter()
+        stt.flush()
+        texts = []
+        while True:
+            text = stt.get_text(block=False)
+            if not text:
+                break
+            texts.append(text)
+        t2 = time.perf_counter()
+        stt.stop_listening()
+
+        hypothesis = " ".join(texts)
+        response = None
+        t3 = t4 = t2
+        if hypothesis:
+            response = nlp.process_query(hypothesis)
+            t3 = time.perf_counter()
+            tts.speak_wait(response)
+            t4 = time.perf_counter()
+            timings["nlp"].append(t3 - t2)
+            timings["tts"].append(t4 - t3)
+            # Od końca nagrania do gotowej odpowiedzi - to słyszy klient
+            timings["response"].append(t4 - t1)
+        timings["stt_decode"].append(t1 - t0)
+        timings["stt_final"].append(t2 - t1)
+
+        entry = {"file": getattr(source, "name", str(source)), "audio_s": round(duration, 3), "reference": reference,
+                 "hypothesis": hypothesis, "response": response,
+                 "rtf": round((t1 - t0) / duration, 4) if duration else None}
+        if reference is not None:
+            errors, words = word_errors(reference, hypothesis)
+            edits += errors
+            ref_words += words
+            entry["wer"] = round(errors / words, 4) if words else None
+        files.append(entry)
+
+    cpu = time.process_time() - cpu_started
+    wall = time.perf_counter() - wall_started
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "revision": _revision(),
+        "corpus": {"files": len(files), "with_reference": sum(r is not None for _, r in pairs),
+                   "audio_seconds": round(audio_seconds, 2)},
+        "wer": {"corpus": round(edits / ref_words, 4) if ref_words else None,
+                "errors": edits, "reference_words": ref_words},
+        "latency_ms": {stage: percentiles(values) for stage, values in timings.items()},
+        "cpu_s_per_audio_s": round(cpu / audio_seconds, 4) if audio_seconds else None,
+        "realtime_factor": round(wall / audio_seconds, 4) if audio_seconds else None,
+        "files": files,
+    }
+
+
+def _revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(report, baseline):
+    """Lines with the headline metrics of report next to the baseline."""
+    rows = [("WER", ("wer", "corpus")), ("CPU s / audio s", ("cpu_s_per_audio_s",)),
+            ("RTF", ("realtime_factor",))]
+    rows += [(f"{stage} p90 ms", ("latency_ms", stage, "p90")) for stage in STAGES]
+    lines = []
+    for label, keys in rows:
+        new, old = report, baseline
+        for key in keys:
+            new = (new or {}).get(key)
+            old = (old or {}).get(key)
+        delta = f"{new - old:+.4g}" if isinstance(new, (int, float)) and isinstance(old, (int, float)) else "-"
+        lines.append(f"{label:>18}: {old!s:>10} -> {new!s:>10} ({delta})")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay the recorded corpus through STT -> NLP")
+    parser.add_argument("--model", default="src/assets/models/vosk-model-pl")
+    parser.add_argument("--audio", default=str(AUDIO_DIR))
+    parser.add_argument("--transcripts", default=str(TRANSCRIPTS_DIR))
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--archive", help="replay utterances from this archive instead of WAV files")
+    parser.add_argument("--since", help="with --archive: YYYYmmdd_HHMMSS")
+    parser.add_argument("--until", help="with --archive: YYYYmmdd_HHMMSS")
+    args = parser.parse_args(argv)
+
+    from src.nlp.processor import NLPProcessor
+    from src.stt.engine import STTEngine
+
+    load = read_wav
+    if args.archive:
+        from src.storage.archive import AudioArchive
+
+        parse = lambda v: datetime.strptime(v, STAMP).timestamp() if v else None
+        pairs, load = archive_pairs(AudioArchive(args.archive), parse(args.since), parse(args.until))
+    else:
+        pairs = pair_recordings(args.audio, load_transcripts(args.transcripts))
+    stt = STTEngine(model_path=args.model, capture=False)
+    nlp = NLPProcessor(watch=False)
+    report = replay(pairs, stt, nlp, StubTTS(), load=load)
+
+    text = json.dumps(report, ensure_ascii=False, indent=1)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+        print(f"✅ Raport: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        print("\n".join(compare(report, baseline)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Soak test: the whole kiosk for hours on virtual audio devices.
+
+Runs KarkandakiKiosk (Tk window, event loop, STT, NLP, TTS, archive,
+interaction store, supervisor) with src.audio's virtual microphone and
+speakers. A driver thread plays the customers: it waits for the kiosk to
+fall silent, presses START, speaks a random recording from data/audio
+into the microphone at real time and measures on the virtual speaker
+how long after the end of the recording the reply starts. Pauses
+between customers are random, so promo phrases play in between, as on
+the fair floor.
+
+Every --window seconds one row is taken: customers, latency p50/p90,
+turns without a reply, RSS, open descriptors, threads, CPU. At the end
+linear trends are fitted over the rows (latency drift in ms/h, memory
+growth in MB/h) and threads and descriptors are compared with the first
+row - the slow leaks a whole fair day would show. Each row also reports
+the wake phrase detector's own CPU share next to the process CPU. Exit
+code 1 when a limit is exceeded.
+
+Needs a display for Tk (xvfb-run on a CI machine) and the Vosk model.
+
+Usage:
+    xvfb-run python benchmarks/soak.py --hours 8 --output soak.json
+    python benchmarks/soak.py --minutes 10 --window 60 --speaker loopback
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.replay import percentiles
+from src.audio.devices import VirtualInput, open_output
+from src.stt.wavio import TARGET_RATE, read_wav
+from src.telemetry.health import ResourceSampler
+
+AUDIO_DIR = Path("data/audio")
+LIMITS = {
+    "latency_drift_ms_per_h": 50.0,
+    "rss_growth_mb_per_h": 20.0,
+    "thread_growth": 5,
+    "fd_growth": 10,
+    "no_reply_share": 0.2,
+}
+
+
+def _wait(predicate, timeout, step=0.05):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(step)
+    return True
+
+
+def trend(xs, ys):
+    """Slope of the least-squares line through (xs, ys); 0 with fewer than two distinct xs."""
+    if len(set(xs)) < 2:
+        return 0.0
+    return float(np.polyfit(xs, ys, 1)[0])
+
+
+class Soak:
+    """Customer driver and per-window sampler around one running kiosk."""
+
+    def __init__(self, kiosk, microphone, speaker, clips, window_s=600.0, pause_s=(3.0, 20.0),
+                 reply_timeout=10.0, seed=0):
+        self.kiosk = kiosk
+        self.microphone = microphone
+        self.speaker = speaker
+        self.clips = clips
+        self.window_s = window_s
+        self.pause_s = pause_s
+        self.reply_timeout = reply_timeout
+        self.rng = random.Random(seed)
+        self.turns = []    # (monotonic, opóźnienie odpowiedzi w s albo None)
+        self.windows = []
+        self.sampler = ResourceSampler()
+        self.started = None
+        self._taken = 0
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self.started = time.monotonic()
+        self.sampler.sample()  # punkt odniesienia dla CPU
+        for target, name in ((self._customers, "soak-customers"), (self._sample_windows, "soak-sampler")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=self.reply_timeout + 5)
+        if len(self.turns) > self._taken:
+            self.windows.append(self.window())
+
+    def _idle(self):
+        return self.kiosk.mode == "PROMO" and self.speaker.idle()
+
+    def _customers(self):
+        while not self._stop.is_set():
+            # Klient podchodzi, gdy kiosk milczy (promo skończone, poprzednia sesja zamknięta)
+            if not _wait(lambda: self._idle() or self._stop.is_set(), 60) or self._stop.is_set():
+                continue
+            self.kiosk.toggle_mode()
+            if not _wait(lambda: self.kiosk.stt.is_listening, 5):
+                self.turns.append((time.monotonic(), None))
+                continue
+            clip = self.clips[self.rng.randrange(len(self.clips))]
+            done = self.microphone.say(clip)
+            done.wait(len(clip) / TARGET_RATE + 5)
+            spoken = time.perf_counter()
+            onset = self.speaker.wait_onset(spoken, self.reply_timeout)
+            self.turns.append((time.monotonic(), None if onset is None else onset - spoken))
+            # Bez odpowiedzi sesja kończy się sama po DIALOG_IDLE_TIMEOUT
+            _wait(lambda: self._idle() or self._stop.is_set(), 120)
+            self._stop.wait(self.rng.uniform(*self.pause_s))
+
+    def _sample_windows(self):
+        while not self._stop.wait(self.window_s):
+            self.windows.append(self.window())
+
+    def window(self):
+        """One report row: the turns since the previous row and a resource sample."""
+        turns, self._taken = self.turns[self._taken:], len(self.turns)
+        latencies = [latency for _, latency in turns if latency is not None]
+        sample = self.sampler.sample()
+        wake = getattr(self.kiosk, "wake", None)
+        return {
+            "t_h": round((time.monotonic() - self.started) / 3600, 4),
+            "turns": len(turns),
+            "no_reply": len(turns) - len(latencies),
+            "latency_ms": percentiles(latencies),
+            "rss_mb": round(sample.rss / 2**20, 1),
+            "fds": sample.fds,
+            "threads": sample.threads,
+            "cpu": round(sample.cpu, 1),
+            "wake_cpu": wake.stats()["cpu_pct"] if wake else None,  # detektor frazy budzącej, % rdzenia
+        }
+
+
+def analyze(windows, limits=LIMITS):
+    """Trends over the windows and the limits they break."""
+    timed = [w for w in windows if w["latency_ms"]]
+    turns = sum(w["turns"] for w in windows)
+    no_reply = sum(w["no_reply"] for w in windows)
+    result = {
+        "windows": len(windows),
+        "turns": turns,
+        "no_reply": no_reply,
+        "latency_drift_ms_per_h": round(trend([w["t_h"] for w in timed], [w["latency_ms"]["p50"] for w in timed]), 2),
+        "rss_growth_mb_per_h": round(trend([w["t_h"] for w in windows], [w["rss_mb"] for w in windows]), 2),
+        "thread_growth": windows[-1]["threads"] - windows[0]["threads"] if windows else 0,
+        "fd_growth": windows[-1]["fds"] - windows[0]["fds"] if windows else 0,
+        "no_reply_share": round(no_reply / turns, 3) if turns else 0.0,
+    }
+    result["failures"] = [f"{name} {result[name]} > {limit}" for name, limit in limits.items() if result[name] > limit]
+    return result
+
+
+def run(args, clips):
+    import tkinter as tk
+
+    from src.main import KarkandakiKiosk
+
+    microphone = VirtualInput(noise=args.noise)
+    speaker = open_output(args.speaker, microphone)
+    root = tk.Tk()
+    kiosk = KarkandakiKiosk(root, audio_input=microphone, audio_output=speaker)
+    soak = Soak(kiosk, microphone, speaker, clips, window_s=args.window, seed=args.seed).start()
+    root.after(int(args.seconds * 1000), root.quit)
+    try:
+        root.mainloop()
+    finally:
+        soak.stop()
+        kiosk.close()
+        root.destroy()
+    return soak.windows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hours of kiosk sessions on virtual audio devices")
+    parser.add_argument("--hours", type=float, default=8.0)
+    parser.add_argument("--minutes", type=float, help="instead of --hours, for a quick run")
+    parser.add_argument("--audio", default=str(AUDIO_DIR), help="customer recordings (WAV)")
+    parser.add_argument("--window", type=float, default=600.0, help="seconds per report row")
+    parser.add_argument("--speaker", choices=("null", "loopback"), default="null",
+                        help="loopback: the reply is heard by the microphone (barge-in under echo)")
+    parser.add_argument("--noise", type=float, default=60.0, help="hall noise in the microphone (int16 std)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    for name, limit in LIMITS.items():
+        parser.add_argument(f"--max-{name.replace('_', '-')}", dest=name, type=float, default=limit)
+    args = parser.parse_args(argv)
+    args.seconds = args.minutes * 60 if args.minutes else args.hours * 3600
+
+    clips = [read_wav(p) for p in sorted(Path(args.audio).glob("*.wav"))]
+    if not clips:
+        print(f"❌ Brak nagrań w {args.audio}")
+        return 1
+    windows = run(args, clips)
+    report = {"seconds": args.seconds, "speaker": args.speaker, "rows": windows,
+              **analyze(windows, {name: getattr(args, name) for name in LIMITS})}
+    for w in windows:
+        p50 = w["latency_ms"].get("p50", float("nan"))
+        wake = "  -  " if w["wake_cpu"] is None else f"{w['wake_cpu']:5.2f}"
+        print(f"{w['t_h']:6.2f} h  klienci {w['turns']:4d}  bez odpowiedzi {w['no_reply']:3d}  p50 {p50:7.1f} ms  "
+              f"RSS {w['rss_mb']:7.1f} MB  fd {w['fds']:4d}  wątki {w['threads']:3d}  CPU {w['cpu']:5.1f}%  "
+              f"wake {wake}%")
+    print(f"Dryf opóźnienia {report['latency_drift_ms_per_h']:+.1f} ms/h, pamięć {report['rss_growth_mb_per_h']:+.1f} MB/h, "
+          f"wątki {report['thread_growth']:+d}, fd {report['fd_growth']:+d}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=1))
+    for failure in report["failures"]:
+        print(f"❌ {failure}")
+    return 1 if report["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
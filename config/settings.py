@@ -38,6 +38,9 @@ TTS_VOLUME = 0.9
 # NLP settings
 UNKNOWN_RESPONSE = "Przepraszam, nie rozumiem. Proszę zapytać obsługę."
 MAX_QUERY_LENGTH = 500
+FUZZY_MIN_SCORE = 0.7  # share of an entry's trigrams the query must contain
+KNOWLEDGE_RELOAD_INTERVAL = 0.5  # seconds between mtime checks of data/*.json
+RESPONSE_MEMO_SIZE = 512  # normalized query -> response, per knowledge version
 
 # Logging
 LOG_LEVEL = 'INFO'
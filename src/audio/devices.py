@@ -0,0 +1,374 @@
+"""
+Audio devices behind one interface: the kiosk's microphone and speakers,
+or virtual ones for soak tests and CI machines without a sound card.
+
+Input (STTEngine): ``open(rate, frames_per_buffer)`` returns a stream
+whose ``read(frames)`` blocks like a microphone and returns int16 bytes;
+``reset()`` re-enumerates devices after a replug; ``close()``.
+
+Output (TTSEngine): ``player(audio_format, sample_rate, echo)`` returns a
+StreamingPlayer (None -> file playback), ``play_file(path)`` blocks until
+a file has been played and ``stop_file()`` cuts it short.
+
+    device    PyAudio microphone / mpg123, aplay, afplay (as before)
+    wav:PATH  input: recordings (a WAV or a directory of them) spoken into
+              the microphone at real time, one after another, with pauses
+    null      silence in; out: audio discarded at real-time pace
+    loopback  output: like null, but PCM reaching the "speaker" is mixed
+              back into the virtual microphone as echo (barge-in)
+"""
+import logging
+import platform
+import subprocess
+import threading
+import time
+import wave
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from src.stt.wavio import TARGET_RATE, read_wav, resample
+from src.tts.player import MP3_BYTES_PER_SECOND, StreamingPlayer, file_command, streaming_command
+
+try:
+    import pyaudio
+except ImportError:  # serwer / CI bez karty dźwiękowej
+    pyaudio = None
+
+try:
+    from src.config.settings import AUDIO_INPUT, AUDIO_OUTPUT, AUDIO_ECHO_GAIN
+except ImportError:
+    AUDIO_INPUT, AUDIO_OUTPUT, AUDIO_ECHO_GAIN = "device", "device", 0.3
+
+logger = logging.getLogger(__name__)
+
+
+# --- wejście ---
+
+class MicrophoneInput:
+    """PyAudio capture device."""
+
+    def __init__(self, device_index=None):
+        if pyaudio is None:
+            raise ImportError("PyAudio is required for microphone capture")
+        self.device_index = device_index
+        self.audio = pyaudio.PyAudio()
+
+    def open(self, rate, frames_per_buffer):
+        stream = self.audio.open(format=pyaudio.paInt16, channels=1, rate=rate, input=True,
+                                 frames_per_buffer=frames_per_buffer, input_device_index=self.device_index)
+        return _PyAudioStream(stream)
+
+    def reset(self):
+        # Nowa instancja PyAudio widzi urządzenia podłączone od nowa
+        self.audio.terminate()
+        self.audio = pyaudio.PyAudio()
+
+    def close(self):
+        if self.audio is not None:
+            self.audio.terminate()
+            self.audio = None
+
+
+class _PyAudioStream:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def read(self, frames):
+        return self.stream.read(frames, exception_on_overflow=False)
+
+    def close(self):
+        self.stream.stop_stream()
+        self.stream.close()
+
+
+class VirtualInput:
+    """Microphone fed from code: say() queues speech, silence (or noise) otherwise.
+
+    Blocks come on a real-time clock, so VAD, barge-in and the capture
+    watchdog see the timing of a real microphone; realtime=False hands
+    them out as fast as they are read.
+    """
+
+    def __init__(self, rate=TARGET_RATE, realtime=True, noise=0.0, echo_gain=AUDIO_ECHO_GAIN):
+        self.rate = rate
+        self.realtime = realtime
+        self.noise = noise            # odchylenie szumu tła (int16), 0 = cisza cyfrowa
+        self.echo_gain = echo_gain    # ile z głośnika wraca do mikrofonu (loopback)
+        self.blocks = 0
+        self._speech = deque()        # (próbki int16, Event ustawiany po przeczytaniu całości)
+        self._offset = 0
+        self._echo = deque()          # float32, wmiksowywane po kolei w kolejne bloki
+        self._lock = threading.Lock()
+        self._clock = None
+        self._rng = np.random.default_rng(0)
+
+    def open(self, rate, frames_per_buffer):
+        if rate != self.rate:
+            raise ValueError(f"virtual microphone runs at {self.rate} Hz, not {rate}")
+        self._clock = time.monotonic()
+        return _VirtualStream(self)
+
+    def reset(self):
+        pass
+
+    def say(self, samples):
+        """Queue speech (int16 at self.rate); the returned Event is set once all of it was read."""
+        done = threading.Event()
+        with self._lock:
+            self._speech.append((np.asarray(samples, dtype=np.int16), done))
+        return done
+
+    def speaking(self):
+        with self._lock:
+            return bool(self._speech)
+
+    def echo(self, samples, rate):
+        """Sound from a loopback speaker, heard by the microphone from now on."""
+        if self.echo_gain:
+            mixed = resample(samples, rate, self.rate) * self.echo_gain
+            with self._lock:
+                self._echo.append(mixed)
+
+    def cut_echo(self):
+        with self._lock:
+            self._echo.clear()
+
+    def _next(self, frames):
+        out = np.zeros(frames, dtype=np.float32)
+        if self.noise:
+            out += self._rng.normal(0.0, self.noise, frames)
+        finished = []
+        with self._lock:
+            filled = 0
+            while filled < frames and self._speech:
+                samples, done = self._speech[0]
+                take = samples[self._offset:self._offset + frames - filled]
+                out[filled:filled + len(take)] += take
+                filled += len(take)
+                self._offset += len(take)
+                if self._offset >= len(samples):
+                    self._speech.popleft()
+                    self._offset = 0
+                    finished.append(done)
+            filled = 0
+            while filled < frames and self._echo:
+                chunk = self._echo[0]
+                take = chunk[:frames - filled]
+                out[filled:filled + len(take)] += take
+                filled += len(take)
+                if len(take) == len(chunk):
+                    self._echo.popleft()
+                else:
+                    self._echo[0] = chunk[len(take):]
+        return np.clip(out, -32768, 32767).astype("<i2").tobytes(), finished
+
+    def read(self, frames):
+        if self.realtime:
+            self._clock += frames / self.rate
+            wait = self._clock - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            elif wait < -1.0:
+                self._clock = time.monotonic()  # po zawieszeniu wątku nie nadrabiamy sekund naraz
+        data, finished = self._next(frames)
+        self.blocks += 1
+        for done in finished:
+            done.set()
+        return data
+
+    def close(self):
+        pass
+
+
+class _VirtualStream:
+    """One open() of a virtual microphone; a closed one no longer reads (as after restart_capture)."""
+
+    def __init__(self, device):
+        self.device = device
+        self.closed = False
+
+    def read(self, frames):
+        if self.closed:
+            raise OSError("virtual microphone stream closed")
+        return self.device.read(frames)
+
+    def close(self):
+        self.closed = True
+
+
+class WavInput(VirtualInput):
+    """Recordings spoken into the virtual microphone one after another, with pauses."""
+
+    def __init__(self, source, loop=True, pause_s=2.0, **kwargs):
+        super().__init__(**kwargs)
+        source = Path(source)
+        paths = sorted(source.glob("*.wav")) if source.is_dir() else [source]
+        if not paths:
+            raise FileNotFoundError(f"No WAV recordings in {source}")
+        self.clips = [read_wav(path, self.rate) for path in paths]
+        self.loop = loop
+        self.pause = np.zeros(int(pause_s * self.rate), dtype=np.int16)
+        self.played = 0
+
+    def _next(self, frames):
+        if not self.speaking() and (self.loop or self.played < len(self.clips)):
+            self.say(np.concatenate([self.clips[self.played % len(self.clips)], self.pause]))
+            self.played += 1
+        return super()._next(frames)
+
+
+# --- wyjście ---
+
+class SystemOutput:
+    """The kiosk's speakers through command-line players (mpg123, aplay, afplay)."""
+
+    def __init__(self, os_type=None):
+        self.os_type = os_type or platform.system()
+        self.process = None
+
+    def player(self, audio_format, sample_rate, echo=None):
+        command = streaming_command(self.os_type, audio_format, sample_rate)
+        if command is None:
+            return None
+        if audio_format == "pcm":
+            return StreamingPlayer(command, bytes_per_second=sample_rate * 2, echo=echo, sample_rate=sample_rate)
+        return StreamingPlayer(command, echo=echo)
+
+    def play_file(self, path):
+        self.process = subprocess.Popen(file_command(self.os_type, path))
+        try:
+            self.process.wait()
+        finally:
+            self.process = None
+
+    def stop_file(self):
+        process = self.process
+        if process and process.poll() is None:
+            process.terminate()
+            process.wait()
+
+    def __repr__(self):
+        return f"SystemOutput({self.os_type})"
+
+
+class VirtualPlayer(StreamingPlayer):
+    """StreamingPlayer without a decoder: same timing and echo log, audio goes to a VirtualOutput."""
+
+    latency = 0.0
+
+    def __init__(self, output, bytes_per_second, echo=None, sample_rate=None):
+        super().__init__(None, bytes_per_second=bytes_per_second, echo=echo, sample_rate=sample_rate)
+        self.output = output
+
+    def _write(self, chunk, starts_in):
+        # Głośnik dostaje koniec wyliczony przez feed(), więc idle() i wait_done() mówią to samo
+        self.output.played(chunk, self.bytes_per_second, self.sample_rate, ends_at=self._busy_until)
+
+    def cancel(self):
+        super().cancel()
+        self.output.cut()
+
+
+class VirtualOutput:
+    """Speakers that only keep time: onsets and seconds played are counted,
+    and with loopback the microphone hears the PCM that was played."""
+
+    def __init__(self, loopback=None, realtime=True):
+        self.loopback = loopback  # VirtualInput
+        self.realtime = realtime
+        self.seconds = 0.0
+        self.chunks = 0
+        self.onsets = deque(maxlen=1024)  # perf_counter początku każdej wypowiedzi po ciszy
+        self._busy_until = 0.0
+        self._sound = threading.Condition()
+        self._file_stop = threading.Event()
+
+    def player(self, audio_format, sample_rate, echo=None):
+        if audio_format == "pcm":
+            return VirtualPlayer(self, sample_rate * 2, echo, sample_rate)
+        return VirtualPlayer(self, MP3_BYTES_PER_SECOND, echo)
+
+    def played(self, chunk, bytes_per_second, sample_rate=None, ends_at=None):
+        """Account for one chunk reaching the speaker (called by VirtualPlayer).
+
+        ``ends_at`` is the player's own perf_counter deadline for the chunk;
+        without it (a file) the chunk starts now or after what is playing.
+        """
+        duration = len(chunk) / bytes_per_second
+        now = time.perf_counter()
+        with self._sound:
+            if ends_at is None:
+                ends_at = max(self._busy_until, now) + duration
+            if now >= self._busy_until:
+                self.onsets.append(ends_at - duration)
+                self._sound.notify_all()
+            self._busy_until = max(self._busy_until, ends_at)
+            self.chunks += 1
+            self.seconds += duration
+        if self.loopback is not None and sample_rate:
+            self.loopback.echo(np.frombuffer(chunk[:len(chunk) // 2 * 2], dtype="<i2"), sample_rate)
+
+    def cut(self):
+        with self._sound:
+            self._busy_until = 0.0
+        if self.loopback is not None:
+            self.loopback.cut_echo()
+
+    def idle(self):
+        with self._sound:
+            return time.perf_counter() >= self._busy_until
+
+    def wait_onset(self, since, timeout):
+        """perf_counter at which the first sound after `since` started, or None after timeout."""
+        def first():
+            return next((t for t in self.onsets if t > since), None)
+
+        with self._sound:
+            self._sound.wait_for(lambda: first() is not None, timeout)
+            return first()
+
+    def play_file(self, path):
+        path = str(path)
+        if path.endswith(".wav"):
+            with wave.open(path, "rb") as w:
+                rate, data = w.getframerate(), w.readframes(w.getnframes())
+            self.played(data, rate * 2, rate)
+        else:
+            with open(path, "rb") as f:
+                self.played(f.read(), MP3_BYTES_PER_SECOND)
+        self._file_stop.clear()
+        if self.realtime:
+            self._file_stop.wait(max(0.0, self._busy_until - time.perf_counter()))
+
+    def stop_file(self):
+        self._file_stop.set()
+        self.cut()
+
+    def __repr__(self):
+        return "VirtualOutput(loopback)" if self.loopback is not None else "VirtualOutput(null)"
+
+
+def open_input(spec=AUDIO_INPUT):
+    """Input device from its name: device, null or wav:PATH."""
+    if spec == "device":
+        return MicrophoneInput()
+    if spec == "null":
+        return VirtualInput()
+    if spec.startswith("wav:"):
+        return WavInput(spec[4:])
+    raise ValueError(f"Unknown audio input '{spec}' (device, null, wav:PATH)")
+
+
+def open_output(spec=AUDIO_OUTPUT, microphone=None):
+    """Output device from its name: device, null or loopback (into a virtual microphone)."""
+    if spec == "device":
+        return SystemOutput()
+    if spec == "null":
+        return VirtualOutput()
+    if spec == "loopback":
+        if not isinstance(microphone, VirtualInput):
+            raise ValueError("loopback output needs a virtual microphone (null or wav:PATH input)")
+        return VirtualOutput(loopback=microphone)
+    raise ValueError(f"Unknown audio output '{spec}' (device, null, loopback)")
@@ -27,12 +27,30 @@ FORBIDDEN_TOPICS = ["polityka", "konkurencja", "religia", "system prompt", "igno
 # Поріг відсікання фонового шуму (галас на виставці)
 NOISE_GATE_THRESHOLD = 500  # Налаштовується на місці під конкретний мікрофон
 ENABLE_BARGE_IN = True      # Дозволяє клієнту перебити AI (зупиняє TTS)
+BARGE_IN_MARGIN = 2.0       # Мікрофон має бути у стільки разів гучніший за очікуване відлуння (~6 дБ)
+BARGE_IN_ATTACK_FRAMES = 3  # Кадрів мови клієнта поспіль (3 x 20 мс), щоб перервати кіоск
+BARGE_IN_ECHO_WINDOW = 0.3  # с: затримка динамік -> мікрофон разом з буферами аудіо
+BARGE_IN_BLOCK_SIZE = 320   # Поки кіоск говорить, мікрофон читається блоками по 20 мс
+STT_BLOCK_SIZE = 1600       # Семплів на одне читання з мікрофона (100 мс при 16 кГц)
+STT_PREROLL_SECONDS = 1.0   # Скільки звуку до START віддаємо розпізнавачу
+STT_SPECULATION = True      # Готувати відповідь (текст + аудіо) ще до кінця фрази
+STT_PARTIAL_STABLE_POLLS = 2  # Скільки блоків поспіль часткова гіпотеза має не змінюватись
+# Граматика Vosk зі словника кіоску (python -m src.stt.grammar); немає файлу - повний словник
+STT_GRAMMAR_PATH = "data/grammar.json"
+STT_GRAMMAR_MIN_CONF = 0.6  # Нижче - повторне декодування фрази повним словником
+STT_FALLBACK_MIN_S = 0.3    # Коротша мова (без "хвоста" VAD) - лише шум, повний словник не запускаємо
 
 # ==========================================
 # 🖥️ НАЛАШТУВАННЯ KIOSK UI
 # ==========================================
 FULLSCREEN_MODE = True      # Блокування виходу з програми
 HIDE_CURSOR = True
+DIALOG_IDLE_TIMEOUT = 15    # с тиші в режимі розмови, після яких кіоск повертається до промо
+PROMO_INTERVAL = 15         # с паузи між промо-фразами
+UI_TICK_MS = 33             # Такт оновлення екрана (~30 к/с): черга змін із потоків + індикатор мікрофона
+UI_DESIGN_SIZE = (1920, 1080)  # Роздільність, під яку задані розміри елементів; менші екрани - пропорційно
+UI_ASSET_CACHE = "data/ui_cache"  # Зображення, вже масштабовані під екран (без JPEG + LANCZOS при старті)
+LEVEL_METER_BARS = 16       # Сегменти індикатора рівня мікрофона
 
 # ==========================================
 # ☁️ ІНТЕГРАЦІЯ (CRM)
@@ -40,3 +58,111 @@ HIDE_CURSOR = True
 # Замість втрати даних при оновленні, зберігаємо ліди (номери) безпечно
 # Зберігається у змінних середовища для безпеки (Least Privilege)
 CRM_DB_URL = os.getenv("CRM_DB_URL", "sqlite:///local_leads.db")
+
+# ==========================================
+# 🔊 TTS (ГОЛОС ТА КЕШ)
+# ==========================================
+TTS_VOICE = "pl-PL-ZofiaNeural"
+TTS_RATE = "+5%"
+# Кеш синтезованих фраз на диску (працює і без Wi-Fi на виставці)
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "data/tts_cache")
+TTS_CACHE_MAX_MB = 200
+TTS_PREWARM = True          # Синтезувати всі сталі фрази при старті
+TTS_STREAMING = True        # Грати аудіо одразу з потоку edge-tts (без temp-файлів)
+TTS_LOOKAHEAD = 2           # Скільки речень синтезувати наперед під час відтворення
+TTS_MIN_SENTENCE_CHARS = 25 # Короткі фрагменти ("ul.", "Hmm,") склеюються з сусідніми
+# Порядок переваги рушіїв TTS: хмарний edge-tts, локальний Piper (офлайн)
+TTS_BACKENDS = ["edge", "piper"]
+PIPER_MODEL_PATH = "src/assets/models/piper/pl_PL-gosia-medium.onnx"
+TTS_LATENCY_BUDGET = 1.0       # с до першого фрагмента, вище - рушій вважається повільним
+TTS_FIRST_CHUNK_TIMEOUT = 2.5  # с, після цього перемикаємось на наступний рушій
+TTS_BACKEND_COOLDOWN = 60      # с, через скільки знову пробуємо повільний/недоступний рушій
+
+# ==========================================
+# 🗣️ VAD (ДЕТЕКЦІЯ МОВЛЕННЯ)
+# ==========================================
+VAD_FRAME_MS = 20           # Довжина кадру для оцінки енергії
+VAD_RATIO = 2.5             # Мова = енергія вище "шумової підлоги" залу x VAD_RATIO
+VAD_ATTACK_FRAMES = 3       # Скільки гучних кадрів поспіль запускає фразу
+VAD_HANGOVER_FRAMES = 25    # Скільки тихих кадрів (~0.5 с) ще йде до Vosk після мови
+
+# ==========================================
+# 📈 ТЕЛЕМЕТРІЯ (ЗАТРИМКИ ЕТАПІВ)
+# ==========================================
+TRACING_ENABLED = os.getenv("KIOSK_TRACING", "0") == "1"  # Вимкнено - майже нульові витрати
+METRICS_HOST = "127.0.0.1"  # Лише локально: Prometheus/curl на самому кіоску
+METRICS_PORT = 9108
+TRACE_LOG_PATH = "logs/traces.jsonl"
+TRACE_LOG_MAX_MB = 10       # Після цього файл ротується (traces.jsonl.1, .2, ...)
+TRACE_LOG_BACKUPS = 3
+
+# ==========================================
+# 🩺 НАГЛЯД ЗА ЗДОРОВ'ЯМ (ЦІЛИЙ ДЕНЬ НА ВИСТАВЦІ)
+# ==========================================
+HEALTH_ENABLED = True
+HEALTH_INTERVAL_S = 5       # Як часто: CPU, RSS, дескриптори, потоки + перевірка підсистем
+HEALTH_LOG_PATH = "logs/health.ring"
+HEALTH_LOG_RECORDS = 17280  # Кільцевий файл: 24 год по 5 с, ~0.5 МБ, не росте
+RESTART_COOLDOWN_S = 30     # Не перезапускати ту саму підсистему частіше
+TTS_STALL_S = 60            # Одне речення синтезується/грає довше - потік TTS завис
+STT_STALL_S = 5             # Мікрофон мовчить довше (блоки йдуть кожні 0.1 с) - перевідкриваємо
+LOOP_STALL_S = 10           # Цикл подій заблокований довше - лише попередження
+
+# ==========================================
+# 🗄️ АРХІВ НАГРАНЬ (ЗАМІСТЬ ОКРЕМИХ WAV)
+# ==========================================
+ARCHIVE_ENABLED = True
+ARCHIVE_DIR = "data/archive"  # Стиснені сегменти + index.jsonl (python -m src.storage.archive)
+ARCHIVE_SEGMENT_MB = 16     # Розмір одного сегмента до ротації
+ARCHIVE_MAX_MB = 2000       # Найстаріші сегменти видаляються понад цей обсяг (SD-карта)
+ARCHIVE_MAX_DAYS = 14       # ...або коли старші за стільки днів
+
+# ==========================================
+# 💬 ІСТОРІЯ РОЗМОВ (SQLITE)
+# ==========================================
+# Кожна репліка клієнта і кіоску - рядок у SQLite (WAL), замість окремих файлів
+INTERACTIONS_ENABLED = True
+INTERACTIONS_DB = os.getenv("INTERACTIONS_DB", CRM_DB_URL)  # Той самий локальний файл, що й CRM
+INTERACTIONS_BATCH = 64        # Скільки реплік максимум в одній транзакції
+INTERACTIONS_FLUSH_S = 1.0     # Як довго фоновий запис чекає, поки набереться пачка
+SESSION_GAP_S = 60             # Імпорт старих файлів: пауза, після якої починається нова розмова
+
+# ==========================================
+# 🖥️ СПІЛЬНИЙ СЕРВЕР STT (КІЛЬКА ЕКРАНІВ)
+# ==========================================
+# Одна модель Vosk на міні-ПК замість копії в кожному процесі кіоску
+STT_SERVER_SOCKET = os.getenv("KIOSK_STT_SOCKET") or None  # Unix-сокет src.stt.server; None = локальна модель
+STT_SERVER_POOL = 8                     # Скільки розпізнавачів одночасно (решта фраз чекає в черзі)
+STT_SERVER_WORKERS = os.cpu_count() or 2  # Потоки декодування на сервері
+
+# ==========================================
+# 🦙 ЛОКАЛЬНА LLM (ЛИШЕ КОЛИ ПРАВИЛА НЕ СПРАЦЮВАЛИ)
+# ==========================================
+LLM_ENABLED = os.getenv("KIOSK_LLM", "0") == "1"  # Вимкнено - без Ollama кіоск відповідає як раніше
+LLM_URL = os.getenv("KIOSK_LLM_URL", "http://127.0.0.1:11434")  # Ollama на тому ж міні-ПК
+LLM_MODEL = os.getenv("KIOSK_LLM_MODEL", "llama3.2:3b")
+LLM_FIRST_SENTENCE_S = 1.5    # Жорсткий ліміт до першого речення, інакше - стандартна відповідь
+LLM_SENTENCE_TIMEOUT_S = 3.0  # Найдовша пауза між реченнями, далі відповідь обривається
+LLM_MAX_ANSWER_S = 12.0       # Уся відповідь не довше
+LLM_MAX_TOKENS = 120          # ~2-3 речення, як вимагає SYSTEM_PROMPT
+LLM_CACHE_SIZE = 256          # Повторні питання - з пам'яті, для кожної версії знань окремо
+
+# ==========================================
+# 🔈 АУДІОПРИСТРОЇ (СПРАВЖНІ АБО ВІРТУАЛЬНІ)
+# ==========================================
+# Для тривалих тестів і CI без звукової карти (python benchmarks/soak.py)
+AUDIO_INPUT = os.getenv("KIOSK_AUDIO_INPUT", "device")    # device | null | wav:data/audio
+AUDIO_OUTPUT = os.getenv("KIOSK_AUDIO_OUTPUT", "device")  # device | null | loopback (звук назад у мікрофон)
+AUDIO_ECHO_GAIN = 0.3       # Яка частка звуку з "динаміка" повертається в мікрофон у режимі loopback
+
+# ==========================================
+# 👋 ФРАЗА ПРОБУДЖЕННЯ (БЕЗ КНОПКИ)
+# ==========================================
+# Між сесіями мікрофон і так відкритий: енергетичний поріг + крихітний Vosk лише з цими фразами
+WAKE_ENABLED = os.getenv("KIOSK_WAKE", "1") == "1"
+WAKE_PHRASES = ["hej araks", "cześć araks", "araks"]  # Фонетично, як у словнику моделі (слова поза ним Vosk відкидає)
+WAKE_MIN_CONF = 0.7         # Мінімальна впевненість кожного слова фрази у фінальному результаті
+WAKE_MAX_SPEECH_S = 2.5     # Довше мовлення без фрази - розмова поруч, далі не декодуємо до паузи
+WAKE_CPU_BUDGET = 5.0       # % одного ядра на детектор у простої; вище - поріг енергії піднімається
+WAKE_BUDGET_WINDOW_S = 10.0  # с аудіо на одне вимірювання CPU
+WAKE_MAX_GATE = 8.0         # Найбільший множник порогу енергії при перевищенні бюджету
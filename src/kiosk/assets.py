@@ -0,0 +1,63 @@
+"""
+Kiosk images pre-scaled for the screen they are shown on.
+
+Images are decoded and resized once per screen size and kept as raw RGB
+in ``UI_ASSET_CACHE``; later starts read the bytes straight into an
+image instead of decoding the JPEG and running LANCZOS again.
+"""
+import logging
+from pathlib import Path
+
+from PIL import Image
+
+try:
+    from src.config.settings import UI_ASSET_CACHE, UI_DESIGN_SIZE
+except ImportError:
+    UI_ASSET_CACHE, UI_DESIGN_SIZE = "data/ui_cache", (1920, 1080)
+
+logger = logging.getLogger(__name__)
+
+
+def scaled_size(size, screen, design=UI_DESIGN_SIZE):
+    """size laid out for a design-size screen, scaled to this screen (never up)."""
+    scale = min(1.0, screen[0] / design[0], screen[1] / design[1])
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+class AssetCache:
+    """Images resized once per target size and kept on disk as raw RGB bytes."""
+
+    def __init__(self, cache_dir=UI_ASSET_CACHE):
+        self.cache_dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, source, size):
+        stat = source.stat()
+        # mtime i rozmiar źródła w nazwie: podmieniony plik po prostu nie trafia w stary wpis
+        return self.cache_dir / f"{source.stem}_{size[0]}x{size[1]}_{stat.st_mtime_ns:x}_{stat.st_size:x}.rgb"
+
+    def get(self, source, size):
+        """PIL image of source resized to size (RGB)."""
+        source = Path(source)
+        cached = self._path(source, size)
+        try:
+            data = cached.read_bytes()
+            if len(data) == size[0] * size[1] * 3:
+                self.hits += 1
+                return Image.frombuffer("RGB", size, data, "raw", "RGB", 0, 1)
+        except OSError:
+            pass
+        self.misses += 1
+        with Image.open(source) as img:
+            image = img.convert("RGB").resize(size, Image.Resampling.LANCZOS)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            for stale in self.cache_dir.glob(f"{source.stem}_{size[0]}x{size[1]}_*.rgb"):
+                stale.unlink()
+            tmp = cached.with_suffix(".tmp")
+            tmp.write_bytes(image.tobytes())
+            tmp.replace(cached)
+        except OSError as e:
+            logger.warning(f"UI: nie udało się zapisać pamięci podręcznej {cached}: {e}")
+        return image
@@ -0,0 +1,175 @@
+"""
+Single asyncio event loop for the kiosk runtime.
+
+Everything the kiosk reacts to arrives as an event on one queue: final
+STT results, end of a spoken reply, button presses, the wake phrase. Coroutines wait on
+``next_event()`` with a timeout instead of sleeping and polling, so a
+reaction starts the moment its event is posted. Threads (microphone,
+TTS playback, Tk) only ever hand events over with ``post()``; blocking
+calls go the other way through ``run_blocking()``. Tk is touched only from
+its own main loop: ``ui()`` hands the call to the UI queue it drains.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+BUTTON = "button"
+STT_FINAL = "stt_final"
+TTS_DONE = "tts_done"
+WAKE = "wake"
+HEARTBEAT_S = 1.0
+
+
+class Event(NamedTuple):
+    kind: str
+    payload: Any = None
+    ts: float = 0.0
+
+
+class Orchestrator:
+    """Owns the event loop thread, the event queue and the executor for blocking I/O."""
+
+    def __init__(self, ui_queue=None, max_workers=4):
+        self.ui_queue = ui_queue  # UIQueue; None w testach i w trybie bez ekranu
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kiosk-io")
+        self.loop.set_default_executor(self.executor)
+        self.thread = None
+        self._events = None
+        self._ready = threading.Event()
+        self.last_tick = None  # takt pętli co HEARTBEAT_S; stary = pętla zablokowana
+
+    # --- cykl życia ---
+
+    def start(self, main=None):
+        """Run the loop in a daemon thread; main is the coroutine function driving the kiosk."""
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self._events = asyncio.Queue()
+            self._ready.set()
+            self._heartbeat()
+            if main is not None:
+                self.loop.create_task(self._guard(main()))
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, name="kiosk-loop", daemon=True)
+        self.thread.start()
+        self._ready.wait()
+        return self
+
+    async def _guard(self, coro):
+        try:
+            await coro
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            logger.exception("Kiosk loop crashed")
+
+    def stop(self):
+        if self.thread is None:
+            return
+        def shutdown():
+            for task in asyncio.all_tasks(self.loop):
+                task.cancel()
+            self.loop.stop()
+        self.loop.call_soon_threadsafe(shutdown)
+        self.thread.join(timeout=5)
+        self.thread = None
+        self.executor.shutdown(wait=False)
+
+    def _heartbeat(self):
+        self.last_tick = time.monotonic()
+        self.loop.call_later(HEARTBEAT_S, self._heartbeat)
+
+    def health(self):
+        """Loop thread alive and how long the loop has been blocked (blocking call on the loop)."""
+        if self.thread is None:
+            return {"alive": False, "stalled_s": 0.0}
+        late = time.monotonic() - self.last_tick - HEARTBEAT_S if self.last_tick else 0.0
+        return {"alive": self.thread.is_alive(), "stalled_s": max(0.0, late)}
+
+    # --- zdarzenia ---
+
+    def post(self, kind, payload=None):
+        """Hand an event to the loop; safe from any thread."""
+        event = Event(kind, payload, time.perf_counter())
+        self.loop.call_soon_threadsafe(self._events.put_nowait, event)
+
+    def poster(self, kind):
+        """Callback posting kind with its single argument (e.g. for stt.on_text)."""
+        return lambda payload=None: self.post(kind, payload)
+
+    async def next_event(self, *kinds, timeout=None):
+        """Next event of one of kinds (any kind if none given), or None after timeout.
+
+        Events of other kinds are dropped: a late 'tts_done' from a promo
+        phrase means nothing to a dialog waiting for speech.
+        """
+        deadline = None if timeout is None else self.loop.time() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - self.loop.time()
+            if remaining is not None and remaining <= 0:
+                return None
+            try:
+                event = await asyncio.wait_for(self._events.get(), remaining)
+            except asyncio.TimeoutError:
+                return None
+            if not kinds or event.kind in kinds:
+                return event
+            logger.debug(f"Ignoring event {event.kind}")
+
+    def clear_events(self):
+        """Forget everything posted so far (e.g. speech heard before a session)."""
+        while not self._events.empty():
+            self._events.get_nowait()
+
+    # --- mosty ---
+
+    async def run_blocking(self, fn, *args):
+        """Run a blocking call (audio device, Vosk, SQLite) in the executor."""
+        return await self.loop.run_in_executor(None, fn, *args)
+
+    async def say(self, tts, text):
+        """Speak text and return once it has been played, without blocking the loop."""
+        done = self.loop.create_future()
+
+        def finished():
+            self.loop.call_soon_threadsafe(lambda: done.done() or done.set_result(None))
+
+        tts.speak(text, on_done=finished)
+        await done
+
+    async def say_stream(self, tts, produce):
+        """Speak sentences as a blocking producer hands them over.
+
+        produce(emit) runs in the executor and calls emit(sentence) for each
+        sentence; TTS starts on the first one right away. emit returns False
+        once the reply was interrupted. Returns produce's result after
+        everything has been played.
+        """
+        generation = tts.generation
+        played = []
+
+        def emit(sentence):
+            if tts.generation != generation:
+                return False  # barge-in: reszty nikt już nie słucha
+            done = Future()
+            played.append(done)
+            tts.speak(sentence, on_done=lambda: done.done() or done.set_result(None))
+            return True
+
+        result = await self.run_blocking(produce, emit)
+        if played:
+            # Kolejka TTS jest FIFO - koniec ostatniego zdania to koniec całości
+            await asyncio.wrap_future(played[-1])
+        return result
+
+    def ui(self, fn, *args):
+        """Schedule a Tk call on Tk's own main loop."""
+        if self.ui_queue is not None:
+            self.ui_queue.post(fn, *args)
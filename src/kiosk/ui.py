@@ -0,0 +1,116 @@
+"""
+Tk side of the kiosk: one UI queue and the microphone level meter.
+
+Tk may only be touched from its own main loop. Worker threads (asyncio
+loop, microphone, TTS) never call it; they ``post()`` a callable to
+``UIQueue``, which Tk drains on a fixed-rate ``after`` tick. The same tick
+animates ``LevelMeter`` from the loudest frame of the last STT block, read as a plain
+float, so the microphone thread never waits on the screen.
+"""
+import logging
+import math
+import queue
+
+try:
+    from src.config.settings import UI_TICK_MS, LEVEL_METER_BARS, NOISE_GATE_THRESHOLD
+except ImportError:
+    UI_TICK_MS, LEVEL_METER_BARS, NOISE_GATE_THRESHOLD = 33, 16, 500
+
+logger = logging.getLogger(__name__)
+
+
+class UIQueue:
+    """Thread-safe hand-over of UI changes, drained by Tk every tick_ms."""
+
+    def __init__(self, root, tick_ms=UI_TICK_MS, max_per_tick=50):
+        self.root = root
+        self.tick_ms = tick_ms
+        self.max_per_tick = max_per_tick
+        self._queue = queue.SimpleQueue()
+        self._animations = []
+        self._running = False
+        self.ticks = 0
+
+    def post(self, fn, *args):
+        """Run fn(*args) on the Tk thread at the next tick; safe from any thread."""
+        self._queue.put((fn, args))
+
+    def animate(self, fn):
+        """Call fn() on every tick (Tk thread) - e.g. LevelMeter.tick."""
+        self._animations.append(fn)
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self.root.after(self.tick_ms, self._tick)
+
+    def stop(self):
+        self._running = False
+
+    def _tick(self):
+        if not self._running:
+            return
+        self.ticks += 1
+        try:
+            self.drain(self.max_per_tick)
+            for fn in self._animations:
+                fn()
+        finally:
+            self.root.after(self.tick_ms, self._tick)
+
+    def drain(self, limit=None):
+        """Run queued UI changes (at most limit); returns how many ran."""
+        done = 0
+        while limit is None or done < limit:
+            try:
+                fn, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            done += 1
+            try:
+                fn(*args)
+            except Exception:
+                logger.exception("UI update failed")
+        return done
+
+
+class LevelMeter:
+    """Bar meter on a Tk canvas; canvas items are created once and only recoloured."""
+
+    def __init__(self, canvas, source, x, y, width, height, bars=LEVEL_METER_BARS,
+                 floor=NOISE_GATE_THRESHOLD / 4, ceiling=12000.0, release=0.85,
+                 on_color="white", off_color="#f7b56d"):
+        self.canvas = canvas
+        self.source = source  # () -> energia ramki (RMS int16) albo 0, gdy kiosk nie słucha
+        self.bars = bars
+        self.release = release  # ułamek wskazania zostający po każdym takcie (opadanie)
+        self.on_color, self.off_color = on_color, off_color
+        self._log_floor = math.log10(floor)
+        self._log_span = math.log10(ceiling) - self._log_floor
+        self.display = 0.0
+        self.lit = 0
+        gap = 2
+        bar_w = (width - gap * (bars - 1)) / bars
+        self.items = [
+            canvas.create_rectangle(x + i * (bar_w + gap), y, x + i * (bar_w + gap) + bar_w, y + height,
+                                    fill=off_color, outline="")
+            for i in range(bars)
+        ]
+
+    def fraction(self, level):
+        """Energy on a log scale between floor and ceiling, 0..1."""
+        if level <= 0:
+            return 0.0
+        return min(1.0, max(0.0, (math.log10(level) - self._log_floor) / self._log_span))
+
+    def tick(self):
+        # Szybki atak, powolne opadanie - wskaźnik nie migocze między sylabami
+        self.display = max(self.fraction(self.source()), self.display * self.release)
+        lit = round(self.display * self.bars)
+        if lit == self.lit:
+            return
+        low, high = min(lit, self.lit), max(lit, self.lit)
+        color = self.on_color if lit > self.lit else self.off_color
+        for item in self.items[low:high]:
+            self.canvas.itemconfig(item, fill=color)
+        self.lit = lit
@@ -5,29 +5,90 @@ import threading
 import time
 import tkinter as tk
 
-from PIL import Image, ImageTk
+from PIL import ImageTk
 
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from src.audio.devices import open_input, open_output
+from src.kiosk.orchestrator import BUTTON, STT_FINAL, TTS_DONE, WAKE, Orchestrator
+from src.kiosk.assets import AssetCache, scaled_size
+from src.kiosk.ui import LevelMeter, UIQueue
+from src.nlp.llm import LLMFallback
 from src.nlp.processor import NLPProcessor
+from src.nlp.speculation import ResponseSpeculator
+from src.storage.archive import AudioArchive
+from src.storage.interactions import InteractionStore
+from src.stt.bargein import BargeInDetector
 from src.stt.engine import STTEngine
+from src.stt.wake import WakeWordDetector
+from src.telemetry.health import RingLog, Supervisor
+from src.telemetry.tracing import tracer
 from src.tts.engine import TTSEngine
 
+try:
+    from src.config.settings import (
+        TTS_PREWARM, STT_SPECULATION, TRACING_ENABLED, ARCHIVE_ENABLED, INTERACTIONS_ENABLED,
+        DIALOG_IDLE_TIMEOUT, PROMO_INTERVAL, ENABLE_BARGE_IN,
+        HEALTH_ENABLED, TTS_STALL_S, STT_STALL_S, LOOP_STALL_S, LLM_ENABLED, AUDIO_OUTPUT,
+        WAKE_ENABLED, WAKE_PHRASES,
+    )
+except ImportError:
+    TTS_PREWARM, STT_SPECULATION, TRACING_ENABLED, ARCHIVE_ENABLED, INTERACTIONS_ENABLED = True, True, False, True, True
+    DIALOG_IDLE_TIMEOUT, PROMO_INTERVAL, ENABLE_BARGE_IN = 15, 15, True
+    HEALTH_ENABLED, TTS_STALL_S, STT_STALL_S, LOOP_STALL_S = True, 60, 5, 10
+    LLM_ENABLED, AUDIO_OUTPUT = False, "device"
+    WAKE_ENABLED, WAKE_PHRASES = True, ["hej araks", "cześć araks", "araks"]
+
 
 class KarkandakiKiosk:
-    def __init__(self, root):
+    def __init__(self, root, audio_input=None, audio_output=None):
         self.root = root
         self.root.attributes("-fullscreen", True)
         self.root.configure(bg="#f9a03f")
 
-        self.tts = TTSEngine()
-        self.stt = STTEngine()
+        if TRACING_ENABLED:
+            tracer.start()
+
+        # Tk dotykamy tylko z jego pętli: wątki wrzucają zmiany do kolejki, takt ją opróżnia
+        self.ui = UIQueue(root)
+        self.assets = AssetCache()
+        self.meter = None
+        # Jedna pętla zdarzeń: wyniki STT, koniec wypowiedzi, przycisk, limity czasu
+        self.orchestrator = Orchestrator(self.ui)
+        # Prawdziwy mikrofon i głośniki albo wirtualne (benchmarks/soak.py, CI bez karty dźwiękowej)
+        self.microphone = audio_input or open_input()
+        self.speaker = audio_output or open_output(AUDIO_OUTPUT, self.microphone)
+        self.tts = TTSEngine(loop=self.orchestrator.loop, output=self.speaker)
+        self.stt = STTEngine(audio_input=self.microphone)
+        self.stt.on_text = self.orchestrator.poster(STT_FINAL)
         self.nlp = NLPProcessor()
+        self.speculator = ResponseSpeculator(self.nlp, prefetch=self.tts.prefetch)
+        if STT_SPECULATION:
+            self.stt.on_partial = self.speculator.on_partial
+        # Model tylko dla pytań, na które reguły nie mają odpowiedzi
+        self.llm = LLMFallback(self.nlp.store) if LLM_ENABLED else None
+        if self.llm:
+            self.orchestrator.executor.submit(self.llm.warm)
+        self.archive = AudioArchive() if ARCHIVE_ENABLED else None
+        self.session_id = None
+        self.last_audio_ref = None
+        if self.archive:
+            self.stt.on_utterance = self._archive_utterance
+        self.interactions = InteractionStore() if INTERACTIONS_ENABLED else None
+        self.barge_in = BargeInDetector(self.tts.echo) if ENABLE_BARGE_IN else None
+        # Ustawiane w wątku mikrofonu przed wyciszeniem TTS - pętla dialogu wie o przerwaniu, zanim say() wróci
+        self.barged_in = threading.Event()
+        if self.barge_in:
+            self.stt.on_barge_in = self._on_barge_in
+        # "Hej Araks" zamiast przycisku: tani detektor na strumieniu mikrofonu między sesjami
+        self.wake = None
+        if WAKE_ENABLED:
+            self.wake = WakeWordDetector(self.stt.keyword_recognizer(WAKE_PHRASES), WAKE_PHRASES, echo=self.tts.echo)
+            self.stt.on_wake = self._on_wake
+            self.stt.arm_wake(self.wake)
 
         self.mode = "PROMO"
-        self.last_interaction = time.time()
-        self.stop_promo = threading.Event()
 
         self.promo_playlist = [
             "Karkandaki to zdrowsza alternatywa dla fastfoodów.",
@@ -36,13 +97,25 @@ class KarkandakiKiosk:
         ]
 
         self._setup_ui()
-        self.start_promo_thread()
+        self.ui.start()
+        self.orchestrator.start(self._run)
+
+        # Nadzór: zasoby co kilka sekund do pliku kołowego, zawieszone TTS/STT restartowane na miejscu
+        self.supervisor = None
+        if HEALTH_ENABLED:
+            self.supervisor = Supervisor(RingLog())
+            self.supervisor.watch("tts", self.tts.health, self.tts.restart, TTS_STALL_S)
+            self.supervisor.watch("stt", self.stt.health, self.stt.restart_capture, STT_STALL_S)
+            self.supervisor.watch("loop", self.orchestrator.health, stall_after=LOOP_STALL_S)
+            self.supervisor.start()
+
+        if TTS_PREWARM:
+            self.tts.prewarm(self.promo_playlist + self.nlp.static_responses())
 
     def _setup_ui(self):
         try:
-            img = Image.open("src/assets/images/karkandaki_box.jpg").resize(
-                (700, 450), Image.Resampling.LANCZOS
-            )
+            screen = (self.root.winfo_screenwidth(), self.root.winfo_screenheight())
+            img = self.assets.get("src/assets/images/karkandaki_box.jpg", scaled_size((700, 450), screen))
             self.photo = ImageTk.PhotoImage(img)
             self.label = tk.Label(self.root, image=self.photo, bg="#f9a03f")
             self.label.pack(pady=20)
@@ -56,6 +129,12 @@ class KarkandakiKiosk:
             )
             self.status_label.pack(pady=10)
 
+            # Wskaźnik poziomu mikrofonu: klient widzi, że kiosk go słyszy
+            meter_canvas = tk.Canvas(self.root, width=320, height=24, bg="#f9a03f", highlightthickness=0)
+            meter_canvas.pack()
+            self.meter = LevelMeter(meter_canvas, self._mic_level, 0, 0, 320, 24)
+            self.ui.animate(self.meter.tick)
+
             self.canvas = tk.Canvas(
                 self.root, width=200, height=200, bg="#f9a03f", highlightthickness=0
             )
@@ -77,54 +156,122 @@ class KarkandakiKiosk:
             print(f"[UI ERROR] {e}")
 
     def toggle_mode(self):
-        if self.mode == "PROMO":
-            self.mode = "DIALOG"
-            self.canvas.itemconfig(self.circle, fill="#ff4444")
-            self.canvas.itemconfig(self.btn_text, text="STOP", fill="white")
-            threading.Thread(target=self._dialog_session, daemon=True).start()
-        else:
-            self.mode = "PROMO"
-            self._reset_ui()
+        # Naciśnięcie to tylko zdarzenie - tryb zmienia pętla kiosku
+        self.orchestrator.post(BUTTON)
+
+    def close(self):
+        """Stop every thread and release devices and files (end of a soak run)."""
+        self.ui.stop()
+        if self.supervisor:
+            self.supervisor.stop()
+        self.orchestrator.stop()
+        self.stt.close()
+        self.tts.stop()
+        self.microphone.close()
+        for store in (self.archive, self.interactions, self.nlp):
+            if store:
+                store.close()
+        if TRACING_ENABLED:
+            tracer.stop()
+
+    def _mic_level(self):
+        # Zwykły odczyt liczby z wątku mikrofonu - bez blokad i bez kopiowania dźwięku
+        return self.stt.vad.peak if self.stt.is_listening else 0.0
+
+    def _show_dialog_ui(self):
+        self.mode = "DIALOG"
+        self.canvas.itemconfig(self.circle, fill="#ff4444")
+        self.canvas.itemconfig(self.btn_text, text="STOP", fill="white")
 
     def _reset_ui(self):
+        self.mode = "PROMO"
         self.canvas.itemconfig(self.circle, fill="white")
         self.canvas.itemconfig(self.btn_text, text="START", fill="#f9a03f")
         self.status_label.config(text="ZAPYTAJ MNIE O COKOLWIEK")
 
-    def start_promo_thread(self):
-        def promo_loop():
-            while not self.stop_promo.is_set():
-                if self.mode == "PROMO":
-                    msg = random.choice(self.promo_playlist)
-                    self.tts.speak_wait(msg)
-                    time.sleep(15)
-                time.sleep(1)
+    async def _run(self):
+        while True:
+            await self._promo()
+            await self._dialog_session()
+
+    async def _promo(self):
+        """Promo phrases after every PROMO_INTERVAL s of quiet, until the button or the wake phrase."""
+        while True:
+            if await self.orchestrator.next_event(BUTTON, WAKE, timeout=PROMO_INTERVAL):
+                return
+            self.tts.speak(random.choice(self.promo_playlist), on_done=self.orchestrator.poster(TTS_DONE))
+            event = await self.orchestrator.next_event(BUTTON, WAKE, TTS_DONE)
+            if event.kind != TTS_DONE:
+                return
+
+    def _archive_utterance(self, audio, text):
+        # Kompresja i zapis w wątku archiwum, nie w wątku mikrofonu
+        self.last_audio_ref = self.archive.submit(audio, 16000, session=self.session_id, text=text)
 
-        threading.Thread(target=promo_loop, daemon=True).start()
+    def _on_barge_in(self, onset):
+        # Wątek mikrofonu: najpierw cisza, potem słuchamy (pre-roll zawiera początek wypowiedzi klienta).
+        # Flaga przed interrupt(): on_done kończy say() od razu, a start_listening() trwa (pre-roll przez Vosk)
+        self.barged_in.set()
+        self.tts.interrupt()
+        tracer.record("bargein.onset_to_silence", time.perf_counter() - onset)
+        self.stt.start_listening()
 
-    def _dialog_session(self):
-        print("[DIALOG] Wątek wystartował.")
+    def _on_wake(self):
+        # Wątek mikrofonu; w trakcie sesji (przerwa między turami) fraza nic nie zmienia
+        if self.mode == "PROMO":
+            self.orchestrator.post(WAKE)
+
+    def _record_turn(self, text, intent, resp, nlp_s, tts_s):
+        if not self.interactions:
+            return
+        self.interactions.record(self.session_id, "user", text, intent=intent,
+                                 latencies={"nlp": round(nlp_s * 1000, 1)}, audio_ref=self.last_audio_ref)
+        self.interactions.record(self.session_id, "kiosk", resp, intent=intent,
+                                 latencies={"tts": round(tts_s * 1000, 1)})
+
+    async def _dialog_session(self):
+        print("[DIALOG] Sesja wystartowała.")
+        self.orchestrator.ui(self._show_dialog_ui)
         try:
-            self.stt.start_listening()
-            self.last_interaction = time.time()
-            while self.mode == "DIALOG":
-                if time.time() - self.last_interaction > 15:
-                    break
+            tracer.begin_turn()
+            self.session_id = time.strftime("%Y%m%d_%H%M%S")
+            self.speculator.reset()
+            self.orchestrator.clear_events()
+            await self.orchestrator.run_blocking(self.stt.start_listening)
 
-                text = self.stt.get_text()
-                if text:
-                    print(f"[STT] Rozpoznano: {text}")
-                    self.last_interaction = time.time()
-                    resp = self.nlp.generate_response(text)
-                    self.tts.speak_wait(resp)
+            # Czekamy na frazę, ponowne naciśnięcie albo ciszę - bez odpytywania
+            event = await self.orchestrator.next_event(BUTTON, STT_FINAL, timeout=DIALOG_IDLE_TIMEOUT)
+            while event is not None and event.kind == STT_FINAL:
+                text = event.payload
+                print(f"[STT] Rozpoznano: {text}")
+                # Własnego głosu nie rozpoznajemy; klienta, który wchodzi w słowo, wyłapie barge-in
+                await self.orchestrator.run_blocking(self.stt.stop_listening)
+                started = time.perf_counter()
+                intent, resp = await self.orchestrator.run_blocking(self.speculator.resolve, text)
+                resolved = time.perf_counter()
+                self.barged_in.clear()
+                if self.barge_in:
+                    self.stt.arm_barge_in(self.barge_in)
+                if self.llm and self.nlp.is_fallback(resp):
+                    # Zdania modelu idą do TTS na bieżąco; bez zdania w budżecie - zwykła odpowiedź
+                    answer = await self.orchestrator.say_stream(self.tts, lambda emit: self.llm.answer(text, emit))
+                    resp = answer.text
+                else:
+                    await self.orchestrator.say(self.tts, resp)
+                self.stt.disarm_barge_in()
+                self._record_turn(text, intent, resp, resolved - started, time.perf_counter() - resolved)
+                if not self.barged_in.is_set():
                     break
-                time.sleep(0.1)
+                # Klient przerwał odpowiedź - STT słucha (albo za chwilę zacznie) jego nowej frazy
+                event = await self.orchestrator.next_event(BUTTON, STT_FINAL, timeout=DIALOG_IDLE_TIMEOUT)
         except Exception as e:
             print(f"[DIALOG ERROR] {e}")
         finally:
-            self.stt.stop_listening()
-            self.mode = "PROMO"
-            self.root.after(0, self._reset_ui)
+            await self.orchestrator.run_blocking(self.stt.stop_listening)
+            print(f"[SPECULATION] {self.speculator.stats()}")
+            if self.wake:
+                print(f"[WAKE] {self.wake.stats()}")
+            self.orchestrator.ui(self._reset_ui)
 
 
 if __name__ == "__main__":
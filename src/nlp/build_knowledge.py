@@ -0,0 +1,319 @@
+"""
+Build the compiled knowledge artifact from every knowledge source.
+
+Domain data lives in several places: data/knowledge.json, data/menu.json,
+data/qa.json, src/config/knowledge.py (MENU, KARKANDAKI_INFO, LOKAL_INFO,
+RECORD_RULES) and src/config/settings.py (ALLERGENS_DB, FORBIDDEN_TOPICS).
+This command merges them, refuses to build when they contradict each
+other (prices, allergens, phone, delivery cost, language) and writes one
+versioned JSON file with ready response texts, the business rules and
+the precompiled intent/retrieval index (normalized keywords, trigrams),
+which NLPProcessor loads with a single read instead of the raw files.
+While knowledge.json or qa.json is newer than the artifact, the kiosk
+answers from the raw files until it is rebuilt.
+
+Usage:
+    python -m src.nlp.build_knowledge [--exclude menu.json] [--output path]
+"""
+import argparse
+import hashlib
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+from src.nlp.knowledge import ARTIFACT_NAME, ARTIFACT_SCHEMA, validate_artifact
+from src.nlp.matcher import normalize
+from src.nlp.processor import build_rules, dish_response, index_knowledge
+from src.nlp.retrieval import fold
+
+DATA_DIR = Path("data")
+KIOSK_LANGUAGE = "pl"
+
+# Te same dania mają w każdym źródle inny klucz - tu jedno id na danie
+DISH_ALIASES = {
+    "ormianski": ("ormiańskie", "karkandak_ziemniaki"),
+    "mieso": ("mięso", "karkandak_wytrawny_mieso"),
+    "grzyby": ("grzyby", "karkandak_grzyby"),
+    "kapusta": ("kapusta",),
+    "kaukaski": ("soczewica",),
+    "nutella": ("nutella", "karkandak_slodki_nutella"),
+    "twarog_miod": ("twaróg_miód",),
+}
+_ALIAS_TO_ID = {alias: dish_id for dish_id, aliases in DISH_ALIASES.items() for alias in aliases}
+
+_CYRILLIC = re.compile(r"[Ѐ-ӿ]")
+_LETTER = re.compile(r"[^\W\d_]")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+class KnowledgeConflict(ValueError):
+    """The sources disagree; ``problems`` lists every disagreement found."""
+
+    def __init__(self, problems):
+        super().__init__("\n".join(problems))
+        self.problems = problems
+
+
+def dish_id(key):
+    return _ALIAS_TO_ID.get(key, fold(key).replace(" ", "_"))
+
+
+def parse_price(value):
+    """8, 8.0 or '8 zł' -> 8; None when there is no number."""
+    if isinstance(value, (int, float)):
+        return value
+    found = _NUMBER.search(str(value))
+    if not found:
+        return None
+    number = float(found.group().replace(",", "."))
+    return int(number) if number.is_integer() else number
+
+
+def allergen(name):
+    """'Gluten (z mąki)' -> 'gluten', 'masło' -> 'maslo'."""
+    return fold(name.split("(")[0])
+
+
+def language(data):
+    """'uk' when most letters in the source are Cyrillic, else the kiosk language."""
+    text = " ".join(_strings(data))
+    letters = len(_LETTER.findall(text))
+    return "uk" if letters and len(_CYRILLIC.findall(text)) > letters / 2 else KIOSK_LANGUAGE
+
+
+def _strings(data):
+    if isinstance(data, str):
+        yield data
+    elif isinstance(data, dict):
+        for value in data.values():
+            yield from _strings(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from _strings(value)
+
+
+def _facts(field, text):
+    """The part of a free-text field two sources must agree on."""
+    if field == "hours":
+        return re.findall(r"\d{1,2}:\d{2}", str(text))
+    return "".join(re.findall(r"\d", str(text)))
+
+
+def _load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def collect_sources(data_dir=DATA_DIR, exclude=()):
+    """Every knowledge source by name; excluded or missing files are left out."""
+    from src.config import knowledge as config_knowledge
+    from src.config import settings as config_settings
+
+    sources = {}
+    for name in ("knowledge.json", "menu.json", "qa.json"):
+        path = Path(data_dir) / name
+        if name not in exclude and path.exists():
+            sources[name] = _load_json(path)
+    if "config.knowledge" not in exclude:
+        sources["config.knowledge"] = {
+            "MENU": config_knowledge.MENU,
+            "KARKANDAKI_INFO": config_knowledge.KARKANDAKI_INFO,
+            "LOKAL_INFO": config_knowledge.LOKAL_INFO,
+            "RECORD_RULES": config_knowledge.RECORD_RULES,
+        }
+    if "config.settings" not in exclude:
+        sources["config.settings"] = {
+            "ALLERGENS_DB": config_settings.ALLERGENS_DB,
+            "FORBIDDEN_TOPICS": config_settings.FORBIDDEN_TOPICS,
+            "MIN_AGE_RECORD": config_settings.MIN_AGE_RECORD,
+        }
+    return sources
+
+
+class _Merger:
+    """Accumulates facts per dish with the source each one came from."""
+
+    def __init__(self):
+        self.dishes = {}
+        self.problems = []
+
+    def dish(self, key):
+        return self.dishes.setdefault(dish_id(key), {
+            "id": dish_id(key), "prices": {}, "allergens": {}, "implied": {}, "sources": [],
+        })
+
+    def add(self, source, key, name=None, price=None, description=None, ingredients=None,
+            allergens=None, **extra):
+        dish = self.dish(key)
+        dish["sources"].append(source)
+        if name and "name" not in dish:
+            dish["name"] = name
+        if description and "description" not in dish:
+            dish["description"] = description
+        if ingredients and "ingredients" not in dish:
+            dish["ingredients"] = list(ingredients)
+        if price is not None:
+            dish["prices"][source] = parse_price(price)
+        if allergens is not None:
+            dish["allergens"][source] = {allergen(a) for a in allergens}
+        for field, value in extra.items():
+            if value is not None:
+                dish.setdefault(field, value)
+
+    def check(self):
+        for dish in self.dishes.values():
+            label = dish.get("name", dish["id"])
+            prices = set(dish["prices"].values())
+            if None in prices or len(prices) > 1:
+                listed = ", ".join(f"{s}: {p}" for s, p in dish["prices"].items())
+                self.problems.append(f"Cena '{label}' się nie zgadza ({listed})")
+            declared = list(dish["allergens"].items())
+            if len({frozenset(a) for _, a in declared}) > 1:
+                listed = "; ".join(f"{s}: {', '.join(sorted(a))}" for s, a in declared)
+                self.problems.append(f"Alergeny '{label}' się nie zgadzają ({listed})")
+            for source, required in dish["implied"].items():
+                for declared_in, found in declared:
+                    missing = required - found
+                    if missing:
+                        self.problems.append(
+                            f"Alergeny '{label}' w {declared_in} pomijają {', '.join(sorted(missing))} "
+                            f"(wg {source})"
+                        )
+
+    def compiled_dishes(self):
+        dishes = []
+        for dish in self.dishes.values():
+            if "name" not in dish or not dish["prices"]:
+                self.problems.append(f"Danie '{dish['id']}' bez nazwy lub ceny ({', '.join(dish['sources'])})")
+                continue
+            compiled = {k: v for k, v in dish.items() if k not in ("prices", "allergens", "implied")}
+            compiled["price"] = next(iter(dish["prices"].values()))
+            compiled.setdefault("description", "")
+            compiled["allergens"] = sorted(
+                set().union(*dish["allergens"].values(), *dish["implied"].values())
+            )
+            compiled["keyword"] = normalize(compiled["name"])
+            compiled["response"] = dish_response(compiled)
+            dishes.append(compiled)
+        return dishes
+
+
+def merge(sources):
+    """Merged knowledge artifact content; raises KnowledgeConflict on disagreement."""
+    merger = _Merger()
+    problems = merger.problems
+
+    for name in ("menu.json", "qa.json"):
+        if name in sources and language(sources[name]) != KIOSK_LANGUAGE:
+            problems.append(
+                f"{name} jest w języku '{language(sources[name])}', kiosk mówi '{KIOSK_LANGUAGE}' "
+                f"(pomiń: --exclude {name})"
+            )
+
+    knowledge = sources.get("knowledge.json", {})
+    for dish in knowledge.get("dishes", []):
+        merger.add("knowledge.json", dish["id"], dish.get("name"), dish.get("price"),
+                   dish.get("description"), dish.get("ingredients"), dish.get("allergens"),
+                   recommendation=dish.get("recommendation"))
+
+    for category in sources.get("menu.json", {}).get("categories", []):
+        for item in category.get("items", []):
+            merger.add("menu.json", item["id"], item.get("name"), item.get("price"),
+                       item.get("description"), item.get("ingredients"))
+
+    config = sources.get("config.knowledge", {})
+    for key, item in config.get("MENU", {}).items():
+        merger.add("config.knowledge.MENU", key, item.get("nazwa"), item.get("cena"),
+                   item.get("opis"), type=item.get("typ"), spiciness=item.get("ostrosc"))
+
+    for key, allergens in sources.get("config.settings", {}).get("ALLERGENS_DB", {}).items():
+        merger.add("config.settings.ALLERGENS_DB", key, allergens=allergens)
+
+    # KARKANDAKI_INFO: ciasto jest w każdym daniu, pozostałe klucze to pojedyncze dania
+    for key, allergens in config.get("KARKANDAKI_INFO", {}).get("alergeny", {}).items():
+        implied = {allergen(a) for a in ([allergens] if isinstance(allergens, str) else allergens)}
+        targets = merger.dishes.values() if key == "ciasto" else [merger.dish(key)]
+        for dish in targets:
+            dish["implied"].setdefault("config.knowledge.KARKANDAKI_INFO", set()).update(implied)
+
+    merger.check()
+    dishes = merger.compiled_dishes()
+
+    restaurant = dict(knowledge.get("restaurant", {}))
+    lokal = config.get("LOKAL_INFO", {})
+    for field, lokal_field in (("phone", "telefon"), ("hours", "godziny_otwarcia"),
+                               ("delivery", "dowoz"), ("address", "adres")):
+        if lokal_field not in lokal:
+            continue
+        if field not in restaurant:
+            restaurant[field] = lokal[lokal_field]
+        elif field == "address":
+            continue  # opisowo w knowledge.json, formalnie w LOKAL_INFO - nie porównujemy
+        elif _facts(field, restaurant[field]) != _facts(field, lokal[lokal_field]):
+            problems.append(
+                f"'{field}' się nie zgadza: knowledge.json '{restaurant[field]}' "
+                f"vs LOKAL_INFO '{lokal[lokal_field]}'"
+            )
+
+    if problems:
+        raise KnowledgeConflict(problems)
+
+    merged = {"restaurant": restaurant, "dishes": dishes, "faq": knowledge.get("faq", {})}
+    merged["responses"] = {
+        "prices": "Nasze ceny: " + ", ".join(f"{d['name']} {d['price']} zł" for d in dishes) + ".",
+    }
+    qa = sources.get("qa.json", {})
+    return {
+        "knowledge": merged,
+        "qa": qa,
+        "rules": build_rules(config, sources.get("config.settings", {})),
+        "index": index_knowledge(merged, qa),
+    }
+
+
+def build_artifact(data_dir=DATA_DIR, exclude=()):
+    sources = collect_sources(data_dir, exclude)
+    content = merge(sources)
+    digest = hashlib.sha256(
+        json.dumps(content, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    artifact = {
+        "schema": ARTIFACT_SCHEMA,
+        "version": digest[:12],
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "sources": sorted(sources),
+        **content,
+    }
+    validate_artifact(artifact)
+    return artifact
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the compiled knowledge artifact")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--exclude", action="append", default=[],
+                        help="source to leave out, e.g. menu.json or config.knowledge")
+    args = parser.parse_args(argv)
+
+    try:
+        artifact = build_artifact(args.data_dir, args.exclude)
+    except KnowledgeConflict as e:
+        print(f"❌ Źródła wiedzy są sprzeczne ({len(e.problems)}):")
+        for problem in e.problems:
+            print(f"  - {problem}")
+        return 1
+
+    output = Path(args.output or Path(args.data_dir) / ARTIFACT_NAME)
+    tmp = output.with_suffix(".part")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, ensure_ascii=False, indent=1)
+    tmp.replace(output)  # kiosk z hot reloadem nigdy nie zobaczy połowy pliku
+    print(f"✅ Wiedza {artifact['version']}: {len(artifact['knowledge']['dishes'])} dań -> {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
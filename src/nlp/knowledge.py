@@ -0,0 +1,213 @@
+"""Versioned knowledge snapshots with hot reload.
+
+The knowledge files are watched by mtime from a background thread. A
+changed file is parsed, validated and compiled there, and only a fully
+built snapshot is swapped in (a single reference assignment), so a query
+always sees one consistent version and never waits for a reload.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class KnowledgeSnapshot(NamedTuple):
+    version: int
+    sources: Dict[str, Any]  # nazwa źródła -> sparsowany JSON
+    compiled: Any            # to, co zwróciła funkcja compile (np. matcher intencji)
+    loaded_at: float
+
+
+def validate_knowledge(data):
+    """Raise ValueError when knowledge.json would break the answers."""
+    if not isinstance(data, dict):
+        raise ValueError("knowledge must be an object")
+    for dish in data.get('dishes', []):
+        for field in ('name', 'price', 'description'):
+            if field not in dish:
+                raise ValueError(f"dish {dish.get('id', '?')} has no '{field}'")
+        if not isinstance(dish['price'], (int, float)) or dish['price'] <= 0:
+            raise ValueError(f"dish {dish['name']} has invalid price {dish['price']!r}")
+    if not isinstance(data.get('restaurant', {}), dict):
+        raise ValueError("'restaurant' must be an object")
+    faq = data.get('faq', {})
+    if not isinstance(faq, dict) or not all(isinstance(v, str) for v in faq.values()):
+        raise ValueError("'faq' must map questions to answer strings")
+
+
+def validate_qa(data):
+    if not isinstance(data, dict):
+        raise ValueError("qa must be an object")
+    for item in data.get('questions', []):
+        if 'answer' not in item:
+            raise ValueError(f"question {item.get('id', '?')} has no answer")
+
+
+ARTIFACT_NAME = "knowledge.compiled.json"
+ARTIFACT_SCHEMA = 2  # 2: gotowy indeks matchera i retrievera
+
+
+def validate_artifact(data):
+    """Raise ValueError unless data is a compiled artifact this code can read."""
+    if not isinstance(data, dict) or data.get('schema') != ARTIFACT_SCHEMA:
+        raise ValueError(f"not a knowledge artifact of schema {ARTIFACT_SCHEMA}")
+    validate_knowledge(data.get('knowledge', {}))
+    validate_qa(data.get('qa', {}))
+    index = data.get('index')
+    if not isinstance(index, dict) or not all(key in index for key in ('intents', 'matcher', 'retrieval')):
+        raise ValueError("artifact has no precompiled index")
+
+
+class KnowledgeStore:
+    """Holds the current knowledge snapshot and reloads it when files change.
+
+    ``paths`` maps source names to JSON files; a missing file is an empty
+    source. ``validators`` are checked before ``compile(sources)`` builds
+    whatever the NLP layer needs. A source that fails to parse or validate
+    is logged and the previous snapshot stays in service.
+
+    ``needed(name, sources)`` can leave a source unread this time (its file
+    is still watched): it is asked in ``paths`` order, with the sources read
+    so far, and a source it declines is simply absent from ``sources``.
+    """
+
+    def __init__(self, paths, compile=None, validators=None, interval=0.5, needed=None):
+        self.paths = dict(paths)
+        self.compile = compile or (lambda sources: None)
+        self.validators = validators or {}
+        self.needed = needed or (lambda name, sources: True)
+        self.interval = interval
+        self.reloads = 0
+        self.failures = 0
+        self._stamps = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.current = self._build(self._read_all(initial=True), version=1)
+
+    def _stamp(self, path):
+        try:
+            st = os.stat(path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def _read(self, name, path):
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if name in self.validators:
+            self.validators[name](data)
+        return data
+
+    def _read_all(self, initial=False):
+        sources = {}
+        for name, path in self.paths.items():
+            self._stamps[name] = self._stamp(path)
+            if not self.needed(name, sources):
+                continue
+            try:
+                sources[name] = self._read(name, path)
+            except (OSError, ValueError) as e:
+                if not initial:
+                    raise
+                # Przy starcie kiosk musi wstać nawet z zepsutym plikiem
+                logger.error(f"Błędny plik wiedzy {path}: {e}")
+                sources[name] = {}
+        return sources
+
+    def _build(self, sources, version):
+        return KnowledgeSnapshot(version, sources, self.compile(sources), time.time())
+
+    def changed(self):
+        """True when any watched file differs from the loaded one."""
+        return any(self._stamp(path) != self._stamps.get(name) for name, path in self.paths.items())
+
+    def reload(self):
+        """Rebuild from disk and swap in; returns False (keeping the old one) on bad data."""
+        try:
+            sources = self._read_all()
+            snapshot = self._build(sources, self.current.version + 1)
+        except (OSError, ValueError) as e:
+            self.failures += 1
+            logger.warning(f"⚠️ Wiedza nie przeładowana, zostaje wersja {self.current.version}: {e}")
+            return False
+        self.current = snapshot
+        self.reloads += 1
+        logger.info(f"🔄 Wiedza przeładowana: wersja {snapshot.version}")
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            if self.changed():
+                self.reload()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="knowledge-watch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+
+class VersionedMemo:
+    """Bounded LRU of query -> response that forgets everything on a new version."""
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self.version:
+            self._items.clear()
+            self.version = version
+
+    def get(self, version, key):
+        with self._lock:
+            self._check_version(version)
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, version, key):
+        """Cached value without counting a hit or miss or refreshing its LRU position."""
+        with self._lock:
+            return self._items.get(key) if version == self.version else None
+
+    def put(self, version, key, value):
+        with self._lock:
+            self._check_version(version)
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
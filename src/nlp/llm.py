@@ -0,0 +1,301 @@
+"""
+Local LLM fallback for questions the deterministic rules do not cover.
+
+Runs only after ``NLPProcessor.match`` gave up. The question goes to a
+local Ollama server (``/api/chat``, streamed NDJSON) with SYSTEM_PROMPT and
+the current knowledge base. Tokens are cut into sentences as they arrive
+and each sentence is handed to TTS at once, so the customer hears the
+first one while the model is still writing the rest.
+
+  * Budget: no sentence within LLM_FIRST_SENTENCE_S -> the usual canned
+    reply is spoken instead and the model is abandoned; a stream stalled
+    later on is cut off where it is.
+  * Guard: every sentence is checked before it is spoken. A price that is
+    not in the knowledge base or any allergen/diet claim stops the answer
+    and the verified price list or the operator referral is spoken instead.
+    A question on a forbidden topic (rules of the knowledge base) never
+    reaches the model.
+  * Cache: complete, guard-clean answers are replayed for the same
+    normalized question until the knowledge base changes.
+"""
+import contextlib
+import json
+import logging
+import queue
+import re
+import threading
+import time
+import urllib.request
+from typing import NamedTuple, Optional
+
+from src.config.knowledge import SYSTEM_PROMPT
+from src.nlp.knowledge import VersionedMemo
+from src.nlp.matcher import normalize
+from src.nlp.processor import NOT_UNDERSTOOD_RESPONSE, PRICES_RESPONSE
+from src.telemetry.tracing import tracer
+from src.tts.sentences import SentenceStream
+
+try:
+    from src.config.settings import (
+        LLM_URL, LLM_MODEL, LLM_FIRST_SENTENCE_S, LLM_SENTENCE_TIMEOUT_S, LLM_MAX_ANSWER_S,
+        LLM_MAX_TOKENS, LLM_CACHE_SIZE,
+    )
+except ImportError:
+    LLM_URL, LLM_MODEL = "http://127.0.0.1:11434", "llama3.2:3b"
+    LLM_FIRST_SENTENCE_S, LLM_SENTENCE_TIMEOUT_S, LLM_MAX_ANSWER_S = 1.5, 3.0, 12.0
+    LLM_MAX_TOKENS, LLM_CACHE_SIZE = 120, 256
+
+logger = logging.getLogger(__name__)
+
+KEEP_ALIVE = "30m"  # model zostaje w pamięci między klientami
+ALLERGEN_RESPONSE = "Skład i alergeny najlepiej sprawdzić u operatora stoiska - pokaże pełną listę."
+
+# Kwota (opcjonalnie) + waluta; "zł" nie może być częścią innego słowa ("złożyć")
+_PRICE = re.compile(r'(?:(\d+(?:[.,]\d+)?)\s*)?(?<![^\W\d_])(?:zł|złotych|złote|złoty|złotówk\w*|pln)(?!\w)',
+                    re.IGNORECASE)
+# Kwota bez waluty tuż po słowie o cenie ("kosztuje 25", "cena to 25"); godziny ("8:00") odpadają
+_BARE_PRICE = re.compile(r'\b(?:koszt\w*|cen[aęyo]\w*|płac\w*|dopłat\w*)\s+(?:[^\W\d]+\s+){0,2}'
+                         r'(\d+(?:[.,]\d+)?)(?![\d:]|\s*(?:zł|złot|pln))', re.IGNORECASE)
+_ALLERGEN = re.compile(r'\b(?:alergen|alergi|gluten|bezgluten|orzech|orzesz|laktoz|mlek|mleczn|nabiał|jaj|'
+                       r'sezam|soj|seler|gorczyc|wegań|wegan)\w*', re.IGNORECASE)
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+class OllamaClient:
+    """Streaming chat with a local Ollama server."""
+
+    def __init__(self, url=LLM_URL, model=LLM_MODEL, timeout=LLM_SENTENCE_TIMEOUT_S, max_tokens=LLM_MAX_TOKENS):
+        self.url = url.rstrip("/") + "/api/chat"
+        self.model = model
+        self.timeout = timeout  # na pojedynczy odczyt z gniazda, nie na całą odpowiedź
+        self.max_tokens = max_tokens
+
+    def _post(self, body, timeout):
+        request = urllib.request.Request(self.url, data=json.dumps(body).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        return urllib.request.urlopen(request, timeout=timeout)
+
+    def stream(self, messages):
+        """Yield the answer's text fragments as the model produces them."""
+        body = {"model": self.model, "messages": messages, "stream": True, "keep_alive": KEEP_ALIVE,
+                "options": {"num_predict": self.max_tokens, "temperature": 0.2}}
+        with self._post(body, self.timeout) as response:
+            for line in response:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise LLMError(chunk["error"])
+                token = chunk.get("message", {}).get("content", "")
+                if token:
+                    yield token
+                if chunk.get("done"):
+                    return
+
+    def warm(self, timeout=120):
+        """Load the model now, so the first customer does not wait for it."""
+        with self._post({"model": self.model, "messages": [], "stream": False, "keep_alive": KEEP_ALIVE},
+                        timeout) as response:
+            response.read()
+
+
+def _amount(text):
+    return float(text.replace(",", "."))
+
+
+def _price_text(price):
+    return str(price) if "zł" in str(price) else f"{price} zł"
+
+
+def known_prices(knowledge):
+    """Every amount in zł the knowledge base states (dish prices, delivery, FAQ)."""
+    texts = [_price_text(dish["price"]) for dish in knowledge.get("dishes", []) if "price" in dish]
+    texts.extend(v for v in knowledge.get("restaurant", {}).values() if isinstance(v, str))
+    texts.extend(v for v in knowledge.get("faq", {}).values() if isinstance(v, str))
+    return {_amount(m.group(1)) for text in texts for m in _PRICE.finditer(text) if m.group(1)}
+
+
+def build_prompt(knowledge):
+    """SYSTEM_PROMPT plus the facts of the current knowledge version."""
+    facts = []
+    restaurant = knowledge.get("restaurant", {})
+    for field in ("about", "hours", "address", "phone", "delivery", "payment"):
+        if restaurant.get(field):
+            facts.append(f"- {restaurant[field]}")
+    for dish in knowledge.get("dishes", []):
+        price = f" - {_price_text(dish['price'])}" if "price" in dish else ""
+        description = f": {dish['description']}" if dish.get("description") else ""
+        facts.append(f"- {dish['name']}{price}{description}")
+    return (f"{SYSTEM_PROMPT}\nAKTUALNE DANE STOISKA (mają pierwszeństwo przed cennikiem powyżej):\n"
+            + "\n".join(facts)
+            + "\nNie podawaj składu ani alergenów - odsyłaj do operatora stoiska.\n")
+
+
+class AnswerGuard:
+    """Business rules on generated text: only known prices, no allergen claims, no forbidden topics."""
+
+    def __init__(self, knowledge, rules=None):
+        self.prices = known_prices(knowledge)
+        self.prices_response = knowledge.get("responses", {}).get("prices", PRICES_RESPONSE)
+        self.forbidden_topics = (rules or {}).get("forbidden_topics", [])  # już znormalizowane
+
+    def forbidden(self, query):
+        """True when the question touches a topic the kiosk does not discuss."""
+        text = normalize(query)
+        return any(topic in text for topic in self.forbidden_topics)
+
+    def check(self, sentence):
+        """None when the sentence may be spoken, else the broken rule ('allergen' or 'price').
+
+        A price is an amount with a currency, or a bare amount right after
+        a price word ("kosztuje 25", "cena to 25"). Other bare numbers
+        ("ormiański 28" further on in a list, hours, the phone number) are
+        not taken for prices and pass unchecked.
+        """
+        if _ALLERGEN.search(sentence):
+            return "allergen"
+        for match in _PRICE.finditer(sentence):
+            # Kwota słownie ("osiem złotych") też się nie liczy - nie da się jej sprawdzić
+            if match.group(1) is None or _amount(match.group(1)) not in self.prices:
+                return "price"
+        for match in _BARE_PRICE.finditer(sentence):
+            if _amount(match.group(1)) not in self.prices:
+                return "price"
+        return None
+
+    def replacement(self, rule):
+        return self.prices_response if rule == "price" else ALLERGEN_RESPONSE
+
+
+class Answer(NamedTuple):
+    text: str                  # wszystko, co zostało powiedziane
+    outcome: str               # ok, cache, timeout, error, interrupted, guard:price|allergen|topic
+    first_sentence_s: Optional[float]
+
+
+class LLMFallback:
+    """Streams a local model's answer sentence by sentence under a latency budget."""
+
+    def __init__(self, store, client=None, first_sentence_s=LLM_FIRST_SENTENCE_S,
+                 sentence_timeout_s=LLM_SENTENCE_TIMEOUT_S, max_answer_s=LLM_MAX_ANSWER_S,
+                 cache_size=LLM_CACHE_SIZE, canned=NOT_UNDERSTOOD_RESPONSE):
+        self.store = store  # KnowledgeStore NLPProcessora: wersja wiedzy + dane
+        self.client = client or OllamaClient()
+        self.first_sentence_s = first_sentence_s
+        self.sentence_timeout_s = sentence_timeout_s
+        self.max_answer_s = max_answer_s
+        self.canned = canned
+        self.cache = VersionedMemo(cache_size)
+        self._context = None  # (wersja, prompt, guard)
+        self._lock = threading.Lock()
+
+    def warm(self):
+        try:
+            self.client.warm()
+        except (OSError, ValueError, LLMError) as e:
+            logger.warning(f"🦙 LLM niedostępny: {e}")
+
+    def _context_for(self, snapshot):
+        with self._lock:
+            if self._context is None or self._context[0] != snapshot.version:
+                knowledge = snapshot.compiled.knowledge
+                guard = AnswerGuard(knowledge, snapshot.compiled.rules)
+                self._context = (snapshot.version, build_prompt(knowledge), guard)
+            return self._context
+
+    def _produce(self, messages, guard, out, cancel):
+        """Model thread: puts ("sentence", s), ("guard", rule), ("error", e) or ("end", None)."""
+        splitter = SentenceStream()
+        try:
+            with contextlib.closing(self.client.stream(messages)) as tokens:
+                for token in tokens:
+                    if cancel.is_set():
+                        return
+                    for sentence in splitter.feed(token):
+                        if not self._hand_over(sentence, guard, out):
+                            return
+            for sentence in splitter.flush():
+                if not self._hand_over(sentence, guard, out):
+                    return
+        except (OSError, ValueError, LLMError) as e:
+            out.put(("error", e))
+            return
+        out.put(("end", None))
+
+    @staticmethod
+    def _hand_over(sentence, guard, out):
+        rule = guard.check(sentence)
+        out.put(("guard", rule) if rule else ("sentence", sentence))
+        return rule is None
+
+    def answer(self, query, on_sentence):
+        """Speak the answer through on_sentence(sentence); blocks until it is over.
+
+        on_sentence returning False stops the answer (barge-in).
+        """
+        snapshot = self.store.current
+        key = normalize(query)
+        cached = self.cache.get(snapshot.version, key)
+        if cached is not None:
+            for sentence in cached:
+                if on_sentence(sentence) is False:
+                    break
+            return self._finish(Answer(" ".join(cached), "cache", 0.0))
+
+        _, prompt, guard = self._context_for(snapshot)
+        if guard.forbidden(query):
+            on_sentence(self.canned)
+            return self._finish(Answer(self.canned, "guard:topic", None))
+        messages = [{"role": "system", "content": prompt}, {"role": "user", "content": query}]
+        out, cancel = queue.SimpleQueue(), threading.Event()
+        threading.Thread(target=self._produce, args=(messages, guard, out, cancel), name="llm", daemon=True).start()
+
+        started = time.monotonic()
+        deadline = started + self.first_sentence_s
+        spoken, first, outcome = [], None, "ok"
+        try:
+            while True:
+                try:
+                    kind, value = out.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    outcome = "timeout"
+                    break
+                if kind == "sentence":
+                    if first is None:
+                        first = time.monotonic() - started
+                    spoken.append(value)
+                    if on_sentence(value) is False:
+                        outcome = "interrupted"
+                        break
+                    deadline = min(time.monotonic() + self.sentence_timeout_s, started + self.max_answer_s)
+                elif kind == "guard":
+                    outcome = f"guard:{value}"
+                    spoken.append(guard.replacement(value))
+                    on_sentence(spoken[-1])
+                    break
+                elif kind == "error":
+                    outcome = "error"
+                    logger.warning(f"🦙 LLM: {value}")
+                    break
+                else:
+                    break
+        finally:
+            cancel.set()  # wątek modelu kończy przy następnym tokenie
+
+        if not spoken and outcome != "interrupted":
+            # Nic w budżecie (albo pusta odpowiedź) - to samo, co bez modelu
+            spoken.append(self.canned)
+            on_sentence(self.canned)
+        elif outcome == "ok":
+            self.cache.put(snapshot.version, key, tuple(spoken))
+        return self._finish(Answer(" ".join(spoken), outcome, first))
+
+    def _finish(self, answer):
+        if answer.first_sentence_s is not None and answer.outcome != "cache":
+            tracer.record("llm.first_sentence", answer.first_sentence_s)
+        tracer.count("llm.answer", outcome=answer.outcome)
+        logger.info(f"🦙 LLM ({answer.outcome}): {answer.text}")
+        return answer
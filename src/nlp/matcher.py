@@ -0,0 +1,107 @@
+"""Compiled intent matching.
+
+Intents are declared as a table (name, keywords, excluding keywords) in
+priority order. At load time every keyword of every intent is compiled
+into a single Aho-Corasick automaton, so matching a query is one pass
+over its characters no matter how many intents, keywords or dishes the
+menu has.
+"""
+import re
+from collections import deque
+from typing import NamedTuple, Tuple
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+def normalize(text):
+    """Normalizacja tekstu - małe litery, bez znaków."""
+    return _PUNCTUATION.sub('', text.lower()).strip()
+
+
+class Intent(NamedTuple):
+    name: str
+    keywords: Tuple[str, ...]
+    excludes: Tuple[str, ...] = ()  # intencja nie pasuje, gdy w zapytaniu jest któreś z tych słów
+    payload: object = None
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton reporting which keywords occur in a text."""
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for index, keyword in enumerate(self.keywords):
+            self._add(keyword, index)
+        self._link()
+
+    def _add(self, keyword, index):
+        node = 0
+        for char in keyword:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        self._out[node] += (index,)
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """Indices of all keywords occurring anywhere in text."""
+        found = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+class IntentMatcher:
+    """Matches a normalized query against an ordered intent table in one pass.
+
+    ``normalized=True`` takes the keywords as they are (already normalized
+    by the knowledge build).
+    """
+
+    def __init__(self, intents, normalized=False):
+        self.intents = list(intents)
+        keywords = {}
+        self._hits = []  # keyword index -> [(intent index, is_exclude)]
+        for i, intent in enumerate(self.intents):
+            for kind, words in ((False, intent.keywords), (True, intent.excludes)):
+                for word in words:
+                    if not normalized:
+                        word = normalize(word)
+                    if word not in keywords:
+                        keywords[word] = len(keywords)
+                        self._hits.append([])
+                    self._hits[keywords[word]].append((i, kind))
+        self.automaton = KeywordAutomaton(keywords)
+
+    def match(self, query):
+        """Intents present in the query, highest priority first."""
+        matched, excluded = set(), set()
+        for k in self.automaton.find(normalize(query)):
+            for i, is_exclude in self._hits[k]:
+                (excluded if is_exclude else matched).add(i)
+        return [self.intents[i] for i in sorted(matched - excluded)]
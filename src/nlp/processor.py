@@ -1,100 +1,385 @@
 """Natural Language Processing - naturalna rozmowa."""
-import json
 import logging
-import re
+import os
 from pathlib import Path
+from typing import Any, Dict, NamedTuple
 
-from config.settings import UNKNOWN_RESPONSE
+from config.settings import (
+    UNKNOWN_RESPONSE, FUZZY_MIN_SCORE, KNOWLEDGE_RELOAD_INTERVAL, RESPONSE_MEMO_SIZE,
+)
+from src.nlp.knowledge import (
+    ARTIFACT_NAME, KnowledgeStore, VersionedMemo, validate_artifact, validate_knowledge, validate_qa,
+)
+from src.nlp.matcher import Intent, IntentMatcher, normalize
+from src.nlp.retrieval import MIN_ENTRY_NGRAMS, FuzzyRetriever, ngrams
+from src.telemetry.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
+# Stałe odpowiedzi (wspólne dla process_query i prewarmu TTS)
+GREETING_RESPONSE = "Dzień dobry! Miło Cię widzieć w Karkandaki. Nazywam się Arax i chętnie opowiem o naszej ormiańskiej kuchni. Może powiesz, na co masz ochotę? Mamy pyszne Karkandaki wytrawne i słodkie."
+SMALL_TALK_RESPONSE = "U mnie świetnie! Właśnie przygotowujemy świeże Karkandaki w kuchni. A Ty jak się masz? Może masz ochotę na coś pysznego?"
+RECOMMEND_RESPONSE = "Najbardziej polecamy naszego Karkandaka ormiańskiego - to tradycyjny przepis z ziemniakami i ziołami. Ale jeśli lubisz mięso, to z wołowiną też jest pyszny! A może wolisz coś słodkiego?"
+KARKANDAK_RESPONSE = "Karkandak to nasze popisowe danie! To takie cieniutkie ciasto z różnymi nadzieniami. Mamy wytrawne: z ziemniakami (ormiański), z mięsem, z kapustą i grzybami. I słodkie: z nutellą oraz z twarogiem i miodem. Który Cię najbardziej interesuje?"
+PRICES_RESPONSE = "Nasze ceny są bardzo przystępne! Karkandak ormiański 28 zł, z mięsem 35 zł, z kapustą 24 zł, z grzybami 29 zł, a słodkie z nutellą 22 zł i z twarogiem 24 zł. Wszystkie dania są duże i sycące. Który brzmi zachęcająco?"
+THANKS_RESPONSE = "Cała przyjemność po mojej stronie! Gdybyś miał jeszcze jakieś pytania, jestem tutaj. Smacznego i do usłyszenia!"
+NOT_UNDERSTOOD_RESPONSE = "Hmm, nie jestem pewien czy dobrze zrozumiałem. Czy możesz powiedzieć inaczej? Możesz zapytać o polecane dania, ceny, godziny otwarcia, adres albo dowóz. Albo po prostu powiedz 'co polecacie' – chętnie doradzę!"
+DEFAULT_HOURS = "Jesteśmy czynni codziennie 8:00-22:00. Zapraszamy!"
+DEFAULT_ADDRESS = "ul. Kolejowa 41, Ostrów Wielkopolski"
+DEFAULT_DELIVERY = "Dowozimy na terenie miasta za 10 zł. Wystarczy zadzwonić pod 530 324 239!"
+
+# Słowa kluczowe intencji (także źródło gramatyki dla rozpoznawania mowy)
+INTENT_KEYWORDS = {
+    'greeting': ['cześć', 'witam', 'dzień dobry', 'hej', 'siema'],
+    'small_talk': ['jak leci', 'co słychać', 'jak się masz'],
+    'recommend': ['polecacie', 'co dobre', 'specjały', 'najlepsze'],
+    'dish_variant': ['ormiański', 'mięsem', 'kapustą', 'grzybami', 'nutellą', 'twarogiem'],
+    'prices': ['cena', 'ceny', 'ile kosztuje', 'drogo'],
+    'hours': ['godziny', 'otwarcia', 'czynne', 'kiedy'],
+    'address': ['adres', 'gdzie', 'znajduje'],
+    'delivery': ['dowóz', 'dostawa', 'transport'],
+    'thanks': ['dziękuję', 'dzięki', 'thx'],
+}
+
+# Tabela intencji w kolejności priorytetu (dania z knowledge.json wchodzą w miejsce 'dishes')
+INTENT_TABLE = [
+    Intent('greeting', tuple(INTENT_KEYWORDS['greeting'])),
+    Intent('small_talk', tuple(INTENT_KEYWORDS['small_talk'])),
+    Intent('recommend', tuple(INTENT_KEYWORDS['recommend'])),
+    Intent('karkandak', ('karkandak',), excludes=tuple(INTENT_KEYWORDS['dish_variant'])),
+    'dishes',
+    Intent('prices', tuple(INTENT_KEYWORDS['prices'])),
+    Intent('hours', tuple(INTENT_KEYWORDS['hours'])),
+    Intent('address', tuple(INTENT_KEYWORDS['address'])),
+    Intent('delivery', tuple(INTENT_KEYWORDS['delivery'])),
+    Intent('thanks', tuple(INTENT_KEYWORDS['thanks'])),
+]
+
+
+def build_intents(knowledge):
+    """Expand the intent table with one intent per dish from the knowledge base."""
+    intents = []
+    for entry in INTENT_TABLE:
+        if entry == 'dishes':
+            for dish in knowledge.get('dishes', []):
+                keyword = dish.get('keyword') or dish['name'].lower()
+                intents.append(Intent('dish', (keyword,), payload=dish))
+        else:
+            intents.append(entry)
+    return intents
+
+
+def build_retrieval_entries(intents, knowledge, qa):
+    """(text, intent) pairs for the fuzzy fallback: keywords, dishes, FAQ and QA."""
+    entries = []
+    for intent in intents:
+        entries.extend((keyword, intent) for keyword in intent.keywords)
+        if intent.name == 'dish':
+            entries.append((intent.payload.get('id', ''), intent))
+    for question, answer in knowledge.get('faq', {}).items():
+        entries.append((question, Intent('faq', (question,), payload=answer)))
+    # qa.json jest po ukraińsku - trafią tu tylko zapytania zapisane cyrylicą
+    for item in qa.get('questions', []):
+        intent = Intent('qa', tuple(item.get('keywords', [])), payload=item['answer'])
+        entries.append((item.get('question', ''), intent))
+        entries.extend((keyword, intent) for keyword in intent.keywords)
+    return entries
+
+
+def dish_response(dish):
+    return f"{dish['name']} – {dish['description']} Cena: {dish['price']} zł. {dish.get('recommendation', 'Polecam!')}"
+
+
+def build_rules(config, settings):
+    """Business rules of the kiosk from src/config (knowledge.py and settings.py values by name)."""
+    return {
+        "info": config.get("KARKANDAKI_INFO", {}),
+        "record": config.get("RECORD_RULES", {}),
+        "min_age_record": settings.get("MIN_AGE_RECORD"),
+        "forbidden_topics": [normalize(t) for t in settings.get("FORBIDDEN_TOPICS", [])],
+    }
+
+
+def config_rules():
+    """build_rules straight from the src/config modules (no compiled artifact in use)."""
+    from src.config import knowledge as config_knowledge
+    from src.config import settings as config_settings
+
+    return build_rules(vars(config_knowledge), vars(config_settings))
+
+
+def index_knowledge(knowledge, qa):
+    """Matcher and retriever tables of one knowledge base, as plain JSON.
+
+    "intents" lists every intent once with normalized keywords (a dish by
+    its position in knowledge["dishes"]); the first "matcher" of them are
+    the matcher's table in priority order, the rest are FAQ/QA entries.
+    "retrieval" rows are [intent position, sorted trigrams].
+    """
+    intents = build_intents(knowledge)
+    dishes = {id(dish): i for i, dish in enumerate(knowledge.get('dishes', []))}
+    table, positions = [], {}
+
+    def position(intent):
+        if id(intent) not in positions:
+            positions[id(intent)] = len(table)
+            row = {
+                "name": intent.name,
+                "keywords": [normalize(k) for k in intent.keywords],
+                "excludes": [normalize(k) for k in intent.excludes],
+            }
+            if intent.name == 'dish':
+                row["dish"] = dishes[id(intent.payload)]
+            elif intent.payload is not None:
+                row["payload"] = intent.payload
+            table.append(row)
+        return positions[id(intent)]
+
+    for intent in intents:
+        position(intent)
+    retrieval = []
+    for text, intent in build_retrieval_entries(intents, knowledge, qa):
+        grams = ngrams(text)
+        if len(grams) >= MIN_ENTRY_NGRAMS:
+            retrieval.append([position(intent), sorted(grams)])
+    return {"intents": table, "matcher": len(intents), "retrieval": retrieval}
+
+
+class CompiledKnowledge(NamedTuple):
+    knowledge: Dict[str, Any]
+    qa: Dict[str, Any]
+    matcher: IntentMatcher
+    retriever: FuzzyRetriever
+    rules: Dict[str, Any]
+    origin: str  # "sources" albo "artifact <wersja>"
+
+
+def compile_sources(sources):
+    """Intent matcher and fuzzy retriever built from the raw knowledge.json and qa.json."""
+    knowledge, qa = sources.get('knowledge', {}), sources.get('qa', {})
+    intents = build_intents(knowledge)
+    retriever = FuzzyRetriever(
+        build_retrieval_entries(intents, knowledge, qa), min_score=FUZZY_MIN_SCORE
+    )
+    return CompiledKnowledge(knowledge, qa, IntentMatcher(intents), retriever, config_rules(), 'sources')
+
+
+def compile_artifact(artifact):
+    """The same, loaded from the artifact's precompiled index and rules without re-deriving them."""
+    knowledge, index = artifact['knowledge'], artifact['index']
+    dishes = knowledge.get('dishes', [])
+    intents = [
+        Intent(row['name'], tuple(row['keywords']), tuple(row['excludes']),
+               dishes[row['dish']] if 'dish' in row else row.get('payload'))
+        for row in index['intents']
+    ]
+    retriever = FuzzyRetriever.from_ngrams(
+        ((grams, intents[i]) for i, grams in index['retrieval']), min_score=FUZZY_MIN_SCORE
+    )
+    matcher = IntentMatcher(intents[:index['matcher']], normalized=True)
+    return CompiledKnowledge(knowledge, artifact.get('qa', {}), matcher, retriever,
+                             artifact.get('rules', {}), f"artifact {artifact.get('version', '?')}")
+
+
 class NLPProcessor:
     """Natural language processing dla restauracji Karkandaki."""
     
-    def __init__(self):
-        self.knowledge = self._load_json(Path('data/knowledge.json'))
+    def __init__(self, data_dir='data', watch=True):
+        data_dir = Path(data_dir)
         self.unknown = UNKNOWN_RESPONSE
+        # Obserwujemy i artefakt (python -m src.nlp.build_knowledge), i surowe pliki:
+        # edycja knowledge.json po zbudowaniu artefaktu też działa bez restartu.
+        # Artefakt czytany jest pierwszy - aktualny oznacza jeden odczyt zamiast trzech.
+        self.paths = {
+            'artifact': data_dir / ARTIFACT_NAME,
+            'knowledge': data_dir / 'knowledge.json',
+            'qa': data_dir / 'qa.json',
+        }
+        validators = {'knowledge': validate_knowledge, 'qa': validate_qa, 'artifact': validate_artifact}
+        self.store = KnowledgeStore(
+            self.paths, compile=self._compile, validators=validators,
+            interval=KNOWLEDGE_RELOAD_INTERVAL, needed=self._needed,
+        )
+        self.memo = VersionedMemo(RESPONSE_MEMO_SIZE)
+        if watch:
+            # Zmiana cen czy godzin w data/*.json działa bez restartu kiosku
+            self.store.start()
         logger.info("NLP Processor gotowy do naturalnej rozmowy")
-    
-    def _load_json(self, path):
+
+    def _needed(self, name, sources):
+        """Raw files are parsed only without a usable artifact or when one of them is newer than it."""
+        if name == 'artifact' or not sources.get('artifact'):
+            return True
+        return any(self._newer_than_artifact(raw) for raw in ('knowledge', 'qa'))
+
+    def _compile(self, sources):
+        """Artifact when there is one and no raw file is newer than it, else the raw files."""
+        artifact = sources.get('artifact')
+        if artifact:
+            if 'knowledge' not in sources and 'qa' not in sources:
+                # _needed pominął surowe pliki: artefakt jest aktualny
+                compiled = compile_artifact(artifact)
+                logger.info(f"📚 Wiedza z artefaktu {artifact.get('version', '?')}")
+                return compiled
+            newer = [name for name in ('knowledge', 'qa') if self._newer_than_artifact(name)]
+            logger.warning(
+                f"⚠️ {', '.join(str(self.paths[n]) for n in newer)} nowszy niż {ARTIFACT_NAME} "
+                f"- wiedza z surowych plików (przebuduj: python -m src.nlp.build_knowledge)"
+            )
+        compiled = compile_sources(sources)
+        logger.info("📚 Wiedza z surowych plików knowledge.json i qa.json")
+        return compiled
+
+    def _newer_than_artifact(self, name):
         try:
-            if path.exists():
-                with open(path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except: pass
-        return {}
-    
+            return os.stat(self.paths[name]).st_mtime_ns > os.stat(self.paths['artifact']).st_mtime_ns
+        except OSError:
+            return False
+
+    @property
+    def knowledge(self):
+        return self.store.current.compiled.knowledge
+
+    @property
+    def qa(self):
+        return self.store.current.compiled.qa
+
+    @property
+    def matcher(self):
+        return self.store.current.compiled.matcher
+
+    @property
+    def retriever(self):
+        return self.store.current.compiled.retriever
+
+    @property
+    def rules(self):
+        return self.store.current.compiled.rules
+
+    def close(self):
+        self.store.stop()
+
     def _normalize(self, text):
         """Normalizacja tekstu - małe litery, bez znaków."""
-        text = text.lower()
-        text = re.sub(r'[^\w\s]', '', text)
-        return text.strip()
-    
-    def _contains_any(self, text, words):
-        """Sprawdza czy tekst zawiera któreś ze słów."""
-        text = self._normalize(text)
-        for word in words:
-            if word in text:
-                return True
-        return False
+        return normalize(text)
     
-    def process_query(self, query):
-        """Przetwarzanie zapytania - naturalna rozmowa."""
+    def _dish_response(self, dish):
+        return dish.get('response') or dish_response(dish)
+
+    def _address_response(self, restaurant):
+        addr = restaurant.get('address', DEFAULT_ADDRESS)
+        return f"Znajdziesz nas pod adresem: {addr}. To w samym centrum, łatwo trafić!"
+
+    def static_responses(self):
+        """Every answer process_query can give, for TTS cache prewarming."""
+        responses = [
+            GREETING_RESPONSE, SMALL_TALK_RESPONSE, RECOMMEND_RESPONSE,
+            KARKANDAK_RESPONSE, self._prices_response(self.knowledge), THANKS_RESPONSE,
+            NOT_UNDERSTOOD_RESPONSE, self.unknown,
+        ]
+        responses.append(self.knowledge.get('faq', {}).get('polecacie', RECOMMEND_RESPONSE))
+        responses.extend(self.knowledge.get('faq', {}).values())
+        for dish in self.knowledge.get('dishes', []):
+            responses.append(self._dish_response(dish))
+        if 'restaurant' in self.knowledge:
+            restaurant = self.knowledge['restaurant']
+            responses.append(restaurant.get('hours', DEFAULT_HOURS))
+            responses.append(self._address_response(restaurant))
+            responses.append(restaurant.get('delivery', DEFAULT_DELIVERY))
+        return list(dict.fromkeys(responses))
+
+    def _prices_response(self, knowledge):
+        return knowledge.get('responses', {}).get('prices', PRICES_RESPONSE)
+
+    def is_fallback(self, response):
+        """True when process_query did not recognize the question."""
+        return response in (NOT_UNDERSTOOD_RESPONSE, self.unknown)
+
+    def _respond(self, intent, knowledge):
+        """Answer for a matched intent, or None if it cannot be answered here."""
+        restaurant = knowledge.get('restaurant')
+        name = intent.name
+        if name == 'greeting':
+            return GREETING_RESPONSE
+        if name == 'small_talk':
+            return SMALL_TALK_RESPONSE
+        if name == 'recommend':
+            return knowledge.get('faq', {}).get('polecacie', RECOMMEND_RESPONSE)
+        if name == 'karkandak':
+            return KARKANDAK_RESPONSE
+        if name == 'dish':
+            return self._dish_response(intent.payload)
+        if name == 'prices':
+            return self._prices_response(knowledge)
+        # Godziny, adres i dowóz tylko z bazy wiedzy lokalu
+        if name == 'hours' and restaurant is not None:
+            return restaurant.get('hours', DEFAULT_HOURS)
+        if name == 'address' and restaurant is not None:
+            return self._address_response(restaurant)
+        if name == 'delivery' and restaurant is not None:
+            return restaurant.get('delivery', DEFAULT_DELIVERY)
+        if name == 'thanks':
+            return THANKS_RESPONSE
+        if name in ('faq', 'qa'):
+            return intent.payload
+        return None
+
+    def match(self, query):
+        """Return (intent name, response); intent is None when nothing matched."""
         if not query:
-            return self.unknown
+            return None, self.unknown
         
         q = query.lower().strip()
         logger.info(f"🤔 Rozmówca: {q}")
         
-        # Powitania
-        if self._contains_any(q, ['cześć', 'witam', 'dzień dobry', 'hej', 'siema']):
-            return "Dzień dobry! Miło Cię widzieć w Karkandaki. Nazywam się Arax i chętnie opowiem o naszej ormiańskiej kuchni. Może powiesz, na co masz ochotę? Mamy pyszne Karkandaki wytrawne i słodkie."
-        
-        # Jak się masz?
-        if self._contains_any(q, ['jak leci', 'co słychać', 'jak się masz']):
-            return "U mnie świetnie! Właśnie przygotowujemy świeże Karkandaki w kuchni. A Ty jak się masz? Może masz ochotę na coś pysznego?"
-        
-        # Co polecacie?
-        if self._contains_any(q, ['polecacie', 'co dobre', 'specjały', 'najlepsze']):
-            if 'faq' in self.knowledge and 'polecacie' in self.knowledge['faq']:
-                return self.knowledge['faq']['polecacie']
-            return "Najbardziej polecamy naszego Karkandaka ormiańskiego - to tradycyjny przepis z ziemniakami i ziołami. Ale jeśli lubisz mięso, to z wołowiną też jest pyszny! A może wolisz coś słodkiego?"
-        
-        # Karkandak (ogólnie)
-        if 'karkandak' in q and not self._contains_any(q, ['ormiański', 'mięsem', 'kapustą', 'grzybami', 'nutellą', 'twarogiem']):
-            return "Karkandak to nasze popisowe danie! To takie cieniutkie ciasto z różnymi nadzieniami. Mamy wytrawne: z ziemniakami (ormiański), z mięsem, z kapustą i grzybami. I słodkie: z nutellą oraz z twarogiem i miodem. Który Cię najbardziej interesuje?"
-        
-        # Konkretne dania
-        if self.knowledge and 'dishes' in self.knowledge:
-            for dish in self.knowledge['dishes']:
-                dish_name = dish['name'].lower()
-                if dish_name in q:
-                    return f"{dish['name']} – {dish['description']} Cena: {dish['price']} zł. {dish.get('recommendation', 'Polecam!')}"
-        
-        # Ceny
-        if self._contains_any(q, ['cena', 'ceny', 'ile kosztuje', 'drogo']):
-            return "Nasze ceny są bardzo przystępne! Karkandak ormiański 28 zł, z mięsem 35 zł, z kapustą 24 zł, z grzybami 29 zł, a słodkie z nutellą 22 zł i z twarogiem 24 zł. Wszystkie dania są duże i sycące. Który brzmi zachęcająco?"
-        
-        # Godziny
-        if self._contains_any(q, ['godziny', 'otwarcia', 'czynne', 'kiedy']):
-            if 'restaurant' in self.knowledge:
-                return self.knowledge['restaurant'].get('hours', "Jesteśmy czynni codziennie 8:00-22:00. Zapraszamy!")
-        
-        # Adres
-        if self._contains_any(q, ['adres', 'gdzie', 'znajduje']):
-            if 'restaurant' in self.knowledge:
-                addr = self.knowledge['restaurant'].get('address', "ul. Kolejowa 41, Ostrów Wielkopolski")
-                return f"Znajdziesz nas pod adresem: {addr}. To w samym centrum, łatwo trafić!"
-        
-        # Dowóz
-        if self._contains_any(q, ['dowóz', 'dostawa', 'transport']):
-            if 'restaurant' in self.knowledge:
-                return self.knowledge['restaurant'].get('delivery', "Dowozimy na terenie miasta za 10 zł. Wystarczy zadzwonić pod 530 324 239!")
+        # Cała odpowiedź z jednej wersji wiedzy, nawet gdy w tle trwa przeładowanie
+        with tracer.span("nlp.match") as span:
+            snapshot = self.store.current
+            key = normalize(q)
+            result = self.memo.get(snapshot.version, key)
+            memo_hit = result is not None
+            if not memo_hit:
+                result = self._match(snapshot, q)
+                self.memo.put(snapshot.version, key, result)
+            rule = result[0] or 'fallback'
+            span.set(rule=rule, memo=memo_hit)
+        tracer.count("nlp.rule", rule=rule)
+        return result
+
+    def peek(self, query):
+        """The response process_query would give, with no side effects.
+
+        For speculation on partial STT hypotheses: reads the memo but never
+        fills it, and counts, traces and logs nothing.
+        """
+        if not query:
+            return self.unknown
+        q = query.lower().strip()
+        snapshot = self.store.current
+        result = self.memo.peek(snapshot.version, normalize(q)) or self._match(snapshot, q, log=False)
+        return result[1]
+
+    def _match(self, snapshot, q, log=True):
+        knowledge = snapshot.compiled.knowledge
+        matcher, retriever = snapshot.compiled.matcher, snapshot.compiled.retriever
+        for intent in matcher.match(q):
+            response = self._respond(intent, knowledge)
+            if response is not None:
+                return intent.name, response
         
-        # Dziękuję
-        if self._contains_any(q, ['dziękuję', 'dzięki', 'thx']):
-            return "Cała przyjemność po mojej stronie! Gdybyś miał jeszcze jakieś pytania, jestem tutaj. Smacznego i do usłyszenia!"
+        # Przekręcone przez STT słowo - szukamy najbliższego wpisu
+        for intent, score in retriever.search(q):
+            response = self._respond(intent, knowledge)
+            if response is not None:
+                if log:
+                    logger.info(f"🔎 Dopasowanie przybliżone: {intent.name} ({score:.2f})")
+                return intent.name, response
         
         # Nie wiem / nie rozumiem
-        logger.info(f"Nie zrozumiałem: {q}")
-        return "Hmm, nie jestem pewien czy dobrze zrozumiałem. Czy możesz powiedzieć inaczej? Możesz zapytać o polecane dania, ceny, godziny otwarcia, adres albo dowóz. Albo po prostu powiedz 'co polecacie' – chętnie doradzę!"
+        if log:
+            logger.info(f"Nie zrozumiałem: {q}")
+        return None, NOT_UNDERSTOOD_RESPONSE
+
+    def process_query(self, query):
+        """Przetwarzanie zapytania - naturalna rozmowa."""
+        return self.match(query)[1]
@@ -0,0 +1,83 @@
+"""Fuzzy fallback retrieval for misrecognized queries.
+
+When STT garbles a word ("karkandak z miensem", "godzina otwarci") the
+exact keyword matcher finds nothing. Every FAQ entry, dish and keyword is
+turned into a binary vector of character trigrams once, at load time, and
+stacked into a NumPy matrix; a query is then scored against all entries
+with a single matrix-vector product.
+"""
+import unicodedata
+
+import numpy as np
+
+from src.nlp.matcher import normalize
+
+NGRAM = 3
+MIN_ENTRY_NGRAMS = 4  # krótsze wpisy ("de", "thx") łapie tylko dokładne dopasowanie
+
+
+def fold(text):
+    """Normalized text without diacritics ('mięsem' -> 'miesem', 'ł' -> 'l')."""
+    text = normalize(text).replace('ł', 'l')
+    decomposed = unicodedata.normalize('NFD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def ngrams(text, n=NGRAM):
+    """Set of character n-grams of every word, padded with spaces at the edges."""
+    grams = set()
+    for word in fold(text).split():
+        padded = f" {word} "
+        grams.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+class FuzzyRetriever:
+    """Ranks (text, value) entries by how much of each entry occurs in a query.
+
+    The score of an entry is the fraction of its trigrams present in the
+    query (containment), so a short FAQ key still scores high inside a
+    long, partly garbled sentence.
+    """
+
+    def __init__(self, entries, min_score=0.7):
+        self._build(((ngrams(text), value) for text, value in entries), min_score)
+
+    @classmethod
+    def from_ngrams(cls, entries, min_score=0.7):
+        """Retriever from (trigrams, value) entries computed ahead of time (compiled artifact)."""
+        retriever = cls.__new__(cls)
+        retriever._build(entries, min_score)
+        return retriever
+
+    def _build(self, entries, min_score):
+        self.min_score = min_score
+        self.values = []
+        rows = []
+        vocabulary = {}
+        for grams, value in entries:
+            if len(grams) < MIN_ENTRY_NGRAMS:
+                continue
+            rows.append([vocabulary.setdefault(g, len(vocabulary)) for g in grams])
+            self.values.append(value)
+        self.vocabulary = vocabulary
+        self.matrix = np.zeros((len(rows), len(vocabulary)), dtype=np.float32)
+        for i, columns in enumerate(rows):
+            self.matrix[i, columns] = 1.0
+        self.sizes = self.matrix.sum(axis=1)
+
+    def __len__(self):
+        return len(self.values)
+
+    def search(self, query, limit=3):
+        """Best (value, score) pairs above min_score, best first."""
+        columns = [self.vocabulary[g] for g in ngrams(query) if g in self.vocabulary]
+        if not columns or not self.values:
+            return []
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        vector[columns] = 1.0
+        overlap = self.matrix @ vector
+        scores = overlap / self.sizes
+        # Przy równym wyniku wygrywa dłuższy (bardziej konkretny) wpis
+        order = np.lexsort((-overlap, -scores))[:limit]
+        return [(self.values[i], float(scores[i])) for i in order if scores[i] >= self.min_score]
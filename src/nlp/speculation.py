@@ -0,0 +1,78 @@
+"""Speculative response preparation from partial STT hypotheses."""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseSpeculator:
+    """Prepares the likely answer while the customer is still speaking.
+
+    Stable partial hypotheses from the recognizer are matched right away;
+    when they hit a known intent, the answer text is kept and its audio is
+    prefetched into the TTS cache. When the final result arrives the
+    speculation is either committed (same answer) or discarded.
+    """
+
+    def __init__(self, nlp, prefetch=None):
+        self.nlp = nlp
+        self.prefetch = prefetch
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculation")
+        self._guess = None  # (partial, response)
+        self.speculations = 0
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self):
+        with self._lock:
+            self._guess = None
+
+    def on_partial(self, partial):
+        """Called from the capture thread; matching runs off that thread."""
+        self._executor.submit(self._speculate, partial)
+
+    def _speculate(self, partial):
+        # peek: hipoteza częściowa nie trafia do memo, liczników nlp.rule ani logów
+        response = self.nlp.peek(partial)
+        if self.nlp.is_fallback(response):
+            return
+        with self._lock:
+            if self._guess and self._guess[1] == response:
+                return  # ta sama odpowiedź co dla krótszej hipotezy
+            self._guess = (partial, response)
+            self.speculations += 1
+        logger.debug(f"Speculating on '{partial}'")
+        if self.prefetch:
+            self.prefetch(response)
+
+    def resolve(self, text):
+        """Return (intent, answer) for the final text, committing or discarding the guess.
+
+        Like NLPProcessor.match, the one matching (logged and counted) of the turn.
+        """
+        try:
+            # Najpierw dokończ spekulację dla ostatniej hipotezy (to ułamki ms)
+            self._executor.submit(lambda: None).result(timeout=0.2)
+        except Exception:
+            pass
+        intent, response = self.nlp.match(text)
+        with self._lock:
+            guess, self._guess = self._guess, None
+            if guess:
+                if guess[1] == response:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return intent, response
+
+    def stats(self):
+        with self._lock:
+            resolved = self.hits + self.misses
+            return {
+                "speculations": self.speculations,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / resolved if resolved else 0.0,
+            }
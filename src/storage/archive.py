@@ -0,0 +1,410 @@
+"""
+Compressed, append-only archive of captured utterances.
+
+Utterances are appended as records to segment files (one open segment at
+a time, rotated by size and day). Each record carries its own metadata,
+so the index (index.jsonl, one line per utterance, loaded into memory at
+start) can always be rebuilt by scanning the segments. Audio is stored
+losslessly: sample deltas, bytes split into low/high planes, then zlib,
+which halves 16-bit speech at a fraction of the cost of LZMA. Retention
+drops whole closed segments, oldest first, by total size and age.
+
+Usage:
+    python -m src.storage.archive import data/audio [--rate 16000] [--delete]
+    python -m src.storage.archive list [--session ID] [--since 20260218_100000]
+    python -m src.storage.archive extract UTTERANCE_ID out.wav
+    python -m src.storage.archive stats
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import re
+import struct
+import sys
+import threading
+import time
+import wave
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+import numpy as np
+
+try:
+    from src.config.settings import ARCHIVE_DIR, ARCHIVE_SEGMENT_MB, ARCHIVE_MAX_MB, ARCHIVE_MAX_DAYS
+except ImportError:
+    ARCHIVE_DIR, ARCHIVE_SEGMENT_MB, ARCHIVE_MAX_MB, ARCHIVE_MAX_DAYS = "data/archive", 16, 2000, 14
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"KAU1"
+CODEC_DELTA_ZLIB = 1
+# magic, kodek, długość metadanych, długość audio, crc32 audio
+_HEADER = struct.Struct("<4sBHII")
+STAMP = "%Y%m%d_%H%M%S"
+_STAMP_RE = re.compile(r"(\d{8}_\d{6})")
+
+
+class ArchiveEntry(NamedTuple):
+    id: str
+    ts: float
+    session: Optional[str]
+    segment: str
+    offset: int
+    length: int
+    sample_rate: int
+    samples: int
+    meta: Dict[str, Any]
+
+    @property
+    def duration(self):
+        return self.samples / self.sample_rate
+
+
+def encode(samples):
+    """Lossless int16 compression: delta, byte planes, zlib."""
+    x = np.asarray(samples, dtype=np.int16)
+    delta = np.diff(x, prepend=np.int16(0))  # przepełnienie int16 jest odwracalne przy cumsum
+    planes = delta.astype("<i2").view(np.uint8).reshape(-1, 2).T
+    return zlib.compress(np.ascontiguousarray(planes).tobytes(), 6)
+
+
+def decode(payload, samples):
+    planes = np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape(2, samples)
+    delta = np.ascontiguousarray(planes.T).view("<i2").reshape(-1)
+    return np.cumsum(delta, dtype=np.int16)
+
+
+def read_entry(root, entry):
+    """Samples of an index entry straight from its segment (no AudioArchive needed, e.g. in a worker)."""
+    with open(Path(root) / entry.segment, "rb") as f:
+        f.seek(entry.offset)
+        record = f.read(entry.length)
+    _, codec, meta_len, audio_len, crc = _HEADER.unpack_from(record)
+    payload = record[_HEADER.size + meta_len:]
+    if codec != CODEC_DELTA_ZLIB or zlib.crc32(payload) != crc:
+        raise ValueError(f"Corrupted archive record {entry.id}")
+    return decode(payload, entry.samples), entry.sample_rate
+
+
+class AudioArchive:
+    """Segment files + in-memory index of utterances by time and session."""
+
+    def __init__(self, root=ARCHIVE_DIR, segment_max_bytes=ARCHIVE_SEGMENT_MB * 1024 * 1024,
+                 max_total_bytes=ARCHIVE_MAX_MB * 1024 * 1024, max_age_days=ARCHIVE_MAX_DAYS):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_max_bytes = segment_max_bytes
+        self.max_total_bytes = max_total_bytes
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.index_path = self.root / "index.jsonl"
+        self.entries = {}
+        self._newest = {}  # segment -> ts najnowszego nagrania (retencja bez przeglądania indeksu)
+        self._lock = threading.RLock()
+        self._segment = None  # (nazwa, plik) otwartego segmentu
+        self._queue = None
+        self._writer = None
+        self._reserved = set()  # id nagrań czekających w kolejce zapisu
+        self._load_index()
+
+    # --- indeks ---
+
+    def _load_index(self):
+        if not self.index_path.exists():
+            if any(self.root.glob("seg_*.kau")):
+                self.rebuild_index()
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = ArchiveEntry(**json.loads(line))
+                except (ValueError, TypeError):
+                    continue  # ucięta ostatnia linia po awarii zasilania
+                if (self.root / entry.segment).exists():
+                    self._track(entry)
+        self._recover_tail()
+
+    def _recover_tail(self):
+        """Index records that reached a segment but not the index before a crash."""
+        for segment in sorted(self.root.glob("seg_*.kau")):
+            indexed = [e for e in self.entries.values() if e.segment == segment.name]
+            end = max((e.offset + e.length for e in indexed), default=0)
+            if segment.stat().st_size > end:
+                for entry in self._scan(segment, start=end):
+                    self._track(entry)
+                    self._append_index(entry)
+
+    def _scan(self, segment, start=0):
+        with open(segment, "rb") as f:
+            f.seek(start)
+            while True:
+                offset = f.tell()
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return
+                magic, codec, meta_len, audio_len, crc = _HEADER.unpack(header)
+                meta_raw = f.read(meta_len)
+                payload = f.read(audio_len)
+                if magic != MAGIC or len(payload) < audio_len or zlib.crc32(payload) != crc:
+                    logger.warning(f"Archiwum: uszkodzony rekord w {segment.name}@{offset}, koniec skanu")
+                    return
+                meta = json.loads(meta_raw)
+                yield self._entry(meta, segment.name, offset, f.tell() - offset)
+
+    @staticmethod
+    def _entry(meta, segment, offset, length):
+        meta = dict(meta)
+        return ArchiveEntry(
+            meta.pop("id"), meta.pop("ts"), meta.pop("session", None), segment, offset, length,
+            meta.pop("sample_rate"), meta.pop("samples"), meta,
+        )
+
+    def _track(self, entry):
+        self.entries[entry.id] = entry
+        self._newest[entry.segment] = max(self._newest.get(entry.segment, 0), entry.ts)
+
+    def rebuild_index(self):
+        """Recreate index.jsonl from the segment files alone."""
+        with self._lock:
+            self.entries = {}
+            self._newest = {}
+            for segment in sorted(self.root.glob("seg_*.kau")):
+                for entry in self._scan(segment):
+                    self._track(entry)
+            self._write_index()
+        return len(self.entries)
+
+    def _write_index(self):
+        """Rewrite index.jsonl from the in-memory entries (atomically)."""
+        tmp = self.index_path.with_suffix(".part")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entry in sorted(self.entries.values(), key=lambda e: e.ts):
+                f.write(json.dumps(entry._asdict(), ensure_ascii=False) + "\n")
+        os.replace(tmp, self.index_path)
+
+    def _append_index(self, entry):
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry._asdict(), ensure_ascii=False) + "\n")
+
+    # --- zapis ---
+
+    def _open_segment(self, ts):
+        day = datetime.fromtimestamp(ts).strftime("%Y%m%d")
+        if self._segment:
+            name, f = self._segment
+            if f.tell() < self.segment_max_bytes and name.startswith(f"seg_{day}"):
+                return self._segment
+            f.close()
+        name = f"seg_{datetime.fromtimestamp(ts).strftime(STAMP)}_{len(self.segments()):04d}.kau"
+        self._segment = (name, open(self.root / name, "ab"))
+        return self._segment
+
+    def _new_id(self, ts):
+        base = datetime.fromtimestamp(ts).strftime(STAMP)
+        n = 0
+        while f"{base}-{n:03d}" in self.entries or f"{base}-{n:03d}" in self._reserved:
+            n += 1
+        return f"{base}-{n:03d}"
+
+    def add(self, audio, sample_rate, ts=None, session=None, entry_id=None, **meta):
+        """Append one utterance (int16 samples or raw bytes); returns its id."""
+        samples = np.frombuffer(audio, dtype="<i2") if isinstance(audio, (bytes, bytearray)) else audio
+        ts = time.time() if ts is None else ts
+        payload = encode(samples)
+        with self._lock:
+            entry_id = entry_id or self._new_id(ts)
+            self._reserved.discard(entry_id)
+            record_meta = {"id": entry_id, "ts": ts, "session": session,
+                           "sample_rate": sample_rate, "samples": len(samples), **meta}
+            meta_raw = json.dumps(record_meta, ensure_ascii=False).encode("utf-8")
+            name, f = self._open_segment(ts)
+            offset = f.tell()
+            f.write(_HEADER.pack(MAGIC, CODEC_DELTA_ZLIB, len(meta_raw), len(payload), zlib.crc32(payload)))
+            f.write(meta_raw)
+            f.write(payload)
+            f.flush()
+            entry = self._entry(record_meta, name, offset, f.tell() - offset)
+            self._track(entry)
+            self._append_index(entry)
+        return entry_id
+
+    def submit(self, audio, sample_rate, ts=None, session=None, **meta):
+        """Queue an utterance for the background writer (safe from the capture thread).
+
+        Returns the id the utterance will be stored under, so callers can
+        reference it before it is written.
+        """
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            if self._writer is None:
+                self._queue = queue.Queue()
+                self._writer = threading.Thread(target=self._write_worker, name="archive", daemon=True)
+                self._writer.start()
+            entry_id = self._new_id(ts)
+            self._reserved.add(entry_id)
+        self._queue.put((bytes(audio), sample_rate, ts, session, entry_id, meta))
+        return entry_id
+
+    def _write_worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                audio, sample_rate, ts, session, entry_id, meta = item
+                self.add(audio, sample_rate, ts=ts, session=session, entry_id=entry_id, **meta)
+                self.enforce_retention()
+            except Exception as e:
+                logger.error(f"Archiwum: zapis nieudany: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        if self._queue is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+            self._writer = None
+        with self._lock:
+            if self._segment:
+                self._segment[1].close()
+                self._segment = None
+
+    # --- odczyt ---
+
+    def find(self, start=None, end=None, session=None):
+        """Entries in [start, end) (epoch seconds), optionally of one session, oldest first."""
+        with self._lock:
+            entries = list(self.entries.values())
+        return sorted(
+            (e for e in entries
+             if (start is None or e.ts >= start) and (end is None or e.ts < end)
+             and (session is None or e.session == session)),
+            key=lambda e: e.ts,
+        )
+
+    def read(self, entry_id):
+        """(int16 samples, sample rate) of one utterance: one seek, one read."""
+        return read_entry(self.root, self.entries[entry_id])
+
+    def extract(self, entry_id, path):
+        samples, rate = self.read(entry_id)
+        with wave.open(str(path), "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(rate)
+            w.writeframes(samples.astype("<i2").tobytes())
+        return path
+
+    # --- retencja ---
+
+    def segments(self):
+        return sorted(self.root.glob("seg_*.kau"))
+
+    def enforce_retention(self, now=None):
+        """Delete the oldest closed segments past the age limit or the size budget."""
+        now = time.time() if now is None else now
+        removed = []
+        with self._lock:
+            open_name = self._segment[0] if self._segment else None
+            segments = [s for s in self.segments() if s.name != open_name]
+            total = sum(s.stat().st_size for s in self.segments())
+            for segment in segments:
+                newest = self._newest.get(segment.name, 0)
+                too_old = self.max_age is not None and now - newest > self.max_age
+                if not too_old and total <= self.max_total_bytes:
+                    break
+                total -= segment.stat().st_size
+                segment.unlink()
+                removed.append(segment.name)
+            if removed:
+                # Indeks z pamięci - pozostałych segmentów (do ARCHIVE_MAX_MB) nie skanujemy ponownie
+                self.entries = {k: e for k, e in self.entries.items() if e.segment not in removed}
+                for name in removed:
+                    self._newest.pop(name, None)
+                self._write_index()
+                logger.info(f"🗄️ Archiwum: usunięto {len(removed)} segment(ów)")
+        return removed
+
+    def stats(self):
+        with self._lock:
+            entries = list(self.entries.values())
+        stored = sum(s.stat().st_size for s in self.segments())
+        raw = sum(e.samples * 2 for e in entries)
+        return {
+            "utterances": len(entries),
+            "segments": len(self.segments()),
+            "audio_seconds": round(sum(e.duration for e in entries), 1),
+            "stored_bytes": stored,
+            "ratio": round(raw / stored, 2) if stored else None,
+        }
+
+
+def import_wavs(archive, directory, rate=None, delete=False):
+    """Move loose audio_YYYYmmdd_HHMMSS.wav recordings into the archive."""
+    from src.stt.wavio import read_wav
+
+    imported = 0
+    for path in sorted(Path(directory).glob("*.wav")):
+        found = _STAMP_RE.search(path.name)
+        ts = datetime.strptime(found.group(1), STAMP).timestamp() if found else path.stat().st_mtime
+        with wave.open(str(path), "rb") as w:
+            source_rate = w.getframerate()
+        samples = read_wav(path, rate or source_rate)
+        archive.add(samples, rate or source_rate, ts=ts, session=None, source=path.name)
+        imported += 1
+        if delete:
+            path.unlink()
+    return imported
+
+
+def _parse_time(value):
+    return datetime.strptime(value, STAMP).timestamp() if value else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compressed utterance archive")
+    parser.add_argument("--root", default=ARCHIVE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import")
+    p_import.add_argument("directory")
+    p_import.add_argument("--rate", type=int, help="resample, e.g. 16000 (what STT uses)")
+    p_import.add_argument("--delete", action="store_true", help="remove the WAVs after import")
+    p_list = sub.add_parser("list")
+    p_list.add_argument("--session")
+    p_list.add_argument("--since")
+    p_list.add_argument("--until")
+    p_extract = sub.add_parser("extract")
+    p_extract.add_argument("id")
+    p_extract.add_argument("output")
+    sub.add_parser("stats")
+    sub.add_parser("reindex")
+    args = parser.parse_args(argv)
+
+    archive = AudioArchive(args.root)
+    try:
+        if args.command == "import":
+            count = import_wavs(archive, args.directory, args.rate, args.delete)
+            print(f"✅ Zaimportowano {count} nagrań: {archive.stats()}")
+        elif args.command == "list":
+            for e in archive.find(_parse_time(args.since), _parse_time(args.until), args.session):
+                text = e.meta.get("text") or e.meta.get("source") or ""
+                print(f"{e.id}  {e.duration:6.2f}s  {e.session or '-':>12}  {text}")
+        elif args.command == "extract":
+            print(archive.extract(args.id, args.output))
+        elif args.command == "stats":
+            print(json.dumps(archive.stats(), indent=1))
+        elif args.command == "reindex":
+            print(f"✅ Indeks: {archive.rebuild_index()} nagrań")
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+"""
+Dialog history in SQLite: one row per turn (customer utterance or kiosk line).
+
+Writes are write-behind: ``record()`` only puts the turn on a queue and a
+background thread inserts whole batches in one transaction, so the dialog
+thread never waits on the SD card. The database runs in WAL mode, which
+lets queries (session context, reports) read while the writer appends.
+Existing ``data/transcripts`` files (one tiny file per line) can be
+imported; imported lines are keyed by file and line, so re-running the
+import does not duplicate them.
+
+Usage:
+    python -m src.storage.interactions import data/transcripts [--delete]
+    python -m src.storage.interactions sessions [--since 20260218_100000]
+    python -m src.storage.interactions show SESSION_ID
+"""
+import argparse
+import json
+import logging
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+try:
+    from src.config.settings import INTERACTIONS_DB, INTERACTIONS_BATCH, INTERACTIONS_FLUSH_S, SESSION_GAP_S
+except ImportError:
+    INTERACTIONS_DB, INTERACTIONS_BATCH, INTERACTIONS_FLUSH_S, SESSION_GAP_S = "sqlite:///local_leads.db", 64, 1.0, 60
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+STAMP = "%Y%m%d_%H%M%S"
+_STAMP_RE = re.compile(r"(\d{8}_\d{6})")
+# Stare pliki: transcript_* to klient, tts_* to kiosk
+_TRANSCRIPT_ROLES = {"transcript": "user", "tts": "kiosk"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    session TEXT,
+    role TEXT NOT NULL CHECK (role IN ('user', 'kiosk')),
+    text TEXT NOT NULL,
+    intent TEXT,
+    latencies TEXT,
+    audio_ref TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS turns_session_ts ON turns (session, ts);
+CREATE INDEX IF NOT EXISTS turns_ts ON turns (ts);
+CREATE UNIQUE INDEX IF NOT EXISTS turns_source ON turns (source) WHERE source IS NOT NULL;
+"""
+_COLUMNS = ("ts", "session", "role", "text", "intent", "latencies", "audio_ref", "source")
+_INSERT = (f"INSERT OR IGNORE INTO turns ({', '.join(_COLUMNS)}) "
+           f"VALUES ({', '.join('?' * len(_COLUMNS))})")
+
+
+class Turn(NamedTuple):
+    ts: float
+    session: Optional[str]
+    role: str
+    text: str
+    intent: Optional[str] = None
+    latencies: Optional[Dict[str, Any]] = None  # ms per etap, np. {"nlp": 1.2, "tts": 840}
+    audio_ref: Optional[str] = None  # id nagrania w archiwum
+    source: Optional[str] = None  # plik:linia dla importu
+
+    def row(self):
+        latencies = json.dumps(self.latencies) if self.latencies else None
+        return (self.ts, self.session, self.role, self.text, self.intent, latencies, self.audio_ref, self.source)
+
+    @classmethod
+    def from_row(cls, row):
+        ts, session, role, text, intent, latencies, audio_ref, source = row
+        return cls(ts, session, role, text, intent, json.loads(latencies) if latencies else None, audio_ref, source)
+
+
+def db_path(url):
+    """Filesystem path of a sqlite:/// URL (a plain path is returned as is)."""
+    url = str(url)
+    return url[len("sqlite:///"):] if url.startswith("sqlite:///") else url
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # W WAL fsync przy checkpoincie wystarcza; awaria zasilania traci co najwyżej ostatnią paczkę
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class InteractionStore:
+    """Write-behind SQLite store of dialog turns with indexed reads."""
+
+    def __init__(self, url=INTERACTIONS_DB, batch_size=INTERACTIONS_BATCH, flush_interval=INTERACTIONS_FLUSH_S,
+                 max_pending=10000):
+        self.path = db_path(url)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._read_lock = threading.Lock()
+        self._conn = connect(self.path)
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._writer = threading.Thread(target=self._write_worker, name="interactions", daemon=True)
+        self._writer.start()
+
+    # --- zapis ---
+
+    def record(self, session, role, text, intent=None, latencies=None, audio_ref=None, ts=None):
+        """Queue one turn; never blocks the caller."""
+        turn = Turn(time.time() if ts is None else ts, session, role, text, intent, latencies, audio_ref)
+        try:
+            self._queue.put_nowait(turn)
+        except queue.Full:
+            self.dropped += 1
+
+    def insert_many(self, turns):
+        """Insert turns synchronously in one transaction; returns how many were new."""
+        rows = [t.row() for t in turns]
+        with self._read_lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(_INSERT, rows)
+            return self._conn.total_changes - before
+
+    def _write_worker(self):
+        # Własne połączenie: zapis nie czeka na blokadę odczytów
+        conn = connect(self.path)
+        while True:
+            item = self._queue.get()
+            batch = [] if item is None else [item]
+            closing = item is None
+            deadline = time.monotonic() + self.flush_interval
+            while not closing and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                else:
+                    batch.append(item)
+            try:
+                if batch:
+                    with conn:
+                        conn.executemany(_INSERT, [t.row() for t in batch])
+            except sqlite3.Error as e:
+                logger.error(f"Historia rozmów: zapis {len(batch)} wpisów nieudany: {e}")
+            finally:
+                for _ in range(len(batch) + closing):
+                    self._queue.task_done()
+            if closing:
+                conn.close()
+                return
+
+    def flush(self):
+        """Wait until every queued turn is committed."""
+        self._queue.join()
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+        self._conn.close()
+
+    # --- odczyt ---
+
+    def _select(self, where="", params=(), suffix=""):
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM turns {where} {suffix}"
+        with self._read_lock:
+            return [Turn.from_row(r) for r in self._conn.execute(sql, params)]
+
+    def session(self, session_id, limit=None):
+        """Turns of one session in order; with limit, only the last ones."""
+        if limit is None:
+            return self._select("WHERE session = ?", (session_id,), "ORDER BY ts, id")
+        return self._select("WHERE session = ?", (session_id, limit), "ORDER BY ts DESC, id DESC LIMIT ?")[::-1]
+
+    def find(self, start=None, end=None, session=None, role=None):
+        """Turns in [start, end) (epoch seconds), optionally of one session or role, oldest first."""
+        clauses, params = [], []
+        for clause, value in (("ts >= ?", start), ("ts < ?", end), ("session = ?", session), ("role = ?", role)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._select(where, params, "ORDER BY ts, id")
+
+    def sessions(self, start=None, end=None):
+        """(session, first ts, last ts, turns) of sessions that started in [start, end)."""
+        sql = ("SELECT session, MIN(ts), MAX(ts), COUNT(*) FROM turns WHERE session IS NOT NULL "
+               "GROUP BY session HAVING MIN(ts) >= ? AND MIN(ts) < ? ORDER BY MIN(ts)")
+        with self._read_lock:
+            return self._conn.execute(sql, (start or 0, end or float("inf"))).fetchall()
+
+    def sources(self, prefix=""):
+        """Source keys already stored under prefix (what an import or batch run may skip)."""
+        with self._read_lock:
+            rows = self._conn.execute("SELECT source FROM turns WHERE substr(source, 1, ?) = ?",
+                                      (len(prefix), prefix))
+            return {source for source, in rows}
+
+    def stats(self):
+        with self._read_lock:
+            turns, sessions, first, last = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT session), MIN(ts), MAX(ts) FROM turns").fetchone()
+        return {"turns": turns, "sessions": sessions, "first": first, "last": last,
+                "pending": self._queue.qsize(), "dropped": self.dropped}
+
+
+def read_transcripts(directory, gap=SESSION_GAP_S):
+    """Turns from transcript_*.txt / tts_*.txt files, grouped into sessions by pauses.
+
+    The old files carry no session id; a pause longer than gap seconds
+    between two lines starts a new session named after its first stamp.
+    """
+    turns = []
+    for path in sorted(Path(directory).glob("*.txt")):
+        role = _TRANSCRIPT_ROLES.get(path.name.split("_", 1)[0])
+        if role is None:
+            continue
+        for n, line in enumerate(path.read_text(encoding="utf-8").splitlines(), 1):
+            stamp, sep, text = line.partition(": ")
+            found = _STAMP_RE.fullmatch(stamp.strip())
+            if sep and found and text.strip():
+                ts = datetime.strptime(found.group(1), STAMP).timestamp()
+                turns.append(Turn(ts, None, role, text.strip(), source=f"{path.name}:{n}"))
+    turns.sort(key=lambda t: (t.ts, t.source))
+    grouped, session, last = [], None, None
+    for turn in turns:
+        if last is None or turn.ts - last > gap:
+            session = datetime.fromtimestamp(turn.ts).strftime(STAMP)
+        last = turn.ts
+        grouped.append(turn._replace(session=session))
+    return grouped
+
+
+def import_transcripts(store, directory, delete=False):
+    """Load the per-line transcript files into the store; returns (new turns, files)."""
+    turns = read_transcripts(directory)
+    added = store.insert_many(turns)
+    files = sorted({t.source.rsplit(":", 1)[0] for t in turns})
+    if delete:
+        for name in files:
+            (Path(directory) / name).unlink()
+    return added, len(files)
+
+
+def _parse_time(value):
+    return datetime.strptime(value, STAMP).timestamp() if value else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dialog history (SQLite)")
+    parser.add_argument("--db", default=INTERACTIONS_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import")
+    p_import.add_argument("directory")
+    p_import.add_argument("--delete", action="store_true", help="remove the transcript files after import")
+    p_sessions = sub.add_parser("sessions")
+    p_sessions.add_argument("--since")
+    p_sessions.add_argument("--until")
+    p_show = sub.add_parser("show")
+    p_show.add_argument("session")
+    sub.add_parser("stats")
+    args = parser.parse_args(argv)
+
+    store = InteractionStore(args.db)
+    try:
+        if args.command == "import":
+            added, files = import_transcripts(store, args.directory, args.delete)
+            print(f"✅ Zaimportowano {added} wpisów z {files} plików: {store.stats()}")
+        elif args.command == "sessions":
+            for session, first, last, count in store.sessions(_parse_time(args.since), _parse_time(args.until)):
+                print(f"{session}  {last - first:7.1f}s  {count:4d} wpisów")
+        elif args.command == "show":
+            for turn in store.session(args.session):
+                who = "👤" if turn.role == "user" else "🤖"
+                stamp = datetime.fromtimestamp(turn.ts).strftime("%H:%M:%S")
+                print(f"{stamp} {who} {turn.text}" + (f"  [{turn.intent}]" if turn.intent else ""))
+        elif args.command == "stats":
+            print(json.dumps(store.stats(), indent=1))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
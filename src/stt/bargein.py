@@ -0,0 +1,137 @@
+"""
+Barge-in: notice the customer talking over the kiosk's own voice.
+
+The microphone hears the loudspeaker too, so plain VAD would trigger on
+every reply. The TTS side logs what it plays into an ``EchoReference``: a
+timed energy envelope of the output (exact for raw PCM voices; a nominal
+level while playing when the decoder is an external MP3 player). The
+detector compares each 20 ms microphone frame with the loudest reference
+frame in the echo-delay window scaled by the learned speaker->mic coupling
+(echo return), and fires when the microphone is clearly louder than the
+echo alone could be for a few frames in a row (a Geigel-style double-talk
+test on frame energies).
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from src.stt.vad import frame_rms
+
+try:
+    from src.config.settings import (
+        NOISE_GATE_THRESHOLD, VAD_FRAME_MS, BARGE_IN_MARGIN, BARGE_IN_ATTACK_FRAMES, BARGE_IN_ECHO_WINDOW,
+    )
+except ImportError:
+    NOISE_GATE_THRESHOLD, VAD_FRAME_MS = 500, 20
+    BARGE_IN_MARGIN, BARGE_IN_ATTACK_FRAMES, BARGE_IN_ECHO_WINDOW = 2.0, 3, 0.3
+
+# Poziom odniesienia dla MP3 - dekoder zewnętrzny nie oddaje próbek; liczy się tylko "gra/nie gra"
+NOMINAL_LEVEL = 3000.0
+
+
+class EchoReference:
+    """Energy envelope of what the loudspeaker plays, on the perf_counter timeline."""
+
+    def __init__(self, frame_ms=VAD_FRAME_MS, keep_seconds=3.0):
+        self.frame_s = frame_ms / 1000
+        self.keep = keep_seconds
+        self._segments = deque()  # (start, end, rms), rosnąco po start
+        self._lock = threading.Lock()
+
+    def played(self, start, end, samples=None, sample_rate=None):
+        """Audio scheduled to sound in [start, end); samples (int16) give the exact envelope."""
+        if end <= start:
+            return
+        with self._lock:
+            if samples is None or not sample_rate:
+                self._segments.append((start, end, NOMINAL_LEVEL))
+            else:
+                frame_len = max(1, int(sample_rate * self.frame_s))
+                energies = frame_rms(np.asarray(samples, dtype=np.int16), frame_len)
+                step = (end - start) / max(1, len(energies))
+                for i, rms in enumerate(energies.tolist()):
+                    self._segments.append((start + i * step, start + (i + 1) * step, rms))
+            horizon = start - self.keep
+            while self._segments and self._segments[0][1] < horizon:
+                self._segments.popleft()
+
+    def cut(self, at=None):
+        """Playback stopped at `at`: nothing scheduled after it will sound."""
+        at = time.perf_counter() if at is None else at
+        with self._lock:
+            kept = [(s, min(e, at), rms) for s, e, rms in self._segments if s < at]
+            self._segments = deque(kept)
+
+    def level(self, start, end):
+        """Loudest reference frame overlapping [start, end]; 0 when the kiosk is silent."""
+        with self._lock:
+            return max((rms for s, e, rms in reversed(self._segments) if s <= end and e >= start), default=0.0)
+
+    def active(self, at=None):
+        at = time.perf_counter() if at is None else at
+        return self.level(at, at) > 0
+
+
+class BargeInDetector:
+    """Decides, frame by frame, whether the customer speaks over the reference."""
+
+    def __init__(self, echo, sample_rate=16000, frame_ms=VAD_FRAME_MS, min_threshold=NOISE_GATE_THRESHOLD,
+                 margin=BARGE_IN_MARGIN, attack_frames=BARGE_IN_ATTACK_FRAMES, echo_window=BARGE_IN_ECHO_WINDOW,
+                 initial_coupling=1.0):
+        self.echo = echo
+        self.sample_rate = sample_rate
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.frame_s = frame_ms / 1000
+        self.min_threshold = min_threshold
+        self.margin = margin
+        self.attack_frames = attack_frames
+        self.echo_window = echo_window
+        # Ile z poziomu głośnika słychać w mikrofonie; uczone, gdy klient milczy
+        self.coupling = initial_coupling
+        self.onset = None  # czas pierwszej ramki mowy klienta (perf_counter)
+        self.detections = 0
+        self._run = 0
+        self._remainder = np.empty(0, dtype=np.int16)
+
+    def reset(self):
+        self.onset = None
+        self._run = 0
+        self._remainder = np.empty(0, dtype=np.int16)
+
+    def process(self, block, captured_at=None):
+        """Consume a microphone block that ended at captured_at; True when barge-in is detected."""
+        captured_at = time.perf_counter() if captured_at is None else captured_at
+        samples = np.frombuffer(block, dtype="<i2")
+        if self._remainder.size:
+            samples = np.concatenate((self._remainder, samples))
+        n = len(samples) // self.frame_len
+        self._remainder = samples[n * self.frame_len:].copy()
+        energies = frame_rms(samples, self.frame_len)
+        first_end = captured_at - (len(samples) - n * self.frame_len) / self.sample_rate - (n - 1) * self.frame_s
+
+        for i, mic in enumerate(energies.tolist()):
+            frame_end = first_end + i * self.frame_s
+            ref = self.echo.level(frame_end - self.frame_s - self.echo_window, frame_end)
+            expected = self.coupling * ref
+            near_end = mic > self.min_threshold and mic > expected * self.margin
+            if near_end:
+                if self._run == 0:
+                    self.onset = frame_end - self.frame_s
+                self._run += 1
+                if self._run >= self.attack_frames:
+                    self.detections += 1
+                    self._run = 0
+                    self._remainder = np.empty(0, dtype=np.int16)
+                    return True
+            else:
+                self._run = 0
+                if ref > 0:
+                    self._adapt(mic / ref)
+        return False
+
+    def _adapt(self, ratio):
+        # W górę ostrożnie: ramka poniżej progu może już zawierać cichy początek mowy klienta
+        rate = 0.05 if ratio > self.coupling else 0.02
+        self.coupling += rate * (ratio - self.coupling)
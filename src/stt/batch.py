@@ -0,0 +1,209 @@
+"""
+Batch transcription of recorded audio after a model swap or tuning.
+
+Every recording (data/audio/*.wav or utterances in the archive) is pushed
+through STTEngine's own recognition path (VAD + Vosk + grammar fallback,
+no microphone) as fast as the CPU allows, in large blocks instead of real
+time. Files are spread over a process pool; each worker loads the model
+once in its initializer and reads and decodes its own files, so only the
+small result travels back. Results go into the interaction store as user
+turns of session ``batch-<model>``, keyed by model and recording, so a
+rerun with the same model skips what is already done and a new model
+starts from scratch.
+
+Usage:
+    python -m src.stt.batch [--audio data/audio] [--archive data/archive] [--jobs N]
+    python -m src.stt.batch --model src/assets/models/vosk-model-small-pl --since 20260218_100000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from src.storage.interactions import STAMP, InteractionStore, Turn
+from src.stt.wavio import TARGET_RATE, blocks, read_wav, resample
+
+try:
+    from src.config.settings import INTERACTIONS_DB
+except ImportError:
+    INTERACTIONS_DB = "sqlite:///local_leads.db"
+
+logger = logging.getLogger(__name__)
+
+AUDIO_DIR = Path("data/audio")
+# 1 s na wywołanie: VAD liczy ramki wektorowo, więc duży blok to mniej narzutu Pythona.
+# Nagrania to pojedyncze wypowiedzi - duży blok nie skleja dwóch fraz.
+BATCH_BLOCK_SIZE = 16000
+COMMIT_EVERY = 64
+
+
+class Job(NamedTuple):
+    key: str                 # nazwa pliku albo id wypowiedzi w archiwum
+    ts: float
+    path: Optional[str] = None
+    entry: Optional[tuple] = None  # ArchiveEntry (czytany w procesie roboczym)
+    archive: Optional[str] = None
+
+
+def wav_jobs(directory=AUDIO_DIR):
+    jobs = []
+    for path in sorted(Path(directory).glob("*.wav")):
+        stamp = path.stem.rsplit("_", 2)[-2:]
+        try:
+            ts = datetime.strptime("_".join(stamp), STAMP).timestamp()
+        except ValueError:
+            ts = path.stat().st_mtime
+        jobs.append(Job(path.name, ts, path=str(path)))
+    return jobs
+
+
+def archive_jobs(archive, since=None, until=None):
+    return [Job(e.id, e.ts, entry=e, archive=str(archive.root)) for e in archive.find(since, until)]
+
+
+def model_tag(model_path):
+    return Path(model_path).name
+
+
+# --- proces roboczy ---
+
+_engine = None
+
+
+def _init_worker(model_path, engine_factory=None):
+    """Load the model once per worker process."""
+    global _engine
+    if engine_factory is None:
+        from src.stt.engine import STTEngine
+
+        _engine = STTEngine(model_path=model_path, capture=False, server=None)
+    else:
+        _engine = engine_factory(model_path)
+
+
+def _load(job):
+    if job.entry is not None:
+        from src.storage.archive import read_entry
+
+        samples, rate = read_entry(job.archive, job.entry)
+        return samples if rate == TARGET_RATE else resample(samples, rate).round().clip(-32768, 32767).astype("int16")
+    return read_wav(job.path)
+
+
+def transcribe(stt, samples, block_size=BATCH_BLOCK_SIZE):
+    """Text recognized in samples (16 kHz int16) through stt.feed()."""
+    stt.start_listening()
+    try:
+        for block in blocks(samples, block_size):
+            stt.feed(block)
+        stt.flush()
+        texts = []
+        while True:
+            text = stt.get_text(block=False)
+            if not text:
+                break
+            texts.append(text)
+    finally:
+        stt.stop_listening()
+    return " ".join(texts)
+
+
+def _run_job(job, block_size=BATCH_BLOCK_SIZE):
+    started = time.perf_counter()
+    samples = _load(job)
+    loaded = time.perf_counter()
+    text = transcribe(_engine, samples, block_size)
+    done = time.perf_counter()
+    audio_s = len(samples) / TARGET_RATE
+    return job, text, {"load_ms": round((loaded - started) * 1000, 1), "decode_ms": round((done - loaded) * 1000, 1),
+                       "audio_ms": round(audio_s * 1000, 1),
+                       "rtf": round((done - loaded) / audio_s, 4) if audio_s else None, "pid": os.getpid()}
+
+
+# --- proces główny ---
+
+def run_batch(jobs, store, model_path, workers=None, block_size=BATCH_BLOCK_SIZE, engine_factory=None):
+    """Transcribe jobs not yet in store for this model; returns the run summary."""
+    tag = model_tag(model_path)
+    prefix = f"batch:{tag}:"
+    done = store.sources(prefix)
+    todo = [job for job in jobs if prefix + job.key not in done]
+    workers = workers or os.cpu_count() or 1
+    summary = {"model": tag, "files": len(jobs), "skipped": len(jobs) - len(todo), "transcribed": 0,
+               "failed": 0, "audio_s": 0.0, "workers": workers}
+    started = time.perf_counter()
+    pending = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, engine_factory)) as pool:
+        futures = [pool.submit(_run_job, job, block_size) for job in todo]
+        for future in as_completed(futures):
+            try:
+                job, text, timing = future.result()
+            except Exception as e:
+                summary["failed"] += 1
+                logger.error(f"Transkrypcja nieudana: {e}")
+                continue
+            summary["transcribed"] += 1
+            summary["audio_s"] += timing["audio_ms"] / 1000
+            pending.append(Turn(job.ts, f"batch-{tag}", "user", text, latencies=timing,
+                                audio_ref=job.key, source=prefix + job.key))
+            if len(pending) >= COMMIT_EVERY:
+                store.insert_many(pending)
+                pending = []
+    if pending:
+        store.insert_many(pending)
+    wall = time.perf_counter() - started
+    summary["audio_s"] = round(summary["audio_s"], 1)
+    summary["wall_s"] = round(wall, 2)
+    # Sekundy nagrań na sekundę pracy - przy N procesach ~N razy więcej niż przy jednym
+    summary["audio_s_per_s"] = round(summary["audio_s"] / wall, 2) if wall else None
+    return summary
+
+
+def _parse_time(value):
+    return datetime.strptime(value, STAMP).timestamp() if value else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe recorded audio again with the current model")
+    parser.add_argument("--model", default="src/assets/models/vosk-model-pl")
+    parser.add_argument("--audio", default=str(AUDIO_DIR), help="directory of WAV recordings")
+    parser.add_argument("--archive", help="transcribe the utterance archive instead of WAV files")
+    parser.add_argument("--since", help="with --archive: YYYYmmdd_HHMMSS")
+    parser.add_argument("--until", help="with --archive: YYYYmmdd_HHMMSS")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--block", type=int, default=BATCH_BLOCK_SIZE, help="samples per feed() call")
+    parser.add_argument("--db", default=INTERACTIONS_DB)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    if not os.path.exists(args.model):
+        print(f"❌ Brak modelu Vosk: {args.model}")
+        return 1
+    if args.archive:
+        from src.storage.archive import AudioArchive
+
+        archive = AudioArchive(args.archive)
+        jobs = archive_jobs(archive, _parse_time(args.since), _parse_time(args.until))
+        archive.close()
+    else:
+        jobs = wav_jobs(args.audio)
+
+    store = InteractionStore(args.db)
+    try:
+        summary = run_batch(jobs, store, args.model, args.jobs, args.block)
+    finally:
+        store.close()
+    print(f"✅ {summary['transcribed']} nagrań ({summary['audio_s']} s audio) w {summary['wall_s']} s "
+          f"= {summary['audio_s_per_s']} s audio/s na {summary['workers']} procesach; "
+          f"pominięte {summary['skipped']}, błędy {summary['failed']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
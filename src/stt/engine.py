@@ -1,89 +1,394 @@
 """
-Offline Speech-to-Text engine using Vosk and PyAudio.
+Offline Speech-to-Text engine using Vosk.
 Zero latency, no cloud dependencies, privacy-first.
+Audio comes from src.audio (PyAudio microphone or a virtual one).
 """
 import os
 import json
 import queue
 import logging
 import threading
-import struct
-import pyaudio
+import time
+from collections import deque
+
 from vosk import Model, KaldiRecognizer
 
-# Імпортуємо поріг шуму з нашого єдиного джерела істини (Single Source of Truth)
+from src.audio.devices import open_input
+from src.stt.grammar import load_grammar
+from src.stt.remote import RemoteRecognizer
+from src.stt.vad import VoiceActivityDetector
+from src.stt.wake import wake_grammar
+from src.telemetry.tracing import tracer
+
 try:
-    from src.config.settings import NOISE_GATE_THRESHOLD
+    from src.config.settings import (
+        STT_BLOCK_SIZE, STT_PREROLL_SECONDS, STT_PARTIAL_STABLE_POLLS,
+        STT_GRAMMAR_PATH, STT_GRAMMAR_MIN_CONF, STT_FALLBACK_MIN_S, BARGE_IN_BLOCK_SIZE, STT_SERVER_SOCKET,
+    )
 except ImportError:
-    NOISE_GATE_THRESHOLD = 500
+    STT_BLOCK_SIZE, STT_PREROLL_SECONDS, STT_PARTIAL_STABLE_POLLS = 1600, 1.0, 2
+    STT_GRAMMAR_PATH, STT_GRAMMAR_MIN_CONF, STT_FALLBACK_MIN_S = "data/grammar.json", 0.6, 0.3
+    BARGE_IN_BLOCK_SIZE = 320
+    STT_SERVER_SOCKET = None
 
 logger = logging.getLogger(__name__)
 
 class STTEngine:
-    """Production-ready Offline STT Engine with Noise Gate."""
+    """Production-ready Offline STT Engine with Voice Activity Detection."""
     
-    def __init__(self, model_path="src/assets/models/vosk-model-pl"):
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Vosk STT model not found at {model_path}. Please download it first.")
-            
-        # Завантажуємо модель у пам'ять
-        logger.info("Loading offline Vosk STT model. This may take a few seconds...")
-        self.model = Model(model_path)
-        self.recognizer = KaldiRecognizer(self.model, 16000)
+    def __init__(self, model_path="src/assets/models/vosk-model-pl", capture=True, server=STT_SERVER_SOCKET,
+                 audio_input=None):
+        """capture=False skips the microphone; audio then comes in through feed().
+
+        With server (a Unix socket of src.stt.server) the model is not loaded
+        here; recognizers are leased from the shared backend instead.
+        audio_input is a src.audio input device (default: AUDIO_INPUT).
+        """
+        self.server = server
+        if server:
+            logger.info(f"Vosk: wspólny serwer rozpoznawania {server}")
+            self.model = None
+        else:
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(f"Vosk STT model not found at {model_path}. Please download it first.")
+            # Завантажуємо модель у пам'ять
+            logger.info("Loading offline Vosk STT model. This may take a few seconds...")
+            self.model = Model(model_path)
+        self.grammar = load_grammar(STT_GRAMMAR_PATH)
+        self.recognizer = self._make_recognizer(self.grammar)
+        self.open_recognizer = None  # повний словник - лише коли граматика не впоралась
+        # Powtórne dekodowanie pełnym słownikiem w osobnym wątku - wątek mikrofonu nie czeka na Vosk
+        self._fallbacks = None
+        self._fallback_thread = None
+        self._fallback_pending = 0  # wyniki w kolejce; kolejne frazy idą za nimi, żeby zachować kolejność
+        self._utterance = bytearray()
+        self.vad = VoiceActivityDetector(sample_rate=16000)
         
-        self.audio = pyaudio.PyAudio()
+        self.audio = (audio_input or open_input()) if capture else None
         self.stream = None
+        self.is_capturing = False
         self.is_listening = False
         self.text_queue = queue.Queue()
         self.listen_thread = None
+        # Остання ~1 с звуку до натискання START (pre-roll), щоб не губити перший склад
+        # (bloki mają różną długość - przy barge-in czytamy drobniej, więc limit jest w bajtach)
+        self.preroll = deque()
+        self._preroll_bytes = 0
+        self.preroll_max_bytes = int(STT_PREROLL_SECONDS * 16000) * 2
+        self._lock = threading.Lock()
+        # Callback для стабільних часткових гіпотез (спекулятивна відповідь)
+        self.on_partial = None
+        # Callback (audio, text) z nagraniem każdej rozpoznanej frazy (archiwum)
+        self.on_utterance = None
+        # Callback (text) z każdym wynikiem końcowym - zdarzenie zamiast odpytywania get_text()
+        self.on_text = None
+        # Barge-in: detektor uzbrojony tylko na czas odpowiedzi kiosku; callback (onset) z wątku mikrofonu
+        self.barge_in = None
+        self.on_barge_in = None
+        # Fraza budząca: detektor słucha między sesjami (poza barge-in); callback () z wątku mikrofonu
+        self.wake = None
+        self.on_wake = None
+        self._partial = ""
+        self._partial_polls = 0
+        self._partial_sent = ""
+        # Zdrowie: czas ostatniego bloku z mikrofonu (monotonic) i błędy odczytu z rzędu
+        self.last_block = None
+        self.read_errors = 0
+        self.restarts = 0
         
+        if capture:
+            self.open_stream()
         logger.info("STT Engine initialized successfully.")
 
-    def _get_rms(self, block):
-        """Calculate Root Mean Square (energy) of audio block for Noise Gate."""
-        count = len(block) // 2
-        format_str = f"<{count}h"
-        shorts = struct.unpack(format_str, block)
-        sum_squares = sum(s * s for s in shorts)
-        return (sum_squares / count) ** 0.5 if count > 0 else 0
+    def _new_recognizer(self, grammar=None, words=False):
+        if self.server:
+            return RemoteRecognizer(self.server, grammar, words)
+        recognizer = KaldiRecognizer(self.model, 16000, grammar) if grammar else KaldiRecognizer(self.model, 16000)
+        if words:
+            recognizer.SetWords(True)
+        return recognizer
 
-    def start_listening(self):
-        """Start capturing and transcribing audio in the background."""
-        if self.is_listening:
+    def keyword_recognizer(self, phrases):
+        """Recognizer that knows only phrases (and [unk]), e.g. for the wake detector."""
+        return self._new_recognizer(wake_grammar(phrases), words=True)
+
+    def _make_recognizer(self, grammar=None):
+        if grammar:
+            logger.info("Vosk: gramatyka ograniczona do słownictwa kiosku")
+            # потрібні conf слів для рішення про fallback
+            return self._new_recognizer(grammar, words=True)
+        return self._new_recognizer()
+
+    def open_stream(self):
+        """Open the microphone once; it stays open for the life of the kiosk."""
+        if self.is_capturing:
             return
-            
-        self.stream = self.audio.open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=16000,
-            input=True,
-            frames_per_buffer=4000
-        )
-        self.is_listening = True
-        self.listen_thread = threading.Thread(target=self._listen_worker, daemon=True)
+        self.stream = self.audio.open(16000, STT_BLOCK_SIZE)
+        self.is_capturing = True
+        self.last_block = time.monotonic()
+        self.listen_thread = threading.Thread(target=self._listen_worker, args=(self.stream,), daemon=True)
         self.listen_thread.start()
+
+    def start_listening(self):
+        """Start a recognition session, beginning with the buffered pre-roll."""
+        with self._lock:
+            if self.is_listening:
+                return
+            self.barge_in = None
+            # Свіжий стан для нового клієнта: жодних залишків попередньої розмови
+            self.recognizer.Reset()
+            self._utterance.clear()
+            self.vad.reset()
+            self._reset_partial()
+            self._clear_text_queue()
+            for block in self.preroll:
+                self._recognize(block)
+            self.preroll.clear()
+            self._preroll_bytes = 0
+            self.is_listening = True
         logger.info("🎙️ Mikrofon włączony. Nasłuchiwanie...")
 
-    def _listen_worker(self):
+    def _listen_worker(self, stream):
         """Background thread reading from microphone and feeding Vosk."""
-        while self.is_listening:
+        # Strumień jako argument: po restart_capture() stary wątek nie czyta z nowego
+        while self.is_capturing and stream is self.stream:
+            try:
+                # Uzbrojony barge-in czyta po 20 ms: decyzja nie czeka na koniec 100 ms bloku
+                size = BARGE_IN_BLOCK_SIZE if self.barge_in is not None else STT_BLOCK_SIZE
+                data = stream.read(size)
+                self.last_block = time.monotonic()
+                self.read_errors = 0
+                self._capture(data, time.perf_counter())
+            except Exception as e:
+                if self.is_capturing and stream is self.stream:
+                    self.read_errors += 1
+                    if self.read_errors in (1, 10) or self.read_errors % 100 == 0:
+                        logger.error(f"STT Error ({self.read_errors}x): {e}")
+                    # Bez pauzy odłączony mikrofon kręci pętlą błędów na 100% CPU
+                    time.sleep(min(1.0, 0.01 * self.read_errors))
+
+    def health(self):
+        """Capture thread alive and seconds since the microphone last delivered a block."""
+        if self.audio is None or not self.is_capturing:
+            return {"alive": True, "stalled_s": 0.0}
+        return {
+            "alive": self.listen_thread is not None and self.listen_thread.is_alive(),
+            "stalled_s": time.monotonic() - self.last_block if self.last_block else 0.0,
+        }
+
+    def restart_capture(self):
+        """Reopen the microphone (e.g. USB device replugged) keeping model, recognizers and session.
+
+        The old capture thread, if stuck in a read, is abandoned: it only
+        reads from the stream it was started with.
+        """
+        if self.audio is None:
+            return
+        self.is_capturing = False
+        old_stream, old_thread = self.stream, self.listen_thread
+        self.stream = None
+        if old_thread and old_thread.is_alive():
+            old_thread.join(timeout=1)
+        if old_thread is None or not old_thread.is_alive():
+            # PortAudio nie zniesie zamknięcia strumienia pod wątkiem, który z niego czyta
+            try:
+                if old_stream:
+                    old_stream.close()
+                self.audio.reset()
+            except Exception as e:
+                logger.warning(f"STT: zamknięcie starego strumienia: {e}")
+        self.read_errors = 0
+        self.open_stream()
+        self.restarts += 1
+        logger.warning(f"♻️ STT: mikrofon otwarty ponownie ({self.restarts}. raz)")
+
+    def _capture(self, data, captured_at):
+        onset = None
+        woken = False
+        with self._lock:
+            if self.is_listening:
+                self._recognize(data)
+                return
+            self.preroll.append(data)
+            self._preroll_bytes += len(data)
+            while self._preroll_bytes - len(self.preroll[0]) >= self.preroll_max_bytes:
+                self._preroll_bytes -= len(self.preroll.popleft())
+            detector = self.barge_in
+            if detector is not None:
+                if detector.process(data, captured_at):
+                    self.barge_in = None
+                    onset = detector.onset
+            elif self.wake is not None and self.wake.process(data, captured_at):
+                # Sama fraza nie jest pytaniem - dialog usłyszy tylko to, co padło po niej
+                self.preroll.clear()
+                self._preroll_bytes = 0
+                # Detektor zna aktualny szum hali; VAD dialogu nie słuchał od ostatniej sesji
+                self.vad.noise_floor = self.wake.vad.noise_floor
+                woken = True
+        if woken and self.on_wake:
+            try:
+                self.on_wake()
+            except Exception as e:
+                logger.error(f"Wake callback error: {e}")
+        if onset is not None and self.on_barge_in:
+            # Poza blokadą: callback wycisza TTS i wywołuje start_listening()
+            try:
+                self.on_barge_in(onset)
+            except Exception as e:
+                logger.error(f"Barge-in callback error: {e}")
+
+    def arm_barge_in(self, detector):
+        """Watch the microphone for the customer speaking over the kiosk."""
+        with self._lock:
+            detector.reset()
+            self.barge_in = detector
+
+    def disarm_barge_in(self):
+        with self._lock:
+            self.barge_in = None
+
+    def arm_wake(self, detector):
+        """Listen for the wake phrase whenever no session is listening."""
+        with self._lock:
+            detector.reset()
+            self.wake = detector
+
+    def disarm_wake(self):
+        with self._lock:
+            self.wake = None
+
+    def feed(self, data):
+        """Recognize a block of 16 kHz int16 audio from a source other than the microphone."""
+        with self._lock:
+            if self.is_listening:
+                self._recognize(data)
+
+    def flush(self):
+        """End of input: emit whatever the recognizer still holds, including pending re-decodes."""
+        with self._lock:
+            if self.is_listening and self.vad.in_speech:
+                self.vad.reset()
+                self._emit(self.recognizer.FinalResult())
+        if self._fallbacks is not None:
+            self._fallbacks.join()
+
+    def _recognize(self, data):
+        # VAD: до Vosk потрапляє лише мова (разом з початком і "хвостами" слів)
+        audio, ended = self.vad.process(data)
+        if audio:
+            if self.grammar or self.on_utterance:
+                self._utterance += audio
+            if self.recognizer.AcceptWaveform(audio):
+                tracer.mark("speech_end")
+                with tracer.span("stt.final", endpoint="vosk"):
+                    self._emit(self.recognizer.Result())
+            elif self.on_partial and not ended:
+                self._check_partial()
+        if ended:
+            # Кінець фрази за VAD - не чекаємо на власний endpointing Vosk
+            tracer.mark("speech_end")
+            with tracer.span("stt.final", endpoint="vad"):
+                self._emit(self.recognizer.FinalResult())
+
+    def _needs_fallback(self, result, utterance):
+        """Whether a grammar result is worth re-decoding with the full vocabulary."""
+        words = result.get("result", [])
+        if not utterance or not words:
+            return False  # pusty wynik przy gramatyce z [unk] - sam szum, nie mowa spoza słownika
+        # Fraza kończy się "ogonem" ciszy VAD; krótsza mowa to stuknięcie albo kaszel
+        tail = self.vad.hangover_frames * self.vad.frame_len * 2
+        if len(utterance) - tail < STT_FALLBACK_MIN_S * 16000 * 2:
+            return False
+        confidence = sum(w["conf"] for w in words) / len(words)
+        return confidence < STT_GRAMMAR_MIN_CONF or "[unk]" in result.get("text", "")
+
+    def _submit_fallback(self, result, utterance, decode):
+        """Queue a result for the fallback worker (called under self._lock)."""
+        if self._fallback_thread is None:
+            self._fallbacks = queue.Queue()
+            self._fallback_thread = threading.Thread(target=self._fallback_worker, name="stt-fallback", daemon=True)
+            self._fallback_thread.start()
+        self._fallback_pending += 1
+        self._fallbacks.put((result, utterance, decode))
+
+    def _fallback_worker(self):
+        while True:
+            item = self._fallbacks.get()
+            try:
+                if item is None:
+                    return
+                result, utterance, decode = item
+                if decode:
+                    result = self._open_vocabulary(result, utterance)
+                self._deliver(result.get("text", "").strip(), utterance)
+            except Exception as e:
+                logger.error(f"STT fallback error: {e}")
+            finally:
+                if item is not None:
+                    with self._lock:
+                        self._fallback_pending -= 1
+                self._fallbacks.task_done()
+
+    def _open_vocabulary(self, result, utterance):
+        words = result.get("result", [])
+        confidence = sum(w["conf"] for w in words) / len(words) if words else 0.0
+        with tracer.span("stt.open_vocabulary", confidence=round(confidence, 2)):
+            if self.open_recognizer is None:
+                self.open_recognizer = self._new_recognizer()
+            self.open_recognizer.AcceptWaveform(utterance)
+            fallback = json.loads(self.open_recognizer.FinalResult())
+        logger.debug(f"Grammar conf {confidence:.2f}, open vocabulary: '{fallback.get('text', '')}'")
+        return fallback
+
+    def _check_partial(self):
+        """Report a partial hypothesis once it stayed unchanged for a few polls."""
+        partial = json.loads(self.recognizer.PartialResult()).get("partial", "").strip()
+        if not partial or partial != self._partial:
+            self._partial = partial
+            self._partial_polls = 0
+            return
+        self._partial_polls += 1
+        if self._partial_polls >= STT_PARTIAL_STABLE_POLLS and partial != self._partial_sent:
+            self._partial_sent = partial
+            try:
+                self.on_partial(partial)
+            except Exception as e:
+                logger.error(f"Partial callback error: {e}")
+
+    def _reset_partial(self):
+        self._partial = self._partial_sent = ""
+        self._partial_polls = 0
+
+    def _emit(self, result_json):
+        self._reset_partial()
+        result = json.loads(result_json)
+        utterance, self._utterance = bytes(self._utterance), bytearray()
+        if self.grammar:
+            decode = self._needs_fallback(result, utterance)
+            if decode or self._fallback_pending:
+                self._submit_fallback(result, utterance, decode)
+                return
+        self._deliver(result.get("text", "").strip(), utterance)
+
+    def _deliver(self, text, utterance):
+        # Przed tekstem: odbiorca tekstu może już odwołać się do nagrania
+        if self.on_utterance and utterance:
             try:
-                data = self.stream.read(4000, exception_on_overflow=False)
-                
-                # Застосування Noise Gate (ігноруємо тихі звуки та фоновий галас)
-                rms = self._get_rms(data)
-                if rms < NOISE_GATE_THRESHOLD:
-                    continue  # Пропускаємо фрейм, якщо він тихіший за поріг
-                
-                if self.recognizer.AcceptWaveform(data):
-                    result = json.loads(self.recognizer.Result())
-                    text = result.get("text", "").strip()
-                    if text:
-                        logger.info(f"👤 Klient: {text}")
-                        self.text_queue.put(text)
+                self.on_utterance(utterance, text)
             except Exception as e:
-                if self.is_listening:
-                    logger.error(f"STT Error: {e}")
+                logger.error(f"Utterance callback error: {e}")
+        if text:
+            logger.info(f"👤 Klient: {text}")
+            self.text_queue.put(text)
+            if self.on_text:
+                self.on_text(text)
+
+    def _clear_text_queue(self):
+        while True:
+            try:
+                self.text_queue.get_nowait()
+            except queue.Empty:
+                return
 
     def get_text(self, block=True, timeout=None):
         """Retrieve recognized text from the queue."""
@@ -93,16 +398,37 @@ class STTEngine:
             return ""
 
     def stop_listening(self):
-        """Stop audio capture."""
-        self.is_listening = False
-        if self.stream:
-            self.stream.stop_stream()
-            self.stream.close()
+        """End the recognition session; the microphone itself stays open."""
+        with self._lock:
+            if not self.is_listening:
+                return
+            self.is_listening = False
+            self.vad.reset()
+            if self.wake is not None:
+                self.wake.reset()  # dźwięk z czasu sesji detektor ominął
+        logger.info(f"🛑 Mikrofon wyłączony. VAD: {self.vad.stats()}")
+
+    def close(self):
+        """Release the microphone (kiosk shutdown)."""
+        self.stop_listening()
+        if self._fallback_thread is not None:
+            self._fallbacks.put(None)
+            self._fallback_thread.join(timeout=5)
+            self._fallback_thread = None
+        self.is_capturing = False
         if self.listen_thread and self.listen_thread.is_alive():
             self.listen_thread.join(timeout=2)
-        logger.info("🛑 Mikrofon wyłączony.")
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if self.server:
+            keywords = self.wake.recognizer if self.wake is not None else None
+            for recognizer in (self.recognizer, self.open_recognizer, keywords):
+                if recognizer is not None:
+                    recognizer.close()
         
     def __del__(self):
-        self.stop_listening()
+        if hasattr(self, '_lock'):
+            self.close()
         if hasattr(self, 'audio') and self.audio:
-            self.audio.terminate()
+            self.audio.close()
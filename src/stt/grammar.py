@@ -0,0 +1,118 @@
+"""
+Constrained Vosk grammar built from the kiosk's own knowledge.
+
+The kiosk only understands dish names, menu words and FAQ triggers, so
+decoding against the full Polish vocabulary wastes CPU. This module
+collects those phrases from every knowledge source and writes them as a
+Vosk grammar (JSON list of phrases).
+
+Usage:
+    python -m src.stt.grammar [output.json]
+"""
+import json
+import logging
+import re
+import sys
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+try:
+    from src.config.settings import STT_GRAMMAR_PATH
+except ImportError:
+    STT_GRAMMAR_PATH = "data/grammar.json"
+
+DATA_DIR = Path("data")
+
+# Słowa "kleju" typowe dla pytań klientów - bez nich gramatyka nie złoży zdania
+FILLER_WORDS = [
+    "a", "i", "w", "z", "na", "do", "dla", "o", "u", "po", "to", "ten", "ta", "te",
+    "co", "czy", "jak", "jaki", "jaka", "jakie", "ile", "który", "która", "które",
+    "macie", "jest", "są", "mi", "się", "mam", "ma", "nie", "tak", "można",
+    "proszę", "poproszę", "chcę", "chciałbym", "chciałabym", "daj", "dajcie",
+    "karkandak", "karkandaka", "karkandaki", "karkandaków", "menu", "danie", "dania",
+    "słodkie", "słodki", "słone", "wytrawne", "ostre", "ostry", "łagodny",
+    "dzieci", "dziecka", "wegetariańskie", "wegańskie", "alergeny", "gluten",
+    "sos", "sosy", "rekord", "zasady", "telefon", "numer", "zł", "złotych",
+]
+
+_WORD = re.compile(r"[^\W\d_]+")
+
+
+def _words(text):
+    return _WORD.findall(text.lower())
+
+
+def _phrase(text):
+    return " ".join(_words(text))
+
+
+def _load_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Grammar source skipped ({path}): {e}")
+        return {}
+
+
+def collect_phrases(data_dir=DATA_DIR):
+    """All phrases the kiosk can act on, from every knowledge source."""
+    from src.config.knowledge import MENU, KARKANDAKI_INFO
+    from src.config.settings import ALLERGENS_DB
+    from src.nlp.processor import INTENT_KEYWORDS
+
+    phrases = []
+    for keywords in INTENT_KEYWORDS.values():
+        phrases.extend(keywords)
+
+    knowledge = _load_json(Path(data_dir) / "knowledge.json")
+    for dish in knowledge.get("dishes", []):
+        phrases.append(dish["name"])
+        phrases.extend(dish.get("ingredients", []))
+    phrases.extend(knowledge.get("faq", {}).keys())
+
+    for key, item in MENU.items():
+        phrases.append(key.replace("_", " "))
+        phrases.append(item["nazwa"])
+    phrases.extend(KARKANDAKI_INFO.get("sosy", []))
+    for allergens in ALLERGENS_DB.values():
+        phrases.extend(allergens)
+
+    # qa.json jest (na razie) po ukraińsku - słowa spoza słownika modelu Vosk pominie sam
+    for question in _load_json(Path(data_dir) / "qa.json").get("questions", []):
+        phrases.extend(question.get("keywords", []))
+
+    phrases.extend(FILLER_WORDS)
+    return phrases
+
+
+def build_grammar(data_dir=DATA_DIR):
+    """Vosk grammar: every phrase, every single word, and the [unk] garbage model."""
+    phrases = {_phrase(p) for p in collect_phrases(data_dir)}
+    phrases.discard("")
+    words = {w for p in phrases for w in p.split()}
+    return sorted(phrases | words) + ["[unk]"]
+
+
+def load_grammar(path=STT_GRAMMAR_PATH):
+    """Return the grammar as the JSON string KaldiRecognizer expects, or None."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.dumps(json.load(f), ensure_ascii=False)
+    except (OSError, ValueError):
+        return None
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    output = Path(argv[0] if argv else STT_GRAMMAR_PATH)
+    grammar = build_grammar()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(grammar, f, ensure_ascii=False, indent=1)
+    print(f"✅ Gramatyka: {len(grammar)} fraz -> {output}")
+
+
+if __name__ == "__main__":
+    main()
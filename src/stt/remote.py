@@ -0,0 +1,109 @@
+"""
+Client side of the shared speech backend (src/stt/server.py).
+
+``RemoteRecognizer`` has the KaldiRecognizer methods STTEngine uses, so a
+kiosk screen can switch to the shared model without touching its capture,
+VAD or grammar fallback logic. Calls are synchronous request/response on
+a Unix socket; a local round trip costs tens of microseconds next to the
+decoding itself.
+"""
+import json
+import socket
+import threading
+
+from src.stt.server import (
+    FRAME, OP_AUDIO, OP_BOOL, OP_ERROR, OP_FINAL, OP_HELLO, OP_JSON, OP_PARTIAL, OP_QUERY, OP_RESET,
+    OP_RESULT, pack,
+)
+
+
+class RemoteError(RuntimeError):
+    pass
+
+
+class _Connection:
+    def __init__(self, path, timeout=10.0):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self._lock = threading.Lock()
+
+    def _read(self, n):
+        data = bytearray()
+        while len(data) < n:
+            chunk = self.sock.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("speech server closed the connection")
+            data += chunk
+        return bytes(data)
+
+    def call(self, op, payload=b""):
+        with self._lock:
+            self.sock.sendall(pack(op, payload))
+            reply, length = FRAME.unpack(self._read(FRAME.size))
+            body = self._read(length) if length else b""
+        if reply == OP_ERROR:
+            raise RemoteError(body.decode("utf-8"))
+        return reply, body
+
+    def close(self):
+        self.sock.close()
+
+
+class RemoteRecognizer:
+    """KaldiRecognizer look-alike backed by a pooled recognizer on the server."""
+
+    def __init__(self, path, grammar=None, words=False):
+        self.conn = _Connection(path)
+        self.grammar = grammar
+        self.words = words
+        self._hello()
+
+    def _hello(self):
+        self.conn.call(OP_HELLO, json.dumps({"grammar": self.grammar, "words": self.words}).encode("utf-8"))
+
+    def SetWords(self, enabled):
+        self.words = bool(enabled)
+        self._hello()
+
+    def AcceptWaveform(self, data):
+        reply, body = self.conn.call(OP_AUDIO, bytes(data))
+        return reply == OP_BOOL and body == b"1"
+
+    def _json(self, op):
+        return self.conn.call(op)[1].decode("utf-8")
+
+    def Result(self):
+        return self._json(OP_RESULT)
+
+    def PartialResult(self):
+        return self._json(OP_PARTIAL)
+
+    def FinalResult(self):
+        return self._json(OP_FINAL)
+
+    def Reset(self):
+        self.conn.call(OP_RESET)
+
+    def close(self):
+        self.conn.close()
+
+
+class RemoteNLP:
+    """Ask the server's NLPProcessor; same (intent, response) as NLPProcessor.match()."""
+
+    def __init__(self, path):
+        self.conn = _Connection(path)
+
+    def match(self, query):
+        reply, body = self.conn.call(OP_QUERY, query.encode("utf-8"))
+        if reply != OP_JSON:
+            raise RemoteError(f"unexpected reply {reply!r}")
+        result = json.loads(body)
+        return result["intent"], result["response"]
+
+    def process_query(self, query):
+        return self.match(query)[1]
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,240 @@
+"""
+Shared speech backend: one Vosk model, a pool of recognizers, many kiosk screens.
+
+Front-ends (STTEngine with STT_SERVER_SOCKET set) keep capture, VAD and
+pre-roll local and talk to this process over a Unix socket with the same
+calls they would make on a KaldiRecognizer (AcceptWaveform, Result,
+PartialResult, FinalResult, Reset). A recognizer is leased from the pool
+on the first audio of an utterance and returned on its final result or
+reset, so idle screens (promo mode) hold none. Decoding runs on a thread
+pool sized to the CPU; results with text also carry the NLP answer, so a
+front-end does not need to load the knowledge base either.
+
+Wire format: 1 byte opcode + uint32 length + payload, request/response.
+
+Usage:
+    python -m src.stt.server [--model PATH] [--socket PATH] [--pool 8]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from src.telemetry.tracing import tracer
+
+try:
+    from src.config.settings import STT_SERVER_SOCKET, STT_SERVER_POOL, STT_SERVER_WORKERS
+except ImportError:
+    STT_SERVER_SOCKET, STT_SERVER_POOL, STT_SERVER_WORKERS = None, 8, os.cpu_count() or 2
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "/tmp/kiosk-stt.sock"
+FRAME = struct.Struct("<cI")
+
+# Klient -> serwer
+OP_HELLO = b"H"     # JSON {"grammar": str|null, "words": bool}
+OP_AUDIO = b"A"     # int16 16 kHz -> OP_BOOL (koniec frazy wg Vosk)
+OP_RESULT = b"r"
+OP_PARTIAL = b"p"
+OP_FINAL = b"f"
+OP_RESET = b"Z"
+OP_QUERY = b"Q"     # tekst -> JSON {"intent", "response"}
+# Serwer -> klient
+OP_OK = b"O"
+OP_BOOL = b"B"
+OP_JSON = b"J"
+OP_ERROR = b"E"
+
+
+def pack(op, payload=b""):
+    return FRAME.pack(op, len(payload)) + payload
+
+
+async def read_frame(reader):
+    op, length = FRAME.unpack(await reader.readexactly(FRAME.size))
+    return op, await reader.readexactly(length) if length else b""
+
+
+class RecognizerPool:
+    """At most `size` recognizers leased at once; idle ones are reused per grammar."""
+
+    def __init__(self, factory, size=STT_SERVER_POOL):
+        self.factory = factory  # grammar (str|None), words (bool) -> recognizer
+        self.size = size
+        self._slots = asyncio.Semaphore(size)
+        self._idle = {}  # (grammar, words) -> [recognizer]
+        self.leased = 0
+        self.created = 0
+        self.waits = 0
+
+    async def acquire(self, grammar=None, words=False):
+        if self._slots.locked():
+            self.waits += 1  # wszystkie rozpoznawacze zajęte - kolejka
+        await self._slots.acquire()
+        self.leased += 1
+        idle = self._idle.get((grammar, words))
+        if idle:
+            return idle.pop()
+        self.created += 1
+        return await asyncio.get_running_loop().run_in_executor(None, self.factory, grammar, words)
+
+    def release(self, recognizer, grammar=None, words=False):
+        recognizer.Reset()
+        idle = self._idle.setdefault((grammar, words), [])
+        if len(idle) < self.size:  # nadmiarowe bezczynne idą do GC
+            idle.append(recognizer)
+        self.leased -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {"size": self.size, "leased": self.leased, "created": self.created, "waits": self.waits,
+                "idle": sum(len(v) for v in self._idle.values())}
+
+
+class SpeechServer:
+    """asyncio Unix-socket server; one connection per front-end recognizer."""
+
+    def __init__(self, factory, nlp=None, pool_size=STT_SERVER_POOL, workers=STT_SERVER_WORKERS):
+        self.factory = factory
+        self.nlp = nlp
+        self.pool_size = pool_size
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt-decode")
+        self.pool = None
+        self.server = None
+        self.connections = 0
+
+    async def start(self, path=DEFAULT_SOCKET):
+        asyncio.get_running_loop().set_default_executor(self.executor)
+        self.pool = RecognizerPool(self.factory, self.pool_size)
+        if os.path.exists(path):
+            os.unlink(path)
+        self.server = await asyncio.start_unix_server(self._serve, path=path)
+        logger.info(f"🎧 Serwer STT: {path}, pula {self.pool_size}, wątki {self.executor._max_workers}")
+        return self.server
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    def _annotate(self, result_json):
+        """Add the NLP answer to a result with text."""
+        if self.nlp is None:
+            return result_json
+        result = json.loads(result_json)
+        text = result.get("text", "").strip()
+        if text:
+            result["intent"], result["response"] = self.nlp.match(text)
+        return json.dumps(result, ensure_ascii=False)
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        loop = asyncio.get_running_loop()
+        grammar, words = None, False
+        recognizer = None
+
+        def release():
+            nonlocal recognizer
+            if recognizer is not None:
+                self.pool.release(recognizer, grammar, words)
+                recognizer = None
+
+        try:
+            while True:
+                try:
+                    op, payload = await read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    return
+                try:
+                    if op == OP_HELLO:
+                        hello = json.loads(payload or b"{}")
+                        release()
+                        grammar, words = hello.get("grammar"), bool(hello.get("words"))
+                        reply = pack(OP_OK, json.dumps({"pool": self.pool.size}).encode())
+                    elif op == OP_AUDIO:
+                        if recognizer is None:
+                            recognizer = await self.pool.acquire(grammar, words)
+                        with tracer.span("stt.server.decode"):
+                            endpoint = await loop.run_in_executor(None, recognizer.AcceptWaveform, payload)
+                        reply = pack(OP_BOOL, b"1" if endpoint else b"0")
+                    elif op in (OP_RESULT, OP_FINAL, OP_PARTIAL):
+                        if recognizer is None:
+                            text = '{"partial" : ""}' if op == OP_PARTIAL else '{"text" : ""}'
+                        elif op == OP_PARTIAL:
+                            text = recognizer.PartialResult()
+                        else:
+                            method = recognizer.Result if op == OP_RESULT else recognizer.FinalResult
+                            text = self._annotate(await loop.run_in_executor(None, method))
+                            if op == OP_FINAL:
+                                release()  # fraza zamknięta - rozpoznawacz wraca do puli
+                        reply = pack(OP_JSON, text.encode("utf-8"))
+                    elif op == OP_RESET:
+                        release()
+                        reply = pack(OP_OK)
+                    elif op == OP_QUERY:
+                        if self.nlp is None:
+                            raise RuntimeError("NLP not loaded on this server")
+                        intent, response = self.nlp.match(payload.decode("utf-8"))
+                        reply = pack(OP_JSON, json.dumps({"intent": intent, "response": response},
+                                                         ensure_ascii=False).encode("utf-8"))
+                    else:
+                        raise ValueError(f"unknown opcode {op!r}")
+                except (ValueError, RuntimeError) as e:
+                    reply = pack(OP_ERROR, str(e).encode("utf-8"))
+                writer.write(reply)
+                await writer.drain()
+        finally:
+            release()
+            self.connections -= 1
+            writer.close()
+
+
+def vosk_factory(model_path):
+    """Recognizer factory over one shared Vosk model."""
+    from vosk import KaldiRecognizer, Model
+
+    model = Model(model_path)
+
+    def make(grammar=None, words=False):
+        recognizer = KaldiRecognizer(model, 16000, grammar) if grammar else KaldiRecognizer(model, 16000)
+        if words:
+            recognizer.SetWords(True)
+        return recognizer
+
+    return make
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared STT/NLP backend for kiosk screens")
+    parser.add_argument("--model", default="src/assets/models/vosk-model-pl")
+    parser.add_argument("--socket", default=STT_SERVER_SOCKET or DEFAULT_SOCKET)
+    parser.add_argument("--pool", type=int, default=STT_SERVER_POOL)
+    parser.add_argument("--workers", type=int, default=STT_SERVER_WORKERS)
+    parser.add_argument("--no-nlp", action="store_true")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    nlp = None
+    if not args.no_nlp:
+        from src.nlp.processor import NLPProcessor
+        nlp = NLPProcessor()
+    server = SpeechServer(vosk_factory(args.model), nlp, args.pool, args.workers)
+
+    async def run():
+        await server.start(args.socket)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Voice Activity Detection for the capture thread.
+Vectorized frame energy (NumPy) + adaptive noise floor + attack/hangover.
+"""
+import time
+from collections import deque
+
+import numpy as np
+
+try:
+    from src.config.settings import (
+        NOISE_GATE_THRESHOLD, VAD_FRAME_MS, VAD_RATIO, VAD_ATTACK_FRAMES, VAD_HANGOVER_FRAMES,
+    )
+except ImportError:
+    NOISE_GATE_THRESHOLD = 500
+    VAD_FRAME_MS, VAD_RATIO, VAD_ATTACK_FRAMES, VAD_HANGOVER_FRAMES = 20, 2.5, 3, 25
+
+
+def frame_rms(samples, frame_len):
+    """RMS of consecutive frames of int16 samples, computed in one pass."""
+    n = len(samples) // frame_len
+    frames = samples[:n * frame_len].reshape(n, frame_len).astype(np.float32)
+    return np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame_len)
+
+
+class VoiceActivityDetector:
+    """Energy-based VAD tracking the loudness of the fair hall.
+
+    A frame counts as voiced when its energy exceeds both the fixed minimum
+    (NOISE_GATE_THRESHOLD) and the current noise floor times VAD_RATIO.
+    Speech starts after VAD_ATTACK_FRAMES voiced frames (the frames that
+    triggered it are replayed, so the onset is not lost) and ends only
+    after VAD_HANGOVER_FRAMES quiet frames, so quiet word tails reach the
+    recognizer too.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=VAD_FRAME_MS, min_threshold=NOISE_GATE_THRESHOLD,
+                 ratio=VAD_RATIO, attack_frames=VAD_ATTACK_FRAMES, hangover_frames=VAD_HANGOVER_FRAMES,
+                 rise=0.002, fall=0.1):
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.min_threshold = min_threshold
+        self.ratio = ratio
+        self.attack_frames = attack_frames
+        self.hangover_frames = hangover_frames
+        self.rise = rise  # powolny wzrost: kilkusekundowa mowa nie podbija progu
+        self.fall = fall  # szybki spadek: hala ucichła -> czulszy próg
+        self.noise_floor = None
+        self.level = 0.0  # energia ostatniej ramki
+        self.peak = 0.0  # najgłośniejsza ramka ostatniego bloku (wskaźnik na ekranie)
+        self.in_speech = False
+        self._remainder = np.empty(0, dtype=np.int16)
+        self._onset = deque(maxlen=attack_frames)
+        self._voiced_run = 0
+        self._hangover = 0
+        self._frames = 0
+        self._cpu = 0.0
+
+    @property
+    def threshold(self):
+        if self.noise_floor is None:
+            return self.min_threshold
+        return max(self.min_threshold, self.noise_floor * self.ratio)
+
+    def reset(self):
+        """Forget the current utterance but keep the learned noise floor."""
+        self.in_speech = False
+        self._remainder = np.empty(0, dtype=np.int16)
+        self._onset.clear()
+        self._voiced_run = 0
+        self._hangover = 0
+
+    def process(self, block):
+        """Consume raw int16 audio; return (audio_for_recognizer, speech_ended)."""
+        started = time.thread_time()
+        samples = np.frombuffer(block, dtype="<i2")
+        if self._remainder.size:
+            samples = np.concatenate((self._remainder, samples))
+        n = len(samples) // self.frame_len
+        self._remainder = samples[n * self.frame_len:].copy()
+        energies = frame_rms(samples, self.frame_len)
+
+        out = []
+        ended = False
+        for i, energy in enumerate(energies.tolist()):
+            frame = samples[i * self.frame_len:(i + 1) * self.frame_len]
+            voiced = energy > self.threshold
+            self._track_floor(energy)
+
+            if not self.in_speech:
+                self._onset.append(frame)
+                self._voiced_run = self._voiced_run + 1 if voiced else 0
+                if self._voiced_run >= self.attack_frames:
+                    self.in_speech = True
+                    self._hangover = self.hangover_frames
+                    out.extend(self._onset)
+                    self._onset.clear()
+                continue
+
+            out.append(frame)
+            if voiced:
+                self._hangover = self.hangover_frames
+            else:
+                self._hangover -= 1
+                if self._hangover <= 0:
+                    self.in_speech = False
+                    self._voiced_run = 0
+                    ended = True
+
+        if len(energies):
+            self.level = energies[-1]
+            self.peak = float(energies.max())
+        self._frames += len(energies)
+        self._cpu += time.thread_time() - started
+        audio = np.concatenate(out).tobytes() if out else b""
+        return audio, ended
+
+    def _track_floor(self, energy):
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        elif energy > self.noise_floor:
+            self.noise_floor += self.rise * (energy - self.noise_floor)
+        else:
+            self.noise_floor += self.fall * (energy - self.noise_floor)
+
+    def stats(self):
+        """Per-frame CPU cost and the current adaptive threshold."""
+        return {
+            "frames": self._frames,
+            "cpu_us_per_frame": 1e6 * self._cpu / self._frames if self._frames else 0.0,
+            "noise_floor": self.noise_floor,
+            "threshold": self.threshold,
+        }
@@ -0,0 +1,191 @@
+"""
+Wake phrase: a customer starts the dialog by saying "hej Araks" instead
+of pressing START.
+
+Between sessions the microphone is open anyway (pre-roll), so the
+detector runs on the same capture thread, in two stages:
+
+1. Energy gate: a VoiceActivityDetector of its own. Hall noise costs one
+   RMS per 20 ms frame and nothing more.
+2. Keyword recognizer: a Vosk recognizer whose grammar is only the wake
+   phrases plus "[unk]". It is fed only what the gate lets through, and
+   at most WAKE_MAX_SPEECH_S of each burst (a conversation next to the
+   stand is not decoded to its end).
+
+A partial result that reads as a whole wake phrase for a few blocks in a
+row fires at once, so a question spoken straight after the phrase is
+still in the pre-roll the dialog recognizer replays. A final result
+needs every word of the phrase at WAKE_MIN_CONF. Nothing is decoded
+while the kiosk itself is talking (promo phrases).
+
+CPU time is measured with thread_time() per WAKE_BUDGET_WINDOW_S of
+audio. Above WAKE_CPU_BUDGET (% of one core) the energy gate is raised,
+so fewer bursts reach the recognizer; once the hall is quiet again it
+comes back down.
+"""
+import json
+import logging
+import time
+
+from src.stt.vad import VoiceActivityDetector
+from src.telemetry.tracing import tracer
+
+try:
+    from src.config.settings import (
+        WAKE_PHRASES, WAKE_MIN_CONF, WAKE_MAX_SPEECH_S, WAKE_CPU_BUDGET, WAKE_BUDGET_WINDOW_S, WAKE_MAX_GATE,
+        STT_PARTIAL_STABLE_POLLS, BARGE_IN_ECHO_WINDOW,
+    )
+except ImportError:
+    WAKE_PHRASES = ["hej araks", "cześć araks", "araks"]
+    WAKE_MIN_CONF, WAKE_MAX_SPEECH_S = 0.7, 2.5
+    WAKE_CPU_BUDGET, WAKE_BUDGET_WINDOW_S, WAKE_MAX_GATE = 5.0, 10.0, 8.0
+    STT_PARTIAL_STABLE_POLLS, BARGE_IN_ECHO_WINDOW = 2, 0.3
+
+logger = logging.getLogger(__name__)
+
+GATE_STEP = 1.5
+
+
+def wake_grammar(phrases=WAKE_PHRASES):
+    """Vosk grammar for the keyword recognizer: the phrases and the [unk] garbage model."""
+    return json.dumps(list(phrases) + ["[unk]"], ensure_ascii=False)
+
+
+def find_phrase(text, phrases=WAKE_PHRASES):
+    """The longest wake phrase present in text as whole words, or None."""
+    padded = f" {text.lower()} "
+    return next((p for p in sorted(phrases, key=len, reverse=True) if f" {p} " in padded), None)
+
+
+class WakeWordDetector:
+    """Energy gate + keyword-only recognizer on the idle capture stream, within a CPU budget."""
+
+    def __init__(self, recognizer, phrases=WAKE_PHRASES, echo=None, sample_rate=16000,
+                 min_conf=WAKE_MIN_CONF, max_speech_s=WAKE_MAX_SPEECH_S, stable_polls=STT_PARTIAL_STABLE_POLLS,
+                 cpu_budget=WAKE_CPU_BUDGET, window_s=WAKE_BUDGET_WINDOW_S, max_gate=WAKE_MAX_GATE):
+        self.recognizer = recognizer  # gramatyka: wake_grammar(phrases), słowa z conf
+        self.phrases = [p.lower() for p in phrases]
+        self.echo = echo  # EchoReference TTS: własnego głosu nie dekodujemy
+        self.vad = VoiceActivityDetector(sample_rate=sample_rate)
+        self.bytes_per_second = sample_rate * 2
+        self.max_speech_bytes = int(max_speech_s * sample_rate) * 2
+        self.min_conf = min_conf
+        self.stable_polls = stable_polls
+        self.cpu_budget = cpu_budget
+        self.window_s = window_s
+        self.max_gate = max_gate
+        self.base_threshold = self.vad.min_threshold
+        self.gate = 1.0  # mnożnik progu energii (governor budżetu CPU)
+        self.wakes = 0
+        self.rejected = 0  # wypowiedzi zdekodowane bez frazy
+        self.cpu_pct = 0.0  # ostatnie okno
+        self._fed = 0
+        self._partial = ""
+        self._partial_polls = 0
+        self._cpu = 0.0
+        self._audio = 0.0
+        self._decoded = 0.0
+        self._window_cpu = 0.0
+        self._window_audio = 0.0
+
+    def reset(self):
+        """Forget the current burst (after a dialog, the audio in between is gone)."""
+        self.vad.reset()
+        self.recognizer.Reset()
+        self._fed = 0
+        self._partial = ""
+        self._partial_polls = 0
+
+    def process(self, block, captured_at=None):
+        """Consume one capture block; True when a wake phrase was just heard."""
+        started = time.thread_time()
+        try:
+            return self._process(block, time.perf_counter() if captured_at is None else captured_at)
+        finally:
+            spent = time.thread_time() - started
+            seconds = len(block) / self.bytes_per_second
+            self._cpu += spent
+            self._audio += seconds
+            self._window_cpu += spent
+            self._window_audio += seconds
+            if self._window_audio >= self.window_s:
+                self._govern()
+
+    def _process(self, block, captured_at):
+        if self.echo is not None and self.echo.level(captured_at - BARGE_IN_ECHO_WINDOW, captured_at) > 0:
+            if self.vad.in_speech or self._fed:
+                self.reset()
+            return False
+
+        audio, ended = self.vad.process(block)
+        if audio and self._fed < self.max_speech_bytes:
+            audio = audio[:self.max_speech_bytes - self._fed]
+            self._fed += len(audio)
+            self._decoded += len(audio) / self.bytes_per_second
+            if self.recognizer.AcceptWaveform(audio):
+                if self._final(self.recognizer.Result()):
+                    return self._fire()
+            elif self._stable_partial(json.loads(self.recognizer.PartialResult()).get("partial", "")):
+                return self._fire()
+        if ended:
+            hit = self._fed and self._final(self.recognizer.FinalResult())
+            self._fed = 0
+            self._partial, self._partial_polls = "", 0
+            if hit:
+                return self._fire()
+        return False
+
+    def _stable_partial(self, partial):
+        if partial != self._partial:
+            self._partial, self._partial_polls = partial, 0
+        self._partial_polls += 1
+        return find_phrase(partial, self.phrases) is not None and self._partial_polls >= self.stable_polls
+
+    def _final(self, result_json):
+        result = json.loads(result_json)
+        phrase = find_phrase(result.get("text", ""), self.phrases)
+        if phrase is None:
+            if result.get("text"):
+                self.rejected += 1
+            return False
+        words = set(phrase.split())
+        confs = [w.get("conf", 1.0) for w in result.get("result", []) if w.get("word") in words]
+        if confs and min(confs) < self.min_conf:
+            logger.debug(f"Wake: '{phrase}' odrzucone (conf {min(confs):.2f})")
+            self.rejected += 1
+            return False
+        return True
+
+    def _fire(self):
+        self.wakes += 1
+        tracer.count("wake.trigger")
+        logger.info(f"👋 Fraza budząca ({self.wakes}.)")
+        self.reset()
+        return True
+
+    def _govern(self):
+        # Budżet CPU: za drogo -> wyższy próg energii, taniej o połowę -> z powrotem w dół
+        self.cpu_pct = 100.0 * self._window_cpu / self._window_audio
+        self._window_cpu = self._window_audio = 0.0
+        gate = self.gate
+        if self.cpu_pct > self.cpu_budget:
+            gate = min(self.max_gate, gate * GATE_STEP)
+        elif self.cpu_pct < self.cpu_budget / 2:
+            gate = max(1.0, gate / GATE_STEP)
+        if gate != self.gate:
+            logger.info(f"👂 Wake: CPU {self.cpu_pct:.1f}% (budżet {self.cpu_budget:.1f}%) - próg x{gate:.2f}")
+            self.gate = gate
+            self.vad.min_threshold = self.base_threshold * gate
+
+    def stats(self):
+        """Idle CPU of the detector (% of one core) against its budget, and what it did."""
+        return {
+            "cpu_pct": round(100.0 * self._cpu / self._audio, 2) if self._audio else 0.0,
+            "window_cpu_pct": round(self.cpu_pct, 2),
+            "budget_pct": self.cpu_budget,
+            "gate": round(self.gate, 2),
+            "decoded_share": round(self._decoded / self._audio, 3) if self._audio else 0.0,
+            "audio_s": round(self._audio, 1),
+            "wakes": self.wakes,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,51 @@
+"""
+WAV input for offline recognition: recordings at any rate -> 16 kHz mono int16.
+"""
+import wave
+
+import numpy as np
+
+TARGET_RATE = 16000
+
+
+def lowpass_taps(cutoff, taps=63):
+    """Windowed-sinc low-pass FIR; cutoff as a fraction of the sample rate."""
+    n = np.arange(taps) - (taps - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (h / h.sum()).astype(np.float32)
+
+
+def resample(samples, rate, target=TARGET_RATE):
+    """Resample float or int16 mono samples; integer ratios are filtered and decimated."""
+    if rate == target:
+        return np.asarray(samples, dtype=np.float32)
+    x = np.asarray(samples, dtype=np.float32)
+    if rate % target == 0:
+        factor = rate // target
+        # Filtr antyaliasingowy tuż pod nową częstotliwością Nyquista, potem co n-ta próbka
+        filtered = np.convolve(x, lowpass_taps(0.45 / factor), mode="same")
+        return filtered[::factor]
+    duration = len(x) / rate
+    t_out = np.arange(int(duration * target)) / target
+    return np.interp(t_out, np.arange(len(x)) / rate, x).astype(np.float32)
+
+
+def read_wav(path, rate=TARGET_RATE):
+    """Samples of a 16-bit PCM WAV as mono int16 at the given rate."""
+    with wave.open(str(path), "rb") as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM is supported")
+        channels, source_rate = w.getnchannels(), w.getframerate()
+        samples = np.frombuffer(w.readframes(w.getnframes()), dtype="<i2")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    out = resample(samples, source_rate, rate)
+    return np.clip(np.round(out), -32768, 32767).astype(np.int16)
+
+
+def blocks(samples, size):
+    """Consecutive raw byte blocks of size samples (the last one may be shorter)."""
+    data = np.asarray(samples, dtype="<i2").tobytes()
+    step = size * 2
+    for i in range(0, len(data), step):
+        yield data[i:i + step]
@@ -0,0 +1,252 @@
+"""
+Runtime health: resource samples, subsystem watchdog, ring-buffer log.
+
+A supervisor thread wakes every HEALTH_INTERVAL_S and
+  * samples process CPU, RSS, open file descriptors and thread count
+    (one read of /proc/self/stat and one listdir; ~30 µs),
+  * asks each watched subsystem for ``health()`` -> {"alive", "stalled_s"}
+    and restarts it in place (``TTSEngine.restart``,
+    ``STTEngine.restart_capture``) when a thread died or work has been
+    stuck longer than its limit; the Vosk model and TTS voices stay loaded,
+  * appends one fixed-size record to a ring file, so a 12-hour fair fits
+    in a few hundred KB that never grow and survive a crash.
+
+Usage:
+    python -m src.telemetry.health show [--log logs/health.ring] [--last 60]
+"""
+import argparse
+import logging
+import os
+import resource
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Callable, NamedTuple, Optional
+
+from src.telemetry.tracing import tracer
+
+try:
+    from src.config.settings import HEALTH_INTERVAL_S, HEALTH_LOG_PATH, HEALTH_LOG_RECORDS, RESTART_COOLDOWN_S
+except ImportError:
+    HEALTH_INTERVAL_S, HEALTH_LOG_PATH, HEALTH_LOG_RECORDS, RESTART_COOLDOWN_S = 5.0, "logs/health.ring", 17280, 30
+
+logger = logging.getLogger(__name__)
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_FD_DIR = "/proc/self/fd" if os.path.isdir("/proc/self/fd") else "/dev/fd"
+
+
+class Sample(NamedTuple):
+    ts: float
+    cpu: float        # % jednego rdzenia od poprzedniej próbki
+    rss: int          # bajty
+    fds: int
+    threads: int
+    unhealthy: int    # maska bitowa obserwowanych podsystemów (kolejność watch())
+    restarts: int     # łącznie od startu
+
+
+def _cpu_rss():
+    """(CPU seconds, RSS bytes) of this process, cheaply."""
+    try:
+        with open("/proc/self/stat", "rb") as f:
+            fields = f.read().rsplit(b")", 1)[1].split()
+        # Po nazwie procesu: utime=11, stime=12, rss=21 (liczone od pola 'state')
+        return (int(fields[11]) + int(fields[12])) / _TICKS, int(fields[21]) * _PAGE
+    except (OSError, IndexError, ValueError):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        # Poza Linuksem: szczytowe RSS (macOS podaje bajty, inne systemy KB)
+        rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+        return usage.ru_utime + usage.ru_stime, rss
+
+
+class ResourceSampler:
+    def __init__(self):
+        self._last = None
+
+    def sample(self, unhealthy=0, restarts=0):
+        now = time.monotonic()
+        cpu_s, rss = _cpu_rss()
+        cpu = 0.0
+        if self._last is not None and now > self._last[0]:
+            cpu = 100.0 * (cpu_s - self._last[1]) / (now - self._last[0])
+        self._last = (now, cpu_s)
+        try:
+            fds = len(os.listdir(_FD_DIR))
+        except OSError:
+            fds = -1
+        return Sample(time.time(), cpu, rss, fds, threading.active_count(), unhealthy, restarts)
+
+
+class RingLog:
+    """Fixed-capacity binary log: header + records; the oldest are overwritten."""
+
+    MAGIC = b"KHR1"
+    HEADER = struct.Struct("<4sII")        # magic, capacity, liczba zapisanych (rośnie bez końca)
+    RECORD = struct.Struct("<dfQiHHH")     # 30 bajtów na próbkę
+
+    def __init__(self, path=HEALTH_LOG_PATH, capacity=HEALTH_LOG_RECORDS):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        header = os.pread(self.fd, self.HEADER.size, 0)
+        if len(header) == self.HEADER.size and header[:4] == self.MAGIC:
+            _, self.capacity, self.written = self.HEADER.unpack(header)
+        else:
+            self.capacity, self.written = capacity, 0
+            os.ftruncate(self.fd, 0)
+            os.pwrite(self.fd, self.HEADER.pack(self.MAGIC, self.capacity, 0), 0)
+        self._lock = threading.Lock()
+
+    def append(self, sample):
+        record = self.RECORD.pack(sample.ts, sample.cpu, sample.rss, sample.fds, min(sample.threads, 65535),
+                                  sample.unhealthy & 0xFFFF, min(sample.restarts, 65535))
+        with self._lock:
+            slot = self.written % self.capacity
+            os.pwrite(self.fd, record, self.HEADER.size + slot * self.RECORD.size)
+            self.written += 1
+            # Nagłówek po rekordzie: po awarii co najwyżej ostatnia próbka jest pominięta
+            os.pwrite(self.fd, self.HEADER.pack(self.MAGIC, self.capacity, self.written), 0)
+
+    def read(self, last=None):
+        """Samples oldest first (only the last ones with last=N)."""
+        with self._lock:
+            count = min(self.written, self.capacity)
+            first = self.written - count
+            if last is not None:
+                first = max(first, self.written - last)
+            samples = []
+            for n in range(first, self.written):
+                slot = n % self.capacity
+                data = os.pread(self.fd, self.RECORD.size, self.HEADER.size + slot * self.RECORD.size)
+                samples.append(Sample(*self.RECORD.unpack(data)))
+        return samples
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Watched:
+    """One supervised subsystem."""
+
+    def __init__(self, name, probe, restart=None, stall_after=60.0):
+        self.name = name
+        self.probe: Callable[[], dict] = probe
+        self.restart: Optional[Callable[[], None]] = restart
+        self.stall_after = stall_after
+        self.restarts = 0
+        self.last_restart = None
+        self.healthy = True
+
+
+class Supervisor:
+    """Samples resources and restarts wedged subsystems from a background thread."""
+
+    def __init__(self, log=None, interval=HEALTH_INTERVAL_S, cooldown=RESTART_COOLDOWN_S):
+        self.log = log
+        self.interval = interval
+        self.cooldown = cooldown
+        self.sampler = ResourceSampler()
+        self.watched = []
+        self.restarts = 0
+        self.last_sample = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch(self, name, probe, restart=None, stall_after=60.0):
+        """probe() -> {"alive": bool, "stalled_s": float}; restart() fixes it in place (None = report only)."""
+        self.watched.append(Watched(name, probe, restart, stall_after))
+
+    def check(self):
+        """One round: probe, restart what is wedged, sample, log. Returns the sample."""
+        unhealthy = 0
+        now = time.monotonic()
+        for bit, sub in enumerate(self.watched):
+            try:
+                state = sub.probe()
+                problem = None if state["alive"] else "wątek nie żyje"
+                if problem is None and state["stalled_s"] > sub.stall_after:
+                    problem = f"bez postępu od {state['stalled_s']:.0f} s"
+            except Exception as e:
+                problem = f"sonda: {e}"
+            sub.healthy = problem is None
+            if sub.healthy:
+                continue
+            unhealthy |= 1 << bit
+            if sub.restart is None:
+                logger.warning(f"🩺 {sub.name}: {problem}")
+            elif sub.last_restart is None or now - sub.last_restart >= self.cooldown:
+                logger.error(f"🩺 {sub.name}: {problem} - restart")
+                sub.last_restart = now
+                sub.restarts += 1
+                self.restarts += 1
+                tracer.count("health.restart", subsystem=sub.name)
+                try:
+                    sub.restart()
+                except Exception:
+                    logger.exception(f"Restart {sub.name} nieudany")
+        self.last_sample = self.sampler.sample(unhealthy, self.restarts)
+        if self.log is not None:
+            try:
+                self.log.append(self.last_sample)
+            except OSError as e:
+                logger.warning(f"Health log: {e}")
+        return self.last_sample
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Supervisor round failed")
+
+    def start(self):
+        self.sampler.sample()  # punkt odniesienia dla CPU
+        self._thread = threading.Thread(target=self._run, name="health", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+        if self.log is not None:
+            self.log.close()
+
+    def status(self):
+        return {sub.name: {"healthy": sub.healthy, "restarts": sub.restarts} for sub in self.watched}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kiosk health samples")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show")
+    show.add_argument("--log", default=HEALTH_LOG_PATH)
+    show.add_argument("--last", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.log):
+        print(f"❌ Brak logu {args.log}")
+        return 1
+    log = RingLog(args.log)
+    try:
+        samples = log.read(args.last)
+    finally:
+        log.close()
+    print(f"{'czas':19}  {'CPU%':>6}  {'RSS MB':>7}  {'fd':>4}  {'wątki':>5}  {'awarie':>6}  restarty")
+    for s in samples:
+        stamp = datetime.fromtimestamp(s.ts).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{stamp}  {s.cpu:6.1f}  {s.rss / 2**20:7.1f}  {s.fds:4d}  {s.threads:5d}  {s.unhealthy:06b}  {s.restarts}")
+    if len(samples) > 1:
+        first, last = samples[0], samples[-1]
+        hours = (last.ts - first.ts) / 3600 or 1
+        print(f"RSS {(last.rss - first.rss) / 2**20:+.1f} MB ({(last.rss - first.rss) / 2**20 / hours:+.1f} MB/h), "
+              f"fd {last.fds - first.fds:+d}, wątki {last.threads - first.threads:+d}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
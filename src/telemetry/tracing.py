@@ -0,0 +1,288 @@
+"""
+Per-stage latency tracing for dialog turns.
+
+Spans measure one stage (``stt.final``, ``nlp.match``, ``tts.synthesis``...)
+and are aggregated into fixed-bucket histograms, exported as Prometheus
+text on a local HTTP endpoint and appended to a rolling JSONL file.
+When tracing is disabled ``tracer.span()`` returns a shared no-op object,
+so instrumented code pays one attribute check per call.
+
+Usage:
+    from src.telemetry.tracing import tracer
+
+    with tracer.span("nlp.match") as span:
+        ...
+        span.set(rule="prices")
+"""
+import bisect
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from src.config.settings import (
+        TRACING_ENABLED, METRICS_HOST, METRICS_PORT, TRACE_LOG_PATH, TRACE_LOG_MAX_MB, TRACE_LOG_BACKUPS,
+    )
+except ImportError:
+    TRACING_ENABLED = os.getenv("KIOSK_TRACING", "0") == "1"
+    METRICS_HOST, METRICS_PORT = "127.0.0.1", 9108
+    TRACE_LOG_PATH, TRACE_LOG_MAX_MB, TRACE_LOG_BACKUPS = "logs/traces.jsonl", 10, 3
+
+logger = logging.getLogger(__name__)
+
+# Від 1 мс (NLP) до 10 с (синтез у повільній мережі)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations in seconds."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # ostatni kubełek: +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def cumulative(self):
+        with self._lock:
+            return list(itertools.accumulate(self.counts)), self.sum, self.count
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        return self
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "started")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.started = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer.record(self.name, time.perf_counter() - self.started, **self.attrs)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        return self
+
+
+class RotatingJsonl:
+    """Appends records as JSON lines from a background thread, rotating by size."""
+
+    def __init__(self, path, max_bytes, backups=3, max_pending=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._worker, name="trace-writer", daemon=True)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._thread.start()
+
+    def write(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1  # nigdy nie blokujemy wątku audio przez dysk
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def _worker(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            lines = [record]
+            while len(lines) < 500:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    self._queue.put(None)
+                    break
+                lines.append(record)
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for line in lines:
+                        f.write(json.dumps(line, ensure_ascii=False) + "\n")
+                if os.path.getsize(self.path) > self.max_bytes:
+                    self._rotate()
+            except OSError as e:
+                logger.warning(f"Trace log write failed: {e}")
+            finally:
+                for _ in lines:
+                    self._queue.task_done()
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=2)
+
+
+class Tracer:
+    """Collects spans of the current dialog turn into histograms and sinks."""
+
+    def __init__(self, enabled=TRACING_ENABLED, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+        self.turn = 0
+        self.sinks = []
+        self.server = None
+        self._marks = {}
+        self._lock = threading.Lock()
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attrs)
+
+    def record(self, name, seconds, **attrs):
+        """Add an externally measured duration (e.g. across threads)."""
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram(self.buckets))
+        histogram.observe(seconds)
+        if self.sinks:
+            record = {"ts": round(time.time(), 3), "turn": self.turn, "span": name,
+                      "ms": round(seconds * 1000, 3), **attrs}
+            for sink in self.sinks:
+                sink.write(record)
+
+    def count(self, name, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def begin_turn(self):
+        """Start a new dialog turn; span records carry its number."""
+        with self._lock:
+            self.turn += 1
+            self._marks.clear()
+            return self.turn
+
+    def mark(self, name):
+        """Remember when something happened in this turn (e.g. end of speech)."""
+        if self.enabled:
+            self._marks[name] = time.perf_counter()
+
+    def since(self, mark, name, **attrs):
+        """Record the time elapsed since a mark, once per mark."""
+        if not self.enabled:
+            return
+        started = self._marks.pop(mark, None)
+        if started is not None:
+            self.record(name, time.perf_counter() - started, **attrs)
+
+    def prometheus(self):
+        """Histograms and counters in the Prometheus text exposition format."""
+        lines = [
+            "# HELP kiosk_stage_duration_seconds Duration of one dialog stage.",
+            "# TYPE kiosk_stage_duration_seconds histogram",
+        ]
+        for name, histogram in sorted(self.histograms.items()):
+            cumulative, total, count = histogram.cumulative()
+            for bound, value in zip(histogram.buckets + ("+Inf",), cumulative):
+                lines.append(f'kiosk_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {value}')
+            lines.append(f'kiosk_stage_duration_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'kiosk_stage_duration_seconds_count{{stage="{name}"}} {count}')
+        lines += ["# HELP kiosk_events_total Dialog events by kind.", "# TYPE kiosk_events_total counter"]
+        with self._lock:
+            counters = sorted(self.counters.items())
+        for (name, labels), value in counters:
+            rendered = ",".join([f'event="{name}"'] + [f'{k}="{v}"' for k, v in labels])
+            lines.append(f"kiosk_events_total{{{rendered}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, host=METRICS_HOST, port=METRICS_PORT):
+        """Expose /metrics on a local HTTP port from a daemon thread."""
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # scrape co 15 s nie zaśmieca logu kiosku
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True).start()
+        logger.info(f"📈 Metryki: http://{host}:{self.server.server_address[1]}/metrics")
+        return self.server
+
+    def start(self, log_path=TRACE_LOG_PATH, host=METRICS_HOST, port=METRICS_PORT):
+        """Enable tracing with the JSONL log and the metrics endpoint."""
+        self.enabled = True
+        if log_path:
+            self.sinks.append(RotatingJsonl(log_path, TRACE_LOG_MAX_MB * 1024 * 1024, TRACE_LOG_BACKUPS))
+        if port is not None:
+            try:
+                self.serve(host, port)
+            except OSError as e:
+                logger.warning(f"Metrics endpoint unavailable: {e}")
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        for sink in self.sinks:
+            sink.close()
+        self.sinks = []
+
+
+tracer = Tracer()
@@ -0,0 +1,267 @@
+"""Pluggable speech synthesis backends and a latency-aware router.
+
+Every backend exposes the same small async interface: ``stream(text)``
+yields encoded audio chunks as they are produced. The router tries the
+backends in order of preference and skips those that recently failed or
+whose measured time-to-first-chunk exceeds the latency budget, so the
+kiosk keeps talking when the fair Wi-Fi is slow or gone.
+"""
+import abc
+import asyncio
+import logging
+import os
+import threading
+import time
+
+try:
+    from src.config.settings import (
+        TTS_VOICE, TTS_RATE, TTS_BACKENDS, PIPER_MODEL_PATH,
+        TTS_LATENCY_BUDGET, TTS_FIRST_CHUNK_TIMEOUT, TTS_BACKEND_COOLDOWN,
+    )
+except ImportError:
+    TTS_VOICE, TTS_RATE = "pl-PL-ZofiaNeural", "+5%"
+    TTS_BACKENDS = ["edge", "piper"]
+    PIPER_MODEL_PATH = "src/assets/models/piper/pl_PL-gosia-medium.onnx"
+    TTS_LATENCY_BUDGET, TTS_FIRST_CHUNK_TIMEOUT, TTS_BACKEND_COOLDOWN = 1.0, 2.5, 60
+
+logger = logging.getLogger(__name__)
+
+
+class TTSBackend(abc.ABC):
+    """Base class: a named voice producing audio in a fixed format."""
+
+    name = "base"
+    audio_format = "mp3"  # "mp3" albo surowy "pcm" (s16le, mono)
+    sample_rate = 24000
+
+    def __init__(self, voice):
+        self.voice = voice
+
+    @abc.abstractmethod
+    async def stream(self, text):
+        """Yield audio chunks for text (an async generator)."""
+
+    def __repr__(self):
+        return f"<{self.name}:{self.voice}>"
+
+
+class EdgeBackend(TTSBackend):
+    """Microsoft neural voices via edge-tts (cloud, MP3)."""
+
+    name = "edge"
+
+    def __init__(self, voice=TTS_VOICE, rate=TTS_RATE):
+        import edge_tts  # zależność opcjonalna - offline kiosk może jej nie mieć
+
+        super().__init__(voice)
+        self.rate = rate
+        self._edge_tts = edge_tts
+
+    async def stream(self, text):
+        communicate = self._edge_tts.Communicate(text, self.voice, rate=self.rate)
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"]
+
+
+_END = object()
+
+
+class PiperBackend(TTSBackend):
+    """Offline Piper voice synthesized in-process to 16-bit PCM.
+
+    Piper produces audio one phonemized sentence at a time; each piece is
+    yielded as soon as it is ready, not after the whole text. For the
+    single sentences TTSEngine sends, that is still one chunk per call.
+    """
+
+    name = "piper"
+    audio_format = "pcm"
+
+    def __init__(self, model_path=PIPER_MODEL_PATH):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Piper voice not found at {model_path}")
+        from piper import PiperVoice
+
+        super().__init__(f"piper:{os.path.basename(model_path)}")
+        self._voice = PiperVoice.load(model_path)
+        self.sample_rate = self._voice.config.sample_rate
+
+    def _synthesize(self, text):
+        # piper-tts < 1.3 ma synthesize_stream_raw, nowsze zwracają AudioChunk
+        if hasattr(self._voice, "synthesize_stream_raw"):
+            return self._voice.synthesize_stream_raw(text)
+        return (chunk.audio_int16_bytes for chunk in self._voice.synthesize(text))
+
+    def _produce(self, text, loop, out, stop):
+        """Executor thread: hands every chunk to the event loop the moment Piper returns it."""
+        try:
+            for chunk in self._synthesize(text):
+                if stop.is_set():
+                    return  # przerwane (barge-in, zmiana backendu) - reszty nie syntezujemy
+                loop.call_soon_threadsafe(out.put_nowait, chunk)
+            item = _END
+        except Exception as e:
+            item = e
+        try:
+            loop.call_soon_threadsafe(out.put_nowait, item)
+        except RuntimeError:
+            pass  # pętla już zamknięta
+
+    async def stream(self, text):
+        # Synteza jest blokująca (ONNX), więc w executorze
+        loop = asyncio.get_running_loop()
+        out, stop = asyncio.Queue(), threading.Event()
+        loop.run_in_executor(None, self._produce, text, loop, out, stop)
+        try:
+            while True:
+                item = await out.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+
+class FakeBackend(TTSBackend):
+    """Deterministic network-free backend for tests and dry runs."""
+
+    name = "fake"
+
+    def __init__(self, voice="fake", audio_format="mp3", latency=0.0,
+                 fail=False, chunks=2, chunk_size=600):
+        super().__init__(voice)
+        self.audio_format = audio_format
+        self.latency = latency
+        self.fail = fail
+        self.chunks = chunks
+        self.chunk_size = chunk_size
+        self.calls = []
+
+    async def stream(self, text):
+        self.calls.append(text)
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise ConnectionError(f"{self.voice} unavailable")
+        for _ in range(self.chunks):
+            yield b"\0" * self.chunk_size
+
+
+class _BackendHealth:
+    """Recent latency and failure state of one backend."""
+
+    def __init__(self):
+        self.latency = None  # EWMA time-to-first-chunk, seconds
+        self.measured_at = 0.0
+        self.down_until = 0.0
+        self.failures = 0
+
+    def record_latency(self, seconds, alpha=0.3):
+        self.latency = seconds if self.latency is None else (
+            alpha * seconds + (1 - alpha) * self.latency
+        )
+        self.measured_at = time.monotonic()
+        self.down_until = 0.0
+        self.failures = 0
+
+    def record_failure(self, cooldown):
+        self.failures += 1
+        self.down_until = time.monotonic() + cooldown
+
+
+class BackendRouter:
+    """Chooses a backend per utterance and falls back when one is slow or down."""
+
+    def __init__(self, backends, latency_budget=TTS_LATENCY_BUDGET,
+                 first_chunk_timeout=TTS_FIRST_CHUNK_TIMEOUT, cooldown=TTS_BACKEND_COOLDOWN):
+        if not backends:
+            raise ValueError("At least one TTS backend is required")
+        self.backends = list(backends)
+        self.latency_budget = latency_budget
+        self.first_chunk_timeout = first_chunk_timeout
+        self.cooldown = cooldown
+        self.health = {id(b): _BackendHealth() for b in self.backends}
+
+    def candidates(self):
+        """Backends in the order they should be tried for the next utterance."""
+        now = time.monotonic()
+        healthy, slow, down = [], [], []
+        for backend in self.backends:
+            health = self.health[id(backend)]
+            if health.down_until > now:
+                down.append(backend)
+            elif (health.latency is not None and health.latency > self.latency_budget
+                  and now - health.measured_at < self.cooldown):
+                slow.append(backend)
+            else:
+                healthy.append(backend)
+        # Wolne backendy po cooldownie wracają do gry (próbkujemy je ponownie),
+        # a "down" zostają na końcu jako ostatnia deska ratunku
+        return healthy + slow + down
+
+    async def stream(self, text):
+        """Yield (backend, chunk) pairs from the first backend that answers in time.
+
+        Switching is only possible before the first chunk; a backend failing
+        mid-utterance raises, since its partial audio has already been played.
+        """
+        last_error = None
+        for backend in self.candidates():
+            health = self.health[id(backend)]
+            started = time.monotonic()
+            chunks = backend.stream(text)
+            try:
+                first = await asyncio.wait_for(chunks.__anext__(), self.first_chunk_timeout)
+            except StopAsyncIteration:
+                health.record_latency(time.monotonic() - started)
+                return
+            except Exception as e:  # timeout, network, missing voice...
+                last_error = e
+                health.record_failure(self.cooldown)
+                logger.warning(f"TTS backend {backend} failed ({type(e).__name__}), trying next")
+                await chunks.aclose()
+                continue
+
+            latency = time.monotonic() - started
+            health.record_latency(latency)
+            if latency > self.latency_budget:
+                logger.info(f"TTS backend {backend} slow: {latency:.2f}s to first chunk")
+            yield backend, first
+            try:
+                async for chunk in chunks:
+                    yield backend, chunk
+            except Exception:
+                health.record_failure(self.cooldown)
+                raise
+            return
+
+        raise ConnectionError(f"All TTS backends failed: {last_error}")
+
+    def stats(self):
+        return {
+            repr(b): {
+                "latency": self.health[id(b)].latency,
+                "failures": self.health[id(b)].failures,
+            }
+            for b in self.backends
+        }
+
+
+BACKEND_FACTORIES = {
+    "edge": EdgeBackend,
+    "piper": PiperBackend,
+    "fake": FakeBackend,
+}
+
+
+def build_backends(names=TTS_BACKENDS):
+    """Instantiate the configured backends, skipping those unavailable here."""
+    backends = []
+    for name in names:
+        try:
+            backends.append(BACKEND_FACTORIES[name]())
+        except Exception as e:
+            logger.warning(f"TTS backend '{name}' unavailable: {e}")
+    return backends
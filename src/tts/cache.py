@@ -0,0 +1,109 @@
+"""Persistent, content-addressed cache of synthesized speech.
+
+Entries are keyed by (voice, rate, cleaned text) so that the same sentence
+spoken by the same voice is synthesized only once and survives restarts.
+The cache is bounded by size and evicts the least recently used clips.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class AudioCache:
+    """On-disk LRU cache of synthesized audio clips."""
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024, suffix=".mp3"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, oldest first
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+        self._load_index()
+
+    @staticmethod
+    def make_key(voice, rate, text):
+        """Stable content address for a (voice, rate, text) triple."""
+        raw = "\x1f".join((voice, rate, text)).encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}{self.suffix}"
+
+    def _load_index(self):
+        """Rebuild the LRU order from file access times left by a previous run."""
+        found = []
+        for path in self.cache_dir.glob(f"*{self.suffix}"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            found.append((st.st_mtime, path.stem, st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total += size
+        self._evict()
+        logger.info(f"TTS cache: {len(self._entries)} clips, {self._total / 1e6:.1f} MB")
+
+    def get(self, key):
+        """Return the cached clip path, or None. Marks the clip as recently used."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            # Plik zniknął spod nas (ręczne czyszczenie) - traktujemy jak brak.
+            with self._lock:
+                self._total -= self._entries.pop(key, 0)
+            return None
+        return path
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key, data):
+        """Store clip bytes atomically and return the final path."""
+        path = self._path(key)
+        tmp = path.with_suffix(path.suffix + ".part")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._total -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._total += len(data)
+            self._evict()
+        return path
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+            logger.debug(f"TTS cache evicted {key[:12]}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "clips": len(self._entries),
+                "bytes": self._total,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
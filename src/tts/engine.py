@@ -1,105 +1,454 @@
-"""Text-to-Speech engine with Microsoft Azure Neural Voices via edge-tts."""
+"""Text-to-Speech engine with pluggable voices (edge-tts neural, offline Piper)."""
 import logging
 import threading
 import queue
 import asyncio
+import itertools
 import os
+import re
 import tempfile
-import subprocess
-import platform
 import time
-import edge_tts
+import wave
+from pathlib import Path
+
+from src.audio.devices import open_output
+from src.tts.backends import BackendRouter, build_backends
+from src.tts.cache import AudioCache
+from src.tts.sentences import split_sentences
+from src.stt.bargein import EchoReference
+from src.telemetry.tracing import tracer
+
+try:
+    from src.config.settings import (
+        TTS_RATE, TTS_CACHE_DIR, TTS_CACHE_MAX_MB, TTS_STREAMING,
+        TTS_LOOKAHEAD,
+    )
+except ImportError:
+    TTS_RATE = "+5%"
+    TTS_CACHE_DIR, TTS_CACHE_MAX_MB = "data/tts_cache", 200
+    TTS_STREAMING = True
+    TTS_LOOKAHEAD = 2
 
 logger = logging.getLogger(__name__)
 
+_FINISHED = object()
+
+
+class _Interrupted(Exception):
+    """The clip being synthesized belongs to a reply that was interrupted."""
+
+
+class _Clip:
+    """One synthesized sentence travelling from the synthesis to the playback stage."""
+
+    def __init__(self, text, last, generation=0):
+        self.text = text
+        self.generation = generation  # interrupt() unieważnia klipy starszych generacji
+        self.last = last  # ostatnie zdanie danego speak() -> task_done po odtworzeniu
+        self.chunks = queue.Queue()
+        self.backend = None  # ustawiany przed pierwszym fragmentem audio
+        self.path = None
+        self.requested = None  # czas speak() dla pierwszego zdania odpowiedzi (tracing)
+        self.request = None  # id żądania speak(); zamykane po ostatnim zdaniu
+
+    def push(self, data):
+        self.chunks.put(data)
+
+    def finish(self):
+        self.chunks.put(None)
+
+
 class TTSEngine:
-    """Production-ready Neural TTS engine."""
-    
-    def __init__(self):
+    """Production-ready Neural TTS engine.
+
+    Works as a two-stage pipeline: the synthesis thread splits replies into
+    sentences and synthesizes up to TTS_LOOKAHEAD clips ahead, while the
+    playback thread plays them back to back. Synthesis coroutines run on
+    ``loop`` (the kiosk's event loop) when one is given, otherwise on a
+    private loop of the calling thread. Audio goes to ``output``, a src.audio
+    output device (default: AUDIO_OUTPUT).
+    """
+
+    def __init__(self, backends=None, loop=None, output=None):
+        self.router = BackendRouter(backends if backends is not None else build_backends())
+        self.loop = loop
+        self.output = output or open_output()
+        self._local = threading.local()
+        # Co i kiedy gra głośnik - odniesienie dla wykrywania wejścia w słowo (barge-in)
+        self.echo = EchoReference()
+        self.generation = 0
         self.speech_queue = queue.Queue()
+        self.clip_queue = queue.Queue(maxsize=TTS_LOOKAHEAD)
         self.is_speaking = False
         self.speaking_thread = None
-        self.current_process = None
-        self.voice = "pl-PL-ZofiaNeural" 
-        self.os_type = platform.system()
-        
+        self.playback_thread = None
+        self.voice = self.router.backends[0].voice
+        self.rate = TTS_RATE
+        self.caches = {}
+        self._caches_lock = threading.Lock()
+        self.cache = self._cache_for("mp3")
+        self.players = {}
+        self.active_player = None
+        self.prefetch_queue = queue.Queue()
+        self.prefetch_thread = None
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        # Otwarte żądania speak() -> on_done; restart() zamyka te, które trzyma zawieszony wątek
+        self._requests = {}
+        self._request_ids = itertools.count()
+        self._requests_lock = threading.Lock()
+        self._epoch = 0  # wątki starszej epoki (porzucone przez restart) kończą się przy najbliższej okazji
+        self._busy = {}  # etap -> od kiedy (monotonic) pracuje nad bieżącym klipem
+        self.restarts = 0
+
         self._start_worker()
-        logger.info(f"TTS Engine initialized: {self.voice} on {self.os_type}")
+        logger.info(f"TTS Engine initialized: {self.router.backends} on {self.output}")
+
+    def _cache_for(self, audio_format):
+        """One cache per audio format; MP3 stays in the top-level directory."""
+        with self._caches_lock:
+            if audio_format not in self.caches:
+                cache_dir = Path(TTS_CACHE_DIR)
+                if audio_format != "mp3":
+                    cache_dir = cache_dir / audio_format
+                try:
+                    self.caches[audio_format] = AudioCache(
+                        cache_dir, max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024, suffix=f".{audio_format}"
+                    )
+                except OSError as e:
+                    logger.warning(f"TTS cache disabled: {e}")
+                    self.caches[audio_format] = None
+            return self.caches[audio_format]
+
+    def _player_for(self, backend):
+        """Persistent streaming player for the backend's audio format, or None."""
+        if not TTS_STREAMING:
+            return None
+        fmt = (backend.audio_format, backend.sample_rate)
+        if fmt not in self.players:
+            self.players[fmt] = self.output.player(*fmt, echo=self.echo)
+            if self.players[fmt] is None:
+                logger.warning(f"No stdin-capable player for {fmt}, falling back to file playback")
+        return self.players[fmt]
+
+    def _cached(self, text):
+        """Return (backend, path) of a clip any configured voice already made."""
+        for backend in self.router.backends:
+            cache = self._cache_for(backend.audio_format)
+            key = AudioCache.make_key(backend.voice, self.rate, text)
+            if cache is not None and key in cache:
+                path = cache.get(key)
+                if path:
+                    return backend, path
+        return None, None
 
     def _clean_text(self, text):
-        import re
         text = re.sub(r'```.*?```', '', text, flags=re.DOTALL)
         text = re.sub(r'#.*$', '', text, flags=re.MULTILINE)
         text = re.sub(r'[<>]', '', text)
         return text.strip()
 
-    async def _generate_audio(self, text, output_file):
-        communicate = edge_tts.Communicate(text, self.voice, rate="+5%")
-        await communicate.save(output_file)
+    async def _stream_audio(self, text, on_chunk):
+        """Synthesize through the router; returns the backend that answered."""
+        used = None
+        async for backend, chunk in self.router.stream(text):
+            used = backend
+            on_chunk(backend, chunk)
+        return used
+
+    def _store(self, backend, text, parts):
+        cache = self._cache_for(backend.audio_format)
+        if cache is None or not parts:
+            return None
+        return cache.put(AudioCache.make_key(backend.voice, self.rate, text), b"".join(parts))
+
+    def _run(self, coro):
+        """Run a synthesis coroutine to completion from a worker thread."""
+        if self.loop is not None and self.loop.is_running():
+            return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+        loop = getattr(self._local, "loop", None)
+        if loop is None:
+            loop = self._local.loop = asyncio.new_event_loop()
+        return loop.run_until_complete(coro)
+
+    def _synthesize_clip(self, clip):
+        """Fill the clip with audio, from the cache or from the routed backend."""
+        span = tracer.span("tts.synthesis", chars=len(clip.text))
+        try:
+            with span:
+                self._await_inflight(clip.text)
+                clip.backend, cached = self._cached(clip.text)
+                if cached:
+                    span.set(cached=True, backend=clip.backend.name)
+                    clip.path = str(cached)
+                    clip.push(cached.read_bytes())
+                    return
+
+                parts = []
+                started = time.perf_counter()
+
+                def on_chunk(backend, data):
+                    if self._stale(clip):
+                        raise _Interrupted()  # nie dociągamy reszty przerwanego zdania
+                    if not parts:
+                        tracer.record("tts.first_chunk", time.perf_counter() - started, backend=backend.name)
+                    clip.backend = backend
+                    parts.append(data)
+                    clip.push(data)
+
+                backend = self._run(self._stream_audio(clip.text, on_chunk))
+                span.set(cached=False, backend=backend.name if backend else None)
+                if backend:
+                    path = self._store(backend, clip.text, parts)
+                    clip.path = str(path) if path else None
+        finally:
+            clip.finish()
+
+    def _cache_sentence(self, sentence):
+        """Synthesize one sentence into the cache; True if a new clip was stored."""
+        if self._cached(sentence)[0]:
+            return False
+        with self._inflight_lock:
+            if sentence in self._inflight:
+                return False
+            done = self._inflight[sentence] = threading.Event()
+        try:
+            parts = []
+            backend = self._run(self._stream_audio(sentence, lambda b, data: parts.append(data)))
+            return bool(backend and self._store(backend, sentence, parts))
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(sentence, None)
+            done.set()
+
+    def _await_inflight(self, sentence, timeout=2.0):
+        """If a prefetch is already synthesizing this sentence, let it finish."""
+        with self._inflight_lock:
+            done = self._inflight.get(sentence)
+        if done:
+            done.wait(timeout)
+
+    def prewarm(self, texts):
+        """Synthesize every missing sentence into the cache in the background."""
+        if self._cache_for(self.router.backends[0].audio_format) is None:
+            return None
+
+        def worker():
+            created = failures = 0
+            sentences = []
+            for text in texts:
+                sentences.extend(split_sentences(self._clean_text(text or "")))
+            for sentence in dict.fromkeys(sentences):
+                try:
+                    created += self._cache_sentence(sentence)
+                except Exception as e:
+                    failures += 1
+                    logger.warning(f"TTS prewarm failed for '{sentence[:30]}': {e}")
+                    if failures >= 3:
+                        logger.warning("TTS prewarm aborted (offline?)")
+                        break
+            stats = {fmt: c.stats() for fmt, c in self.caches.items() if c}
+            logger.info(f"TTS prewarm done: {created} new clips, {stats}")
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
+
+    def prefetch(self, text):
+        """Synthesize a likely upcoming reply into the cache without playing it."""
+        if text:
+            self.prefetch_queue.put(text)
+
+    def _prefetch_worker(self, epoch):
+        while epoch == self._epoch:
+            text = self.prefetch_queue.get()
+            if text is None or not self.is_speaking or epoch != self._epoch:
+                return
+            for sentence in split_sentences(self._clean_text(text)):
+                try:
+                    self._cache_sentence(sentence)
+                except Exception as e:
+                    logger.warning(f"TTS prefetch failed for '{sentence[:30]}': {e}")
+                    break
 
     def _play_audio_sync(self, file_path):
         try:
-            if self.os_type == "Darwin":
-                cmd = ["afplay", file_path]
-            elif self.os_type == "Linux":
-                cmd = ["mpg123", "-q", file_path]
-            else:
-                cmd = ["powershell", "-c", f'(New-Object Media.SoundPlayer "{file_path}").PlaySync()']
-                
-            self.current_process = subprocess.Popen(cmd)
-            
-            while self.current_process.poll() is None and self.is_speaking:
-                time.sleep(0.1)
-                
-            if not self.is_speaking and self.current_process.poll() is None:
-                self.current_process.terminate()
+            # Długość pliku nieznana: referencja echa trwa do końca odtwarzania
+            self.echo.played(time.perf_counter(), time.perf_counter() + 3600)
+            # stop()/interrupt() przerywają odtwarzanie przez stop_file() - tu tylko czekamy na koniec
+            self.output.play_file(file_path)
         except Exception as e:
             logger.error(f"Playback error: {e}")
         finally:
-            self.current_process = None
+            self.echo.cut()
 
-    def _speech_worker(self):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    def _stale(self, clip):
+        return not self.is_speaking or clip.generation != self.generation
 
-        while self.is_speaking:
+    def _enqueue_clip(self, clip):
+        """Hand a clip to the playback stage; blocks while the lookahead is full."""
+        if self._stale(clip):
+            return False
+        self.clip_queue.put(clip)  # stop() opróżnia kolejkę, więc put nie zawiśnie
+        return True
+
+    def _finish(self, request):
+        """One speak() request is over (played, dropped or empty); None is a wake-up sentinel."""
+        if request is None:
+            self.speech_queue.task_done()
+            return
+        with self._requests_lock:
+            on_done = self._requests.pop(request, _FINISHED)
+        if on_done is _FINISHED:
+            return  # restart() zamknął je już za zawieszony wątek
+        self.speech_queue.task_done()
+        if on_done:
             try:
-                text = self.speech_queue.get(timeout=0.5)
-                if not text:
-                    continue
+                on_done()
+            except Exception as e:
+                logger.error(f"TTS done callback error: {e}")
 
-                cleaned = self._clean_text(text)
-                if not cleaned:
-                    self.speech_queue.task_done()
-                    continue
+    def _speech_worker(self, epoch):
+        """Synthesis stage: turns queued texts into clips, ahead of playback."""
+        while epoch == self._epoch:
+            item = self.speech_queue.get()
+            if item is None or not self.is_speaking or epoch != self._epoch:
+                self._finish(item[2] if item else None)
+                return
+            text, requested, request, generation = item
+            if generation != self.generation:
+                self._finish(request)  # przerwane, zanim zaczęła się synteza
+                continue
+            tracer.record("tts.queue_wait", time.perf_counter() - requested)
 
-                logger.info(f"Speaking: {cleaned[:50]}...")
-                fd, temp_path = tempfile.mkstemp(suffix=".mp3")
-                os.close(fd)
+            sentences = split_sentences(self._clean_text(text or ""))
+            if not sentences:
+                self._finish(request)
+                continue
 
+            logger.info(f"Speaking: {sentences[0][:50]}... ({len(sentences)} zdań)")
+            for i, sentence in enumerate(sentences):
+                clip = _Clip(sentence, last=i == len(sentences) - 1, generation=generation)
+                if i == 0:
+                    clip.requested = requested
+                if clip.last:
+                    clip.request = request
+                if not self._enqueue_clip(clip):
+                    self._finish(request)  # zatrzymano w połowie wypowiedzi
+                    break
+                if self._stale(clip):
+                    clip.finish()
+                    continue
+                self._busy["synthesis"] = time.monotonic()
                 try:
-                    loop.run_until_complete(self._generate_audio(cleaned, temp_path))
-                    self._play_audio_sync(temp_path)
+                    self._synthesize_clip(clip)
+                except _Interrupted:
+                    pass
+                except Exception as e:
+                    logger.error(f"TTS Worker Error: {e}")
                 finally:
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
+                    self._busy.pop("synthesis", None)
 
-                self.speech_queue.task_done()
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.error(f"TTS Worker Error: {e}")
+    def _next_chunk(self, clip):
+        # Synteza zawsze kończy klip (finish), więc czekamy bez odpytywania
+        data = clip.chunks.get()
+        return None if self._stale(clip) else data
+
+    def _first_audio(self, clip):
+        """Tracing: the customer starts hearing the reply now."""
+        if clip.requested is not None:
+            tracer.record("tts.first_audio", time.perf_counter() - clip.requested)
+            tracer.since("speech_end", "turn.response")
+
+    def _play_clip(self, clip):
+        with tracer.span("tts.playback"):
+            self._play_clip_audio(clip)
+
+    def _play_clip_audio(self, clip):
+        data = self._next_chunk(clip)
+        if data is None:
+            return
+        player = self._player_for(clip.backend)
+        if player is None:
+            self._play_clip_file(clip, data)
+            return
+
+        if self.active_player not in (None, player):
+            self.active_player.wait_done()  # zmiana formatu - nie nakładamy głosów
+        self.active_player = player
+        player.begin()
+        self._first_audio(clip)
+        while data is not None:
+            player.feed(data)
+            data = self._next_chunk(clip)
+        if clip.last:
+            player.wait_done()
+
+    def _play_clip_file(self, clip, data):
+        parts = []
+        while data is not None:
+            parts.append(data)
+            data = self._next_chunk(clip)
+        if not self.is_speaking:
+            return
+        self._first_audio(clip)
+        if clip.path and clip.backend.audio_format == "mp3":
+            self._play_audio_sync(clip.path)
+            return
 
-        loop.close()
+        suffix = ".wav" if clip.backend.audio_format == "pcm" else ".mp3"
+        fd, temp_path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        try:
+            if suffix == ".wav":
+                with wave.open(temp_path, "wb") as wav:
+                    wav.setnchannels(1)
+                    wav.setsampwidth(2)
+                    wav.setframerate(clip.backend.sample_rate)
+                    wav.writeframes(b"".join(parts))
+            else:
+                with open(temp_path, "wb") as f:
+                    f.write(b"".join(parts))
+            self._play_audio_sync(temp_path)
+        finally:
+            os.remove(temp_path)
+
+    def _playback_worker(self, epoch):
+        """Playback stage: plays clips back to back as soon as audio arrives."""
+        while epoch == self._epoch:
+            clip = self.clip_queue.get()
+            if clip is None or epoch != self._epoch:
+                return
+            self._busy["playback"] = time.monotonic()
+            try:
+                if not self._stale(clip):
+                    self._play_clip(clip)
+            except Exception as e:
+                logger.error(f"TTS Playback Error: {e}")
+            finally:
+                self._busy.pop("playback", None)
+                if clip.last:
+                    self._finish(clip.request)
 
     def _start_worker(self):
         self.is_speaking = True
-        self.speaking_thread = threading.Thread(target=self._speech_worker, daemon=True)
+        self._epoch += 1
+        self.speaking_thread = threading.Thread(target=self._speech_worker, args=(self._epoch,), daemon=True)
         self.speaking_thread.start()
+        self.playback_thread = threading.Thread(target=self._playback_worker, args=(self._epoch,), daemon=True)
+        self.playback_thread.start()
+        self.prefetch_thread = threading.Thread(target=self._prefetch_worker, args=(self._epoch,), daemon=True)
+        self.prefetch_thread.start()
 
-    def speak(self, text):
+    def speak(self, text, on_done=None):
+        """Queue a reply; on_done() runs (on a TTS thread) once it has been played."""
         if text:
-            self.speech_queue.put(text)
+            request = next(self._request_ids)
+            with self._requests_lock:
+                self._requests[request] = on_done
+            self.speech_queue.put((text, time.perf_counter(), request, self.generation))
+        elif on_done:
+            on_done()
 
     def speak_wait(self, text):
         if not text:
@@ -107,21 +456,99 @@ class TTSEngine:
         self.speak(text)
         self.speech_queue.join()
 
-    def stop(self):
-        self.is_speaking = False
-        if self.current_process and self.current_process.poll() is None:
-            self.current_process.terminate()
-        
-        while not self.speech_queue.empty():
+    def _drain(self):
+        """Drop queued texts and clips, releasing anyone blocked in speak_wait."""
+        while True:
             try:
-                self.speech_queue.get_nowait()
-                self.speech_queue.task_done()
+                clip = self.clip_queue.get_nowait()
             except queue.Empty:
                 break
+            if clip is not None and clip.last:
+                self._finish(clip.request)
 
-        if self.speaking_thread and self.speaking_thread.is_alive():
-            self.speaking_thread.join(timeout=2)
+        while True:
+            try:
+                item = self.speech_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self.speech_queue.task_done()
+            else:
+                self._finish(item[2])
+
+    def interrupt(self):
+        """Barge-in: silence the current reply now and drop everything queued.
+
+        Returns the cancel-to-silence time in seconds (until the player
+        processes are gone). The engine keeps running for the next reply.
+        """
+        started = time.perf_counter()
+        self.generation += 1
+        for player in list(self.players.values()):
+            if player:
+                player.cancel()
+        self.output.stop_file()
+        silent = time.perf_counter() - started
+        self.echo.cut()
+        self._drain()
+        tracer.record("tts.cancel", silent)
+        logger.info(f"✋ Przerwano wypowiedź: cisza po {silent * 1000:.1f} ms")
+        return silent
+
+    def stop(self, timeout=2):
+        if not self.is_speaking:
+            return
+        self.is_speaking = False
+        self.output.stop_file()
+        for player in self.players.values():
+            if player:
+                player.close()
+
+        # Wątki czekają na kolejkach bez limitu czasu - budzimy je wartownikiem
+        self._drain()
+        self.speech_queue.put(None)
+        self.prefetch_queue.put(None)
+        try:
+            self.clip_queue.put_nowait(None)
+        except queue.Full:
+            pass  # odtwarzanie i tak ma co pobrać i zakończy się po is_speaking
+        for thread in (self.speaking_thread, self.playback_thread, self.prefetch_thread):
+            if thread and thread.is_alive():
+                thread.join(timeout=timeout)
+        self._drain()
         logger.info("TTS stopped")
 
+    def health(self):
+        """Worker threads alive, and how long the current clip has been in synthesis or playback."""
+        now = time.monotonic()
+        threads = (self.speaking_thread, self.playback_thread, self.prefetch_thread)
+        return {
+            "alive": self.is_speaking and all(t is not None and t.is_alive() for t in threads),
+            "stalled_s": max((now - since for since in list(self._busy.values())), default=0.0),
+        }
+
+    def restart(self):
+        """Replace dead or stuck worker threads in place; voices, caches and players stay loaded.
+
+        A thread still blocked after stop() is abandoned: it belongs to an
+        old epoch and exits without touching the queues once it wakes up.
+        Requests it held are closed here, so whoever waits on them goes on.
+        """
+        self.stop(timeout=0.5)  # zdrowy wątek kończy się od razu; zawieszony i tak nie skończy
+        self.generation += 1
+        with self._requests_lock:
+            held = list(self._requests)
+        for request in held:
+            self._finish(request)
+        while True:
+            try:
+                self.prefetch_queue.get_nowait()
+            except queue.Empty:
+                break
+        self._busy.clear()
+        self._start_worker()
+        self.restarts += 1
+        logger.warning(f"♻️ TTS: wątki uruchomione ponownie ({self.restarts}. raz)")
+
     def __del__(self):
         self.stop()
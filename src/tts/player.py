@@ -0,0 +1,149 @@
+"""Long-lived streaming audio player fed through a pipe.
+
+Instead of writing every utterance to a temporary file and spawning a new
+player for it, one decoder process stays open and receives MP3 chunks on
+stdin as soon as they arrive from the synthesizer. MP3 frames are
+self-contained, so consecutive utterances can simply be concatenated.
+"""
+import logging
+import shutil
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# edge-tts domyślnie zwraca audio-24khz-48kbitrate-mono-mp3
+MP3_BYTES_PER_SECOND = 48000 // 8
+# Decoder start-up and output buffering on top of the pure audio duration
+DECODER_LATENCY = 0.15
+
+
+def streaming_command(os_type, audio_format="mp3", sample_rate=24000):
+    """Return a player command reading audio from stdin, or None if unavailable.
+
+    "mp3" is decoded by mpg123/ffplay, raw "pcm" (s16le mono) goes to aplay/ffplay.
+    """
+    if audio_format == "pcm":
+        if os_type == "Linux" and shutil.which("aplay"):
+            return ["aplay", "-q", "-t", "raw", "-f", "S16_LE", "-c", "1", "-r", str(sample_rate), "-"]
+        if shutil.which("ffplay"):
+            return ["ffplay", "-nodisp", "-loglevel", "quiet", "-f", "s16le",
+                    "-ar", str(sample_rate), "-ac", "1", "-i", "-"]
+        return None
+    if os_type == "Linux" and shutil.which("mpg123"):
+        return ["mpg123", "-q", "-"]
+    if shutil.which("ffplay"):
+        return ["ffplay", "-nodisp", "-loglevel", "quiet", "-i", "-"]
+    return None
+
+
+def file_command(os_type, path):
+    """Command playing one audio file to the end: a .wav (PCM fallback clip) or an .mp3."""
+    if os_type == "Darwin":
+        return ["afplay", path]
+    if os_type == "Linux":
+        # mpg123 nie odtworzy WAV-a z fallbacku PCM
+        return ["aplay", "-q", path] if str(path).endswith(".wav") else ["mpg123", "-q", path]
+    return ["powershell", "-c", f'(New-Object Media.SoundPlayer "{path}").PlaySync()']
+
+
+class StreamingPlayer:
+    """Feeds audio chunks into a persistent decoder and tracks playback time.
+
+    With an ``echo`` reference, every chunk is logged with the time span in
+    which it will sound (barge-in); ``sample_rate`` marks raw s16le input,
+    whose samples give the reference its exact envelope.
+    """
+
+    latency = DECODER_LATENCY
+
+    def __init__(self, command, bytes_per_second=MP3_BYTES_PER_SECOND, echo=None, sample_rate=None):
+        self.command = command
+        self.bytes_per_second = bytes_per_second
+        self.echo = echo
+        self.sample_rate = sample_rate
+        self.process = None
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._busy_until = 0.0
+
+    def _ensure_process(self):
+        if self.process is None or self.process.poll() is not None:
+            self.process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            logger.debug(f"Streaming player started: PID {self.process.pid}")
+        return self.process
+
+    def begin(self):
+        """Start a new utterance; clears a previous cancellation."""
+        self._cancelled.clear()
+
+    def feed(self, chunk):
+        """Write one chunk of encoded audio; playback starts immediately."""
+        if not chunk or self._cancelled.is_set():
+            return
+        with self._lock:
+            # Jeden zegar (perf_counter) dla końca odtwarzania, referencji echa i głośnika wirtualnego
+            now = time.perf_counter()
+            if self._busy_until < now:
+                self._busy_until = now + self.latency
+            starts_in = self._busy_until - now
+            self._busy_until += len(chunk) / self.bytes_per_second
+            if self.echo is not None:
+                self._log_echo(chunk, now + starts_in, self._busy_until)
+            self._write(chunk, starts_in)
+
+    def _write(self, chunk, starts_in):
+        """Hand the chunk to the decoder process (src.audio replaces this for virtual devices)."""
+        process = self._ensure_process()
+        try:
+            process.stdin.write(chunk)
+            process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            if not self._cancelled.is_set():
+                logger.error(f"Streaming player pipe error: {e}")
+            self._kill()
+
+    def _log_echo(self, chunk, start, end):
+        # Oś czasu referencji to perf_counter (jak znaczniki bloków z mikrofonu)
+        samples = None
+        if self.sample_rate:
+            samples = np.frombuffer(chunk[:len(chunk) // 2 * 2], dtype="<i2")
+        self.echo.played(start, end, samples, self.sample_rate)
+
+    def wait_done(self):
+        """Block until everything fed so far has been played (or cancelled)."""
+        while not self._cancelled.is_set():
+            remaining = self._busy_until - time.perf_counter()
+            if remaining <= 0:
+                return True
+            self._cancelled.wait(remaining)
+        return False
+
+    def cancel(self):
+        """Stop playback immediately and drop whatever the decoder buffered.
+
+        Deliberately lock-free: a feed() blocked on a full pipe is released
+        by killing the decoder underneath it.
+        """
+        self._cancelled.set()
+        self._busy_until = 0.0
+        self._kill()
+        if self.echo is not None:
+            self.echo.cut()
+
+    def _kill(self):
+        process, self.process = self.process, None
+        if process and process.poll() is None:
+            process.kill()
+            process.wait()
+
+    def close(self):
+        self.cancel()
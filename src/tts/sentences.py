@@ -0,0 +1,60 @@
+"""Sentence boundaries for speech: every sentence becomes one TTS clip.
+
+Shared by the TTS engine (whole replies) and the LLM fallback (text
+streamed token by token), so both cut at the same places.
+"""
+import re
+
+try:
+    from src.config.settings import TTS_MIN_SENTENCE_CHARS
+except ImportError:
+    TTS_MIN_SENTENCE_CHARS = 25
+
+SENTENCE_END = re.compile(r'(?<=[.!?…])\s+')
+ABBREVIATIONS = {"ul", "al", "np", "tel", "nr", "godz", "os", "św", "ok", "m.in"}
+
+
+def glue(parts, pending="", min_chars=TTS_MIN_SENTENCE_CHARS):
+    """Join parts split at SENTENCE_END into sentences of at least min_chars
+    that do not end with an abbreviation; returns (sentences, what is left)."""
+    sentences = []
+    for part in parts:
+        pending = f"{pending} {part}".strip() if pending else part
+        last_word = pending.rsplit(" ", 1)[-1].rstrip(".").lower()
+        if len(pending) >= min_chars and last_word not in ABBREVIATIONS:
+            sentences.append(pending)
+            pending = ""
+    return sentences, pending
+
+
+def split_sentences(text, min_chars=TTS_MIN_SENTENCE_CHARS):
+    """Split a reply into sentences, gluing fragments shorter than min_chars
+    (e.g. "ul." or "Hmm,") to their neighbour so prosody stays natural."""
+    sentences, pending = glue(SENTENCE_END.split(text.strip()), min_chars=min_chars)
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+class SentenceStream:
+    """split_sentences for streamed text: yields each sentence as soon as it is complete."""
+
+    def __init__(self, min_chars=TTS_MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.buffer = ""   # po ostatniej granicy zdania
+        self.pending = ""  # zdanie za krótkie albo kończące się skrótem ("ul.")
+
+    def feed(self, text):
+        self.buffer += text
+        parts = SENTENCE_END.split(self.buffer)
+        self.buffer = parts.pop()
+        sentences, self.pending = glue(parts, self.pending, self.min_chars)
+        return sentences
+
+    def flush(self):
+        rest = f"{self.pending} {self.buffer}".strip()
+        self.pending = self.buffer = ""
+        return [rest] if rest else []
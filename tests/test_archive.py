@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.storage.archive import AudioArchive, decode, encode
+
+
+def speech(seconds=1.0, rate=16000, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    wave = 6000 * np.sin(2 * np.pi * 180 * t) * np.sin(2 * np.pi * 3 * t)
+    return (wave + rng.normal(0, 20, len(t))).astype(np.int16)
+
+
+def test_codec_is_lossless_and_compresses():
+    x = speech()
+    x[100] = 32767
+    x[101] = -32768  # skok przez cały zakres int16
+    payload = encode(x)
+    assert np.array_equal(decode(payload, len(x)), x)
+    assert len(payload) < x.nbytes / 1.5
+
+
+def test_add_find_read_and_reopen(tmp_path):
+    archive = AudioArchive(tmp_path)
+    t0 = time.time() - 60
+    ids = [archive.add(speech(seed=i), 16000, ts=t0 + i, session="s1" if i < 2 else "s2", text=f"t{i}")
+           for i in range(3)]
+    archive.close()
+
+    reopened = AudioArchive(tmp_path)
+    assert [e.id for e in reopened.find(session="s1")] == ids[:2]
+    assert [e.id for e in reopened.find(start=t0 + 1, end=t0 + 2)] == [ids[1]]
+    samples, rate = reopened.read(ids[2])
+    assert rate == 16000 and np.array_equal(samples, speech(seed=2))
+    assert reopened.entries[ids[0]].meta == {"text": "t0"}
+
+    out = reopened.extract(ids[0], tmp_path / "one.wav")
+    assert os.path.getsize(out) == 44 + 16000 * 2
+
+
+def test_index_recovers_after_crash(tmp_path):
+    archive = AudioArchive(tmp_path)
+    archive.add(speech(seed=1), 16000, ts=time.time())
+    archive.close()
+    lines = (tmp_path / "index.jsonl").read_text().splitlines()
+    (tmp_path / "index.jsonl").write_text("")  # zapis do indeksu nie zdążył
+    assert len(AudioArchive(tmp_path).entries) == 1
+    (tmp_path / "index.jsonl").unlink()
+    assert len(AudioArchive(tmp_path).entries) == 1 == len(lines)
+
+
+def test_retention_drops_oldest_closed_segments(tmp_path):
+    archive = AudioArchive(tmp_path, segment_max_bytes=10_000, max_total_bytes=60_000, max_age_days=1)
+    now = time.time()
+    old = archive.add(speech(seed=0), 16000, ts=now - 3 * 86400)
+    recent = [archive.add(speech(seed=i), 16000, ts=now - 100 + i) for i in range(1, 6)]
+    assert len(archive.segments()) == 6
+
+    removed = archive.enforce_retention(now)
+    assert removed and old not in archive.entries
+    assert sum(s.stat().st_size for s in archive.segments()) <= 60_000
+    assert recent[-1] in archive.entries
+    with pytest.raises(KeyError):
+        archive.read(old)
+    archive.close()
+
+
+def test_retention_rewrites_index_without_rescanning_segments(tmp_path, monkeypatch):
+    archive = AudioArchive(tmp_path, segment_max_bytes=10_000, max_total_bytes=30_000, max_age_days=None)
+    now = time.time()
+    ids = [archive.add(speech(seed=i), 16000, ts=now - 100 + i) for i in range(6)]
+    monkeypatch.setattr(archive, "_scan", lambda *a, **k: pytest.fail("segments rescanned"))
+    removed = archive.enforce_retention(now)
+    assert removed and set(archive._newest) == {s.name for s in archive.segments()}
+    kept = set(archive.entries)
+    archive.close()
+
+    monkeypatch.undo()
+    reopened = AudioArchive(tmp_path)
+    assert set(reopened.entries) == kept and ids[-1] in kept and ids[0] not in kept
+    reopened.close()
+
+
+def test_background_submit(tmp_path):
+    archive = AudioArchive(tmp_path)
+    first = archive.submit(speech(seed=3).tobytes(), 16000, ts=1771412130.0, session="s9", text="jakie ceny")
+    second = archive.submit(speech(seed=4).tobytes(), 16000, ts=1771412130.5, session="s9")
+    assert first != second
+    archive.flush()
+    entry, _ = archive.find(session="s9")
+    assert entry.id == first
+    assert entry.meta["text"] == "jakie ceny"
+    archive.close()
@@ -0,0 +1,190 @@
+import json
+import os
+import sys
+import threading
+import time
+import wave
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import src.tts.engine as tts_engine
+from benchmarks.load_stt_server import ServerThread
+from src.audio.devices import SystemOutput, VirtualInput, VirtualOutput, WavInput, open_input, open_output
+from src.stt.engine import STTEngine
+from src.tts.backends import FakeBackend
+from src.tts.engine import TTSEngine
+
+
+def tone(seconds, rate=16000, amplitude=8000, freq=440):
+    t = np.arange(int(rate * seconds)) / rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+def write_wav(path, samples, rate):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples.astype("<i2").tobytes())
+
+
+def test_virtual_microphone_keeps_real_time_and_reports_spoken_clips():
+    mic = VirtualInput()
+    stream = mic.open(16000, 1600)
+    done = mic.say(tone(0.25))
+    start = time.monotonic()
+    heard = np.frombuffer(b"".join(stream.read(1600) for _ in range(5)), dtype="<i2")
+    assert 0.45 <= time.monotonic() - start < 0.7  # 5 bloków po 0.1 s
+    assert done.is_set() and not mic.speaking()
+    assert np.array_equal(heard[:4000], tone(0.25)) and not heard[4000:].any()
+
+    stream.close()
+    with pytest.raises(OSError):
+        stream.read(1600)  # stary strumień po restart_capture() już nie czyta
+    assert mic.open(16000, 1600).read(160) == b"\0" * 320
+
+
+def test_wav_input_speaks_the_corpus_in_a_loop_with_pauses(tmp_path):
+    write_wav(tmp_path / "a.wav", tone(0.1, rate=48000), 48000)  # resampled to 16 kHz
+    write_wav(tmp_path / "b.wav", tone(0.1, freq=880), 16000)
+    mic = WavInput(tmp_path, pause_s=0.1, realtime=False)
+    stream = mic.open(16000, 800)
+    audio = np.frombuffer(b"".join(stream.read(800) for _ in range(12)), dtype="<i2")  # 0.6 s
+    loud = np.abs(audio.reshape(-1, 160)).max(axis=1) > 1000  # 10 ms ramki
+    # a, pauza, b, pauza, znowu a
+    assert loud[:10].all() and not loud[10:20].any() and loud[20:30].all() and not loud[30:40].any()
+    assert loud[40:50].all() and mic.played == 3
+
+    with pytest.raises(FileNotFoundError):
+        WavInput(tmp_path / "empty")
+
+
+def wait_for(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_tts_plays_into_loopback_and_barge_in_cuts_the_echo(monkeypatch, tmp_path):
+    class ToneBackend(FakeBackend):
+        async def stream(self, text):
+            yield tone(0.4, rate=24000).tobytes()
+
+    monkeypatch.setattr(tts_engine, "TTS_CACHE_DIR", str(tmp_path))
+    mic = VirtualInput(realtime=False, echo_gain=0.5)
+    speaker = VirtualOutput(loopback=mic)
+    engine = TTSEngine(backends=[ToneBackend(audio_format="pcm")], output=speaker)
+    try:
+        asked = time.perf_counter()
+        engine.speak_wait("Zdanie testowe odtwarzane przez wirtualny głośnik.")
+        assert speaker.seconds == pytest.approx(0.4)
+        assert speaker.wait_onset(asked, 0) is not None
+        assert wait_for(speaker.idle, 0.5)
+        stream = mic.open(16000, 1600)
+        echo = np.frombuffer(stream.read(1600), dtype="<i2")
+        assert 3000 < np.abs(echo).max() < 4500  # ton 8000 x wzmocnienie 0.5
+
+        engine.speak("Druga odpowiedź, której klient nie chce słuchać do końca.")
+        assert speaker.wait_onset(asked + 0.001, 2) is not None
+        engine.interrupt()
+        assert wait_for(speaker.idle, 0.5) and not mic._echo
+    finally:
+        engine.stop()
+
+
+def test_virtual_file_playback_takes_the_clip_duration(tmp_path):
+    path = tmp_path / "clip.wav"
+    write_wav(path, tone(0.2), 16000)
+    speaker = VirtualOutput()
+    start = time.monotonic()
+    speaker.play_file(str(path))
+    assert 0.18 <= time.monotonic() - start < 0.4
+    assert speaker.seconds == pytest.approx(0.2)
+
+    threading.Timer(0.05, speaker.stop_file).start()
+    start = time.monotonic()
+    speaker.play_file(str(path))
+    assert time.monotonic() - start < 0.15
+
+
+def test_system_output_picks_a_player_the_file_format_needs(monkeypatch):
+    commands = []
+
+    class Done:
+        def __init__(self, cmd):
+            commands.append(cmd)
+
+        def wait(self):
+            return 0
+
+    monkeypatch.setattr("src.audio.devices.subprocess.Popen", Done)
+    linux = SystemOutput("Linux")
+    linux.play_file("data/tts_cache/odpowiedz.mp3")
+    linux.play_file("/tmp/klip.wav")  # fallback PCM: WAV, którego mpg123 nie odtworzy
+    SystemOutput("Darwin").play_file("/tmp/klip.wav")
+    assert commands == [
+        ["mpg123", "-q", "data/tts_cache/odpowiedz.mp3"],
+        ["aplay", "-q", "/tmp/klip.wav"],
+        ["afplay", "/tmp/klip.wav"],
+    ]
+    assert linux.process is None
+
+
+def test_device_specs(tmp_path):
+    write_wav(tmp_path / "a.wav", tone(0.1), 16000)
+    assert type(open_input("null")) is VirtualInput
+    assert isinstance(open_input(f"wav:{tmp_path}"), WavInput)
+    assert isinstance(open_output("device"), SystemOutput)
+    mic = open_input("null")
+    assert open_output("loopback", mic).loopback is mic and open_output("null").loopback is None
+    with pytest.raises(ValueError):
+        open_output("loopback")  # prawdziwego mikrofonu nie da się zapętlić
+    with pytest.raises(ValueError):
+        open_input("bluetooth")
+
+
+class LoudnessRecognizer:
+    """Speech-server recognizer stand-in: the text is how many bytes of speech VAD let through."""
+
+    def __init__(self, grammar=None, words=False):
+        self.heard = 0
+
+    def AcceptWaveform(self, data):
+        self.heard += len(data)
+        return False
+
+    def Result(self):
+        return self.FinalResult()
+
+    def PartialResult(self):
+        return json.dumps({"partial": ""})
+
+    def FinalResult(self):
+        text, self.heard = f"menu {self.heard}" if self.heard else "", 0
+        return json.dumps({"text": text})
+
+    def Reset(self):
+        self.heard = 0
+
+
+def test_stt_engine_captures_from_virtual_microphone():
+    mic = VirtualInput(noise=30)
+    with ServerThread(LoudnessRecognizer, pool_size=2, workers=1) as server:
+        stt = STTEngine(server=server.path, audio_input=mic)
+        try:
+            time.sleep(0.5)  # podłoga szumu VAD
+            stt.start_listening()
+            mic.say(np.concatenate([tone(0.8), np.zeros(16000, dtype=np.int16)]))
+            assert stt.get_text(timeout=5).startswith("menu")
+            assert stt.health()["alive"]
+            old = stt.stream
+            stt.restart_capture()
+            assert old.closed and stt.stream is not old and stt.health()["alive"]
+        finally:
+            stt.close()
@@ -0,0 +1,127 @@
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import src.tts.engine as tts_engine
+from src.stt.bargein import NOMINAL_LEVEL, BargeInDetector, EchoReference
+from src.tts.backends import FakeBackend
+from src.tts.engine import TTSEngine
+from src.tts.player import StreamingPlayer
+
+RATE = 16000
+BLOCK = 320  # 20 ms, jak BARGE_IN_BLOCK_SIZE
+
+
+def tone(freq, seconds, rms, start=0.0):
+    t = np.arange(int(seconds * RATE)) / RATE + start
+    return np.sqrt(2) * rms * np.sin(2 * np.pi * freq * t)
+
+
+def run_detector(detector, mic, t0=0.0):
+    """Feed mic in 20 ms blocks on a synthetic clock; time of first detection or None."""
+    mic = np.clip(mic, -32768, 32767).astype(np.int16)
+    for i in range(0, len(mic), BLOCK):
+        end = t0 + (i + BLOCK) / RATE
+        if detector.process(mic[i:i + BLOCK].tobytes(), end):
+            return end
+    return None
+
+
+def kiosk_voice(seconds):
+    return np.clip(tone(220, seconds, 5000), -32768, 32767).astype(np.int16)
+
+
+def test_echo_reference_envelope_and_cut():
+    echo = EchoReference()
+    echo.played(10.0, 11.0, kiosk_voice(1.0), RATE)
+    assert 4500 < echo.level(10.2, 10.3) < 5500
+    assert echo.level(11.5, 12.0) == 0.0
+    echo.played(12.0, 13.0)  # MP3: tylko "gra"
+    assert echo.level(12.5, 12.5) == NOMINAL_LEVEL
+    echo.cut(12.2)
+    assert echo.level(12.3, 13.0) == 0.0 and echo.active(12.1)
+
+
+def test_own_voice_does_not_trigger_barge_in():
+    echo = EchoReference()
+    seconds = 4.0
+    echo.played(0.0, seconds, kiosk_voice(seconds), RATE)
+    rng = np.random.default_rng(1)
+    # Głośnik słychać w mikrofonie z tłumieniem 0.4 i opóźnieniem 40 ms
+    mic = np.concatenate((np.zeros(640), 0.4 * kiosk_voice(seconds)[:-640])) + rng.normal(0, 60, int(seconds * RATE))
+    detector = BargeInDetector(echo)
+    assert run_detector(detector, mic) is None
+    assert 0.3 < detector.coupling < 0.6
+
+
+def test_customer_over_kiosk_is_detected_within_100ms():
+    echo = EchoReference()
+    seconds, speech_at = 5.0, 3.0
+    echo.played(0.0, seconds, kiosk_voice(seconds), RATE)
+    rng = np.random.default_rng(2)
+    mic = np.concatenate((np.zeros(640), 0.4 * kiosk_voice(seconds)[:-640])) + rng.normal(0, 60, int(seconds * RATE))
+    start = int(speech_at * RATE) + 500  # nie na granicy bloku
+    mic[start:] += tone(150, seconds - start / RATE, 5000)
+    detector = BargeInDetector(echo)
+
+    detected = run_detector(detector, mic)
+    onset = start / RATE
+    assert detected is not None
+    assert abs(detector.onset - onset) <= 0.02
+    # 3 ramki po 20 ms + czekanie na koniec bloku z mikrofonu
+    assert detected - onset <= 0.06 + 0.02
+
+
+def test_speech_while_kiosk_is_silent_uses_noise_gate():
+    echo = EchoReference()
+    rng = np.random.default_rng(3)
+    quiet = rng.normal(0, 80, RATE)
+    assert run_detector(BargeInDetector(echo), quiet) is None
+    assert run_detector(BargeInDetector(echo), np.concatenate((quiet, tone(150, 0.5, 3000)))) is not None
+
+
+class SlowBackend(FakeBackend):
+    def __init__(self, synthesized):
+        super().__init__(latency=0.02, chunks=4, chunk_size=200)  # 0.8 s "audio" na zdanie
+        self.synthesized = synthesized
+
+    async def stream(self, text):
+        self.synthesized.append(text)
+        async for chunk in super().stream(text):
+            yield chunk
+
+
+def test_interrupt_silences_and_drops_queued_replies(monkeypatch, tmp_path):
+    monkeypatch.setattr(tts_engine, "TTS_CACHE_DIR", str(tmp_path))
+    synthesized = []
+    engine = TTSEngine(backends=[SlowBackend(synthesized)])
+    player = engine.players[("mp3", 24000)] = StreamingPlayer(["cat"], bytes_per_second=1000, echo=engine.echo)
+    try:
+        finished = threading.Event()
+        engine.speak("Pierwsze zdanie jest długie. Drugie zdanie też jest długie. Trzecie zdanie kończy wypowiedź.",
+                     on_done=finished.set)
+        engine.speak("Ta odpowiedź czeka w kolejce i nie powinna zabrzmieć.", on_done=finished.set)
+        deadline = time.monotonic() + 2
+        while player.process is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert engine.echo.level(time.perf_counter(), time.perf_counter() + 1) > 0
+
+        silent = engine.interrupt()
+        assert silent < 0.1
+        assert player.process is None
+        assert engine.echo.level(time.perf_counter(), time.perf_counter() + 1) == 0
+        assert finished.wait(1)
+        engine.speech_queue.join()
+        assert not any(s.startswith(("Trzecie", "Ta odpowiedź")) for s in synthesized)
+
+        # Silnik działa dalej dla kolejnej odpowiedzi
+        synthesized.clear()
+        engine.speak_wait("Kolejna odpowiedź po przerwaniu jest odtwarzana.")
+        assert synthesized == ["Kolejna odpowiedź po przerwaniu jest odtwarzana."]
+    finally:
+        engine.stop()
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.storage.archive import AudioArchive
+from src.storage.interactions import InteractionStore
+from src.stt.batch import archive_jobs, run_batch, wav_jobs
+
+
+class FakeSTT:
+    """STTEngine's feed() interface; 'recognizes' the loudest sample of the recording."""
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.texts = []
+        self.blocks = []
+
+    def start_listening(self):
+        self.blocks = []
+
+    def feed(self, data):
+        self.blocks.append(np.frombuffer(data, dtype="<i2"))
+
+    def flush(self):
+        time.sleep(0.05)  # "dekodowanie"
+        self.texts.append(f"max {int(np.concatenate(self.blocks).max())} bloki {len(self.blocks)}")
+
+    def get_text(self, block=True, timeout=None):
+        return self.texts.pop(0) if self.texts else None
+
+    def stop_listening(self):
+        pass
+
+
+def write_wav(path, peak, rate=16000, seconds=2.5):
+    samples = np.zeros(int(rate * seconds), dtype="<i2")
+    samples[100] = peak
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples.tobytes())
+
+
+def test_batch_transcribes_in_parallel_and_skips_done(tmp_path):
+    audio = tmp_path / "audio"
+    audio.mkdir()
+    for i in range(8):
+        write_wav(audio / f"audio_20260218_1046{i:02d}.wav", 1000 + i)
+    store = InteractionStore(tmp_path / "kiosk.db")
+    jobs = wav_jobs(audio)
+    assert jobs[0].ts < jobs[-1].ts
+
+    summary = run_batch(jobs, store, "models/vosk-a", workers=4, engine_factory=FakeSTT)
+    assert summary["transcribed"] == 8 and summary["skipped"] == 0 and summary["failed"] == 0
+    turns = store.session("batch-vosk-a")
+    assert [t.text for t in turns] == [f"max {1000 + i} bloki 3" for i in range(8)]  # 2,5 s w blokach po 1 s
+    assert turns[0].audio_ref == "audio_20260218_104600.wav"
+    assert turns[0].latencies["rtf"] is not None
+    assert len({t.latencies["pid"] for t in turns}) > 1  # pliki rozłożone na kilka procesów
+
+    again = run_batch(jobs, store, "models/vosk-a", workers=4, engine_factory=FakeSTT)
+    assert again["transcribed"] == 0 and again["skipped"] == 8
+    other = run_batch(jobs[:2], store, "models/vosk-b", workers=2, engine_factory=FakeSTT)
+    assert other["transcribed"] == 2 and len(store.session("batch-vosk-b")) == 2
+    store.close()
+
+
+def test_batch_reads_archive_in_workers(tmp_path):
+    archive = AudioArchive(tmp_path / "archive")
+    samples = np.zeros(48000, dtype=np.int16)
+    samples[10] = 4000
+    ids = [archive.add(samples, 48000, ts=1771408000.0 + i, session="s1") for i in range(3)]
+    archive.close()
+
+    store = InteractionStore(tmp_path / "kiosk.db")
+    summary = run_batch(archive_jobs(AudioArchive(tmp_path / "archive")), store, "vosk-a", workers=2,
+                        engine_factory=FakeSTT)
+    assert summary["transcribed"] == 3 and summary["audio_s"] == 3.0
+    turns = store.session("batch-vosk-a")
+    assert [t.audio_ref for t in turns] == ids
+    assert all(t.text.startswith("max ") for t in turns)
+    store.close()
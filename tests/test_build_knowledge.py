@@ -0,0 +1,129 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from src.nlp.build_knowledge import KnowledgeConflict, build_artifact, main, merge
+from src.nlp.knowledge import ARTIFACT_NAME, ARTIFACT_SCHEMA
+from src.nlp.processor import NLPProcessor
+
+
+def sources(price=8, allergens=("gluten", "jaja")):
+    return {
+        "knowledge.json": {
+            "restaurant": {"phone": "530 324 239"},
+            "dishes": [{"id": "mieso", "name": "Karkandak z mięsem", "price": 8,
+                        "description": "Wołowina.", "allergens": ["gluten", "jaja"]}],
+        },
+        "config.knowledge": {
+            "MENU": {"mięso": {"nazwa": "Karkandak z mięsem wołowym", "cena": f"{price} zł"},
+                     "kapusta": {"nazwa": "Karkandak z kapustą", "cena": "8 zł", "opis": "Kapusta."}},
+            "KARKANDAKI_INFO": {"alergeny": {"ciasto": ["gluten (z mąki)", "jaja"]}},
+            "LOKAL_INFO": {"telefon": "530-324-239", "godziny_otwarcia": "8:00 - 22:00"},
+        },
+        "config.settings": {"ALLERGENS_DB": {"karkandak_wytrawny_mieso": list(allergens)}},
+    }
+
+
+def test_merges_dishes_across_sources():
+    content = merge(sources())
+    dishes = {d["id"]: d for d in content["knowledge"]["dishes"]}
+    assert set(dishes) == {"mieso", "kapusta"}
+    assert dishes["mieso"]["name"] == "Karkandak z mięsem"  # knowledge.json ma pierwszeństwo
+    assert dishes["kapusta"]["allergens"] == ["gluten", "jaja"]  # z ciasta
+    assert content["knowledge"]["restaurant"]["hours"] == "8:00 - 22:00"
+    dish_rows = [row for row in content["index"]["intents"] if row["name"] == "dish"]
+    assert {"name": "dish", "keywords": ["karkandak z mięsem"], "excludes": [],
+            "dish": content["knowledge"]["dishes"].index(dishes["mieso"])} in dish_rows
+
+
+def test_rejects_conflicting_prices_and_allergens():
+    with pytest.raises(KnowledgeConflict) as e:
+        merge(sources(price=10, allergens=("gluten",)))
+    assert len(e.value.problems) == 3  # cena, rozbieżne listy, brak jaj z ciasta
+    with pytest.raises(KnowledgeConflict, match="menu.json"):
+        merge({**sources(), "menu.json": {"categories": [{"items": [
+            {"id": "x", "name": "Шашлик", "price": 280}]}]}})
+
+
+def test_current_sources_disagree():
+    with pytest.raises(KnowledgeConflict, match="Cena 'Karkandak z mięsem'"):
+        build_artifact(os.path.join(ROOT, "data"))
+
+
+def test_nlp_loads_compiled_artifact(tmp_path):
+    data = sources()["knowledge.json"]
+    (tmp_path / "knowledge.json").write_text(json.dumps(data), encoding="utf-8")
+    assert main(["--data-dir", str(tmp_path), "--exclude", "config.settings",
+                 "--exclude", "config.knowledge"]) == 0
+
+    nlp = NLPProcessor(data_dir=tmp_path, watch=False)
+    assert nlp.store.current.compiled.origin.startswith("artifact")
+    assert "Cena: 8 zł" in nlp.process_query("karkandak z mięsem")
+    assert nlp.process_query("jakie ceny") == "Nasze ceny: Karkandak z mięsem 8 zł."
+
+
+def build(tmp_path, data):
+    (tmp_path / "knowledge.json").write_text(json.dumps(data), encoding="utf-8")
+    assert main(["--data-dir", str(tmp_path), "--exclude", "config.settings",
+                 "--exclude", "config.knowledge"]) == 0
+
+
+def test_artifact_answers_like_the_raw_files(tmp_path):
+    knowledge = json.load(open(os.path.join(ROOT, "data", "knowledge.json"), encoding="utf-8"))
+    (tmp_path / "raw").mkdir()
+    (tmp_path / "raw" / "knowledge.json").write_text(json.dumps(knowledge), encoding="utf-8")
+    content = merge({"knowledge.json": knowledge,
+                     "config.settings": {"FORBIDDEN_TOPICS": ["Polityka"], "MIN_AGE_RECORD": 16}})
+    artifact = {"schema": ARTIFACT_SCHEMA, "version": "test", **content}
+    (tmp_path / ARTIFACT_NAME).write_text(json.dumps(artifact), encoding="utf-8")
+    raw = NLPProcessor(data_dir=tmp_path / "raw", watch=False)
+    compiled = NLPProcessor(data_dir=tmp_path, watch=False)
+    assert compiled.store.current.compiled.origin == "artifact test"
+    assert compiled.rules["forbidden_topics"] == ["polityka"] and compiled.rules["min_age_record"] == 16
+
+    for query in ("dzień dobry", "co polecacie", "karkandak", "karkandak z miensem", "godzina otwarci",
+                  "gdzie jesteście", "czy jest dowóz", "dzięki", "zupa pomidorowa"):
+        assert compiled.match(query)[0] == raw.match(query)[0], query
+
+
+def test_edited_source_wins_over_an_older_artifact(tmp_path):
+    data = sources()["knowledge.json"]
+    build(tmp_path, data)
+    nlp = NLPProcessor(data_dir=tmp_path, watch=False)
+    assert nlp.store.current.compiled.origin.startswith("artifact")
+
+    # Operator poprawia cenę w knowledge.json, zapominając przebudować artefakt
+    data["dishes"][0]["price"] = 9
+    (tmp_path / "knowledge.json").write_text(json.dumps(data), encoding="utf-8")
+    stamp = os.stat(tmp_path / ARTIFACT_NAME).st_mtime + 5
+    os.utime(tmp_path / "knowledge.json", (stamp, stamp))
+    assert nlp.store.changed() and nlp.store.reload()
+    assert nlp.store.current.compiled.origin == "sources"
+    assert "Cena: 9 zł" in nlp.process_query("karkandak z mięsem")
+
+    # Po przebudowie znów artefakt
+    build(tmp_path, data)
+    os.utime(tmp_path / ARTIFACT_NAME, (stamp + 5, stamp + 5))
+    assert nlp.store.reload()
+    assert nlp.store.current.compiled.origin.startswith("artifact")
+    assert "Cena: 9 zł" in nlp.process_query("karkandak z mięsem")
+
+
+def test_current_artifact_is_the_only_file_parsed(tmp_path):
+    build(tmp_path, sources()["knowledge.json"])
+    # Surowe pliki starsze od artefaktu w ogóle nie są parsowane (tu nawet nie są poprawnym JSON-em)
+    (tmp_path / "knowledge.json").write_text("{", encoding="utf-8")
+    (tmp_path / "qa.json").write_text("{", encoding="utf-8")
+    stamp = os.stat(tmp_path / ARTIFACT_NAME).st_mtime - 5
+    for name in ("knowledge.json", "qa.json"):
+        os.utime(tmp_path / name, (stamp, stamp))
+
+    nlp = NLPProcessor(data_dir=tmp_path, watch=False)
+    assert list(nlp.store.current.sources) == ["artifact"]
+    assert nlp.store.current.compiled.origin.startswith("artifact")
+    assert "Cena: 8 zł" in nlp.process_query("karkandak z mięsem")
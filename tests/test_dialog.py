@@ -0,0 +1,131 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.kiosk.orchestrator import STT_FINAL, Orchestrator
+
+
+class SlowSTT:
+    """start_listening() like the real one: listening only after the pre-roll went through the recognizer."""
+
+    def __init__(self, preroll_s):
+        self.preroll_s = preroll_s
+        self.is_listening = False
+        self.barge_in = None
+
+    def start_listening(self):
+        time.sleep(self.preroll_s)
+        self.is_listening = True
+
+    def stop_listening(self):
+        self.is_listening = False
+
+    def arm_barge_in(self, detector):
+        self.barge_in = detector
+
+    def disarm_barge_in(self):
+        self.barge_in = None
+
+
+class HeldTTS:
+    """Replies that play until interrupt(), which ends them at once (on_done) like TTSEngine."""
+
+    def __init__(self):
+        self.spoken = []
+        self.generation = 0
+        self.on_done = None
+        self.speaking = threading.Event()
+
+    def speak(self, text, on_done=None):
+        self.spoken.append(text)
+        self.on_done = on_done
+        self.speaking.set()
+
+    def interrupt(self):
+        self.generation += 1
+        self.speaking.clear()
+        on_done, self.on_done = self.on_done, None
+        on_done()
+
+    def finish(self):
+        self.speaking.clear()
+        on_done, self.on_done = self.on_done, None
+        on_done()
+
+
+class EchoSpeculator:
+    def reset(self):
+        pass
+
+    def resolve(self, text):
+        return "echo", f"odpowiedź na: {text}"
+
+    def stats(self):
+        return {}
+
+
+@pytest.fixture
+def kiosk():
+    pytest.importorskip("PIL")
+    from src.main import KarkandakiKiosk
+
+    kiosk = KarkandakiKiosk.__new__(KarkandakiKiosk)  # bez Tk, mikrofonu i modeli - tylko pętla dialogu
+    kiosk.orchestrator = Orchestrator().start()
+    kiosk.stt = SlowSTT(preroll_s=0.3)
+    kiosk.tts = HeldTTS()
+    kiosk.speculator = EchoSpeculator()
+    kiosk.barge_in = object()
+    kiosk.barged_in = threading.Event()
+    kiosk.llm = kiosk.wake = kiosk.interactions = None
+    yield kiosk
+    kiosk.orchestrator.stop()
+
+
+def test_barge_in_during_reply_keeps_the_session(kiosk):
+    session = asyncio.run_coroutine_threadsafe(kiosk._dialog_session(), kiosk.orchestrator.loop)
+    time.sleep(0.5)
+    kiosk.orchestrator.post(STT_FINAL, "ile kosztuje ormiański")
+    assert kiosk.tts.speaking.wait(2)
+
+    # Klient wchodzi w słowo: callback z wątku mikrofonu, pre-roll rozpoznaje się jeszcze 0.3 s
+    threading.Thread(target=kiosk._on_barge_in, args=(time.perf_counter(),)).start()
+    time.sleep(0.5)
+    assert not session.done()
+    kiosk.orchestrator.post(STT_FINAL, "a z mięsem")
+    assert kiosk.tts.speaking.wait(2)
+    assert kiosk.tts.spoken == ["odpowiedź na: ile kosztuje ormiański", "odpowiedź na: a z mięsem"]
+
+    # Odpowiedź wysłuchana do końca - sesja się kończy
+    kiosk.tts.finish()
+    session.result(timeout=2)
+    assert not kiosk.stt.is_listening
+
+
+class Interactions:
+    def __init__(self):
+        self.rows = []
+
+    def record(self, session_id, role, text, intent=None, **kwargs):
+        self.rows.append((role, text, intent))
+
+
+def test_turn_is_recorded_with_the_intent_of_its_only_match(kiosk):
+    kiosk.interactions = Interactions()
+    kiosk.session_id, kiosk.last_audio_ref = "s1", None
+    session = asyncio.run_coroutine_threadsafe(kiosk._dialog_session(), kiosk.orchestrator.loop)
+    time.sleep(0.5)
+    kiosk.orchestrator.post(STT_FINAL, "ile kosztuje ormiański")
+    assert kiosk.tts.speaking.wait(2)
+    kiosk.tts.finish()
+    session.result(timeout=2)
+    # Bez kiosk.nlp: intencja przychodzi z resolve, nikt nie dopasowuje zapytania drugi raz
+    assert kiosk.interactions.rows == [
+        ("user", "ile kosztuje ormiański", "echo"),
+        ("kiosk", "odpowiedź na: ile kosztuje ormiański", "echo"),
+    ]
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import src.tts.engine as tts_engine
+from src.kiosk.orchestrator import Orchestrator
+from src.telemetry.health import ResourceSampler, RingLog, Sample, Supervisor
+from src.tts.backends import FakeBackend
+from src.tts.engine import TTSEngine
+from src.tts.player import StreamingPlayer
+
+
+class HangingBackend(FakeBackend):
+    """First reply hangs after its first chunk (e.g. a dead network stream); later ones are fine."""
+
+    def __init__(self):
+        super().__init__(latency=0.01, chunks=2, chunk_size=100)
+        self.hung = False
+
+    async def stream(self, text):
+        async for chunk in super().stream(text):
+            yield chunk
+            if not self.hung:
+                self.hung = True
+                await asyncio.sleep(3600)
+
+
+def test_ring_log_wraps_and_survives_reopen(tmp_path):
+    path = str(tmp_path / "health.ring")
+    log = RingLog(path, capacity=5)
+    for i in range(8):
+        log.append(Sample(1000.0 + i, 12.5, 100 * 2**20 + i, 20 + i, 9, i % 2, i))
+    assert [s.ts for s in log.read()] == [1003.0, 1004.0, 1005.0, 1006.0, 1007.0]
+    assert [s.fds for s in log.read(last=2)] == [26, 27]
+    log.close()
+
+    log = RingLog(path, capacity=999)  # pojemność z nagłówka istniejącego pliku
+    assert log.capacity == 5 and log.read()[-1] == Sample(1007.0, 12.5, 100 * 2**20 + 7, 27, 9, 1, 7)
+    log.append(Sample(1008.0, 0.0, 1, 1, 1, 0, 0))
+    assert [s.ts for s in log.read()][0] == 1004.0
+    log.close()
+    assert os.path.getsize(path) == RingLog.HEADER.size + 5 * RingLog.RECORD.size
+
+
+def test_resource_sample_is_cheap_and_plausible():
+    sampler = ResourceSampler()
+    sampler.sample()
+    started = time.perf_counter()
+    for _ in range(100):
+        sample = sampler.sample()
+    assert (time.perf_counter() - started) / 100 < 0.002
+    assert sample.rss > 10 * 2**20 and sample.fds > 2 and sample.threads >= 1 and sample.cpu >= 0
+
+
+def test_supervisor_restarts_with_cooldown_and_reports(tmp_path):
+    state = {"alive": False, "stalled_s": 0.0}
+    restarts = []
+    supervisor = Supervisor(RingLog(str(tmp_path / "h.ring")), interval=0.01, cooldown=60)
+    supervisor.watch("stt", lambda: state, lambda: restarts.append(1), stall_after=5)
+    supervisor.watch("loop", lambda: {"alive": True, "stalled_s": 30.0}, stall_after=10)
+
+    sample = supervisor.check()
+    assert restarts == [1] and sample.unhealthy == 0b11 and sample.restarts == 1
+    supervisor.check()
+    assert restarts == [1]  # jeszcze w okresie karencji
+    state["alive"] = True
+    assert supervisor.check().unhealthy == 0b10
+    assert supervisor.status() == {"stt": {"healthy": True, "restarts": 1}, "loop": {"healthy": False, "restarts": 0}}
+    assert len(supervisor.log.read()) == 3
+    supervisor.stop()
+
+
+def test_wedged_tts_is_restarted_in_place(monkeypatch, tmp_path):
+    monkeypatch.setattr(tts_engine, "TTS_CACHE_DIR", str(tmp_path))
+    backend = HangingBackend()
+    engine = TTSEngine(backends=[backend])
+    engine.players[("mp3", 24000)] = StreamingPlayer(["cat"], bytes_per_second=1000)
+    try:
+        first_done = threading.Event()
+        engine.speak("To zdanie zawiesi syntezę w połowie.", on_done=first_done.set)
+        deadline = time.monotonic() + 2
+        while engine.health()["stalled_s"] < 0.3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert engine.health()["stalled_s"] >= 0.3
+
+        supervisor = Supervisor(cooldown=0)
+        supervisor.watch("tts", engine.health, engine.restart, stall_after=0.2)
+        supervisor.check()
+        assert engine.restarts == 1
+        assert first_done.wait(1)  # czekający na zawieszoną odpowiedź idzie dalej
+        assert engine.health() == {"alive": True, "stalled_s": 0.0}
+
+        second_done = threading.Event()
+        engine.speak("Po restarcie kiosk znowu mówi normalnie.", on_done=second_done.set)
+        assert second_done.wait(3)
+        assert engine.router.backends[0] is backend  # głos nie był ładowany od nowa
+    finally:
+        engine.stop()
+
+
+def test_blocked_loop_is_reported():
+    orchestrator = Orchestrator().start()
+    try:
+        assert orchestrator.health()["alive"]
+        orchestrator.loop.call_soon_threadsafe(time.sleep, 1.6)
+        time.sleep(1.5)
+        assert orchestrator.health()["stalled_s"] > 0.3
+    finally:
+        orchestrator.stop()
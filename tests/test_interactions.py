@@ -0,0 +1,78 @@
+import os
+import sqlite3
+import sys
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.storage.interactions import InteractionStore, import_transcripts, read_transcripts
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def test_write_behind_batches_and_queries(tmp_path):
+    store = InteractionStore(f"sqlite:///{tmp_path}/kiosk.db", batch_size=50, flush_interval=0.05)
+    for i in range(120):
+        store.record(f"s{i % 3}", "user" if i % 2 == 0 else "kiosk", f"linia {i}",
+                     intent="prices", latencies={"nlp": 1.5}, audio_ref=f"a{i}", ts=1000.0 + i)
+    store.flush()
+
+    turns = store.session("s1")
+    assert len(turns) == 40 and [t.ts for t in turns] == sorted(t.ts for t in turns)
+    assert turns[0].latencies == {"nlp": 1.5} and turns[0].audio_ref == "a1"
+    assert [t.text for t in store.session("s1", limit=2)] == ["linia 115", "linia 118"]
+    assert len(store.find(start=1010, end=1020)) == 10
+    assert len(store.find(start=1010, end=1020, role="kiosk")) == 5
+    assert [s[0] for s in store.sessions()] == ["s0", "s1", "s2"]
+    store.close()
+
+    conn = sqlite3.connect(tmp_path / "kiosk.db")
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    plan = " ".join(r[-1] for r in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM turns WHERE session = 's1' ORDER BY ts"))
+    assert "turns_session_ts" in plan
+
+
+def test_reads_while_writer_appends(tmp_path):
+    store = InteractionStore(tmp_path / "kiosk.db", batch_size=10, flush_interval=0.01)
+    done = threading.Event()
+
+    def write():
+        for i in range(300):
+            store.record("s", "user", str(i), ts=float(i))
+        store.flush()
+        done.set()
+
+    threading.Thread(target=write).start()
+    seen = 0
+    while not done.is_set():
+        count = len(store.session("s"))
+        assert count >= seen
+        seen = count
+    assert len(store.session("s")) == 300
+    store.close()
+
+
+def test_import_transcripts_is_idempotent(tmp_path):
+    folder = tmp_path / "transcripts"
+    folder.mkdir()
+    (folder / "transcript_20260218_104654.txt").write_text("20260218_104654: jakie macie ceny\n", encoding="utf-8")
+    (folder / "tts_20260218_104656.txt").write_text(
+        "20260218_104656: Wszystkie karkandaki kosztują 8 zł.\n", encoding="utf-8")
+    (folder / "transcript_20260218_110224.txt").write_text("20260218_110224: gdzie jesteście\n", encoding="utf-8")
+
+    store = InteractionStore(tmp_path / "kiosk.db")
+    assert import_transcripts(store, folder) == (3, 3)
+    assert import_transcripts(store, folder) == (0, 3)
+    sessions = store.sessions()
+    assert [(s[0], s[3]) for s in sessions] == [("20260218_104654", 2), ("20260218_110224", 1)]
+    assert [t.role for t in store.session("20260218_104654")] == ["user", "kiosk"]
+    store.close()
+
+
+def test_reads_recorded_corpus(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    turns = read_transcripts("data/transcripts")
+    assert len(turns) >= 150
+    assert {t.role for t in turns} == {"user", "kiosk"}
+    assert all(t.session for t in turns)
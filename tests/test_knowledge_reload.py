@@ -0,0 +1,73 @@
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.nlp.knowledge import KnowledgeStore, VersionedMemo, validate_knowledge
+from src.nlp.processor import NLPProcessor
+
+
+def write_knowledge(path, price, hours="Czynne 8-22"):
+    data = {
+        "restaurant": {"hours": hours},
+        "dishes": [{"id": "mieso", "name": "Karkandak z mięsem", "price": price,
+                    "description": "Z wołowiną."}],
+    }
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    # Ta sama sekunda co poprzedni zapis nie może ukryć zmiany
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + price))
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_edit_takes_effect_without_restart(tmp_path):
+    write_knowledge(tmp_path / 'knowledge.json', 35)
+    nlp = NLPProcessor(data_dir=tmp_path)
+    try:
+        assert "35 zł" in nlp.process_query("karkandak z mięsem")
+        assert "35 zł" in nlp.process_query("Karkandak z mięsem!")  # z pamięci
+        assert nlp.memo.hits == 1
+
+        write_knowledge(tmp_path / 'knowledge.json', 39)
+        assert wait_for(lambda: nlp.store.current.version == 2)
+        assert "39 zł" in nlp.process_query("karkandak z mięsem")
+    finally:
+        nlp.close()
+
+
+def test_invalid_edit_keeps_previous_snapshot(tmp_path):
+    path = tmp_path / 'knowledge.json'
+    write_knowledge(path, 35)
+    store = KnowledgeStore({'knowledge': path}, validators={'knowledge': validate_knowledge})
+    first = store.current
+
+    path.write_text('{"dishes": [', encoding='utf-8')
+    assert store.changed()
+    assert not store.reload()
+    write_knowledge(path, -1)
+    assert not store.reload()
+    assert store.current is first and store.failures == 2
+
+    write_knowledge(path, 30)
+    assert store.reload()
+    assert store.current.version == 2
+    assert store.current.sources['knowledge']['dishes'][0]['price'] == 30
+
+
+def test_memo_is_bounded_and_cleared_on_new_version():
+    memo = VersionedMemo(maxsize=2)
+    memo.put(1, "a", "A")
+    memo.put(1, "b", "B")
+    memo.get(1, "a")
+    memo.put(1, "c", "C")  # wypycha najdawniej używane "b"
+    assert memo.get(1, "b") is None and memo.get(1, "a") == "A"
+    assert memo.get(2, "a") is None and len(memo) == 0
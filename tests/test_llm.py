@@ -0,0 +1,214 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.nlp.llm import (
+    ALLERGEN_RESPONSE, AnswerGuard, LLMFallback, OllamaClient, build_prompt, known_prices,
+)
+from src.tts.sentences import SentenceStream, split_sentences
+from src.nlp.processor import NOT_UNDERSTOOD_RESPONSE
+
+RULES = {"forbidden_topics": ["polityka", "konkurencja"]}
+KNOWLEDGE = {
+    "restaurant": {"delivery": "Dowozimy na terenie miasta za 10 zł."},
+    "dishes": [
+        {"id": "ormianski", "name": "Karkandak ormiański", "price": 28, "description": "Ziemniaki z ziołami."},
+        {"id": "nutella", "name": "Karkandak z nutellą", "price": 22},
+    ],
+    "faq": {},
+}
+
+
+class Store:
+    def __init__(self, knowledge=KNOWLEDGE):
+        self.current = SimpleNamespace(version=1, compiled=SimpleNamespace(knowledge=knowledge, rules=RULES))
+
+
+class StubOllama:
+    """Local /api/chat streaming the scripted tokens as NDJSON, with optional delays."""
+
+    def __init__(self, tokens, first_delay=0.0, delay=0.0):
+        self.tokens, self.first_delay, self.delay = tokens, first_delay, delay
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests.append(body)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                time.sleep(stub.first_delay)
+                try:
+                    for token in stub.tokens:
+                        self._chunk({"message": {"role": "assistant", "content": token}, "done": False})
+                        time.sleep(stub.delay)
+                    self._chunk({"done": True})
+                    self.wfile.write(b"0\r\n\r\n")
+                except OSError:
+                    pass  # klient porzucił strumień
+
+            def _chunk(self, obj):
+                data = json.dumps(obj).encode() + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(tokens, **kwargs):
+        servers.append(StubOllama(tokens, **kwargs))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def fallback(server, **kwargs):
+    return LLMFallback(Store(), OllamaClient(server.url, "stub"), **kwargs)
+
+
+def test_sentence_stream_cuts_at_sentence_ends_and_glues_abbreviations():
+    stream = SentenceStream(min_chars=10)
+    out = []
+    for token in ["Znajdziesz nas na ul", ". Kolejowej 41", ". Zapra", "szamy serdecznie!"]:
+        out.extend(stream.feed(token))
+    assert out == ["Znajdziesz nas na ul. Kolejowej 41."]
+    out.extend(stream.feed(" Do"))
+    assert out[-1] == "Zapraszamy serdecznie!"
+    out.extend(stream.feed(" zobaczenia."))
+    assert stream.flush() == ["Do zobaczenia."]
+
+    # Strumień tnie tam, gdzie TTS tnie całą odpowiedź
+    text = "Hmm, ok. Znajdziesz nas na ul. Kolejowej 41. Zapraszamy serdecznie! Do zobaczenia wkrótce."
+    stream = SentenceStream()
+    streamed = [s for i in range(0, len(text), 7) for s in stream.feed(text[i:i + 7])] + stream.flush()
+    assert streamed == split_sentences(text)
+
+
+def test_sentences_reach_tts_while_model_is_still_writing(stub):
+    server = stub(["Karkandak ormiański kosztuje 28 zł. ", "Ciasto jest cieniutkie i chrupiące. ",
+                   "Polecam go na ciepło!"], delay=0.2)
+    heard = []
+    started = time.monotonic()
+    answer = fallback(server).answer("a co jest najlepsze na zimno", lambda s: heard.append((s, time.monotonic())))
+    assert answer.outcome == "ok"
+    assert [s for s, _ in heard] == ["Karkandak ormiański kosztuje 28 zł.", "Ciasto jest cieniutkie i chrupiące.",
+                                     "Polecam go na ciepło!"]
+    assert heard[0][1] - started < 0.3  # pierwsze zdanie przed końcem strumienia (~0.6 s)
+    request = server.requests[0]
+    assert request["model"] == "stub" and request["stream"] is True
+    assert request["messages"][0]["role"] == "system" and "28 zł" in request["messages"][0]["content"]
+    assert request["messages"][1] == {"role": "user", "content": "a co jest najlepsze na zimno"}
+
+
+def test_budget_miss_speaks_canned_reply(stub):
+    server = stub(["Za późno na cokolwiek tutaj."], first_delay=1.0)
+    heard = []
+    started = time.monotonic()
+    answer = fallback(server, first_sentence_s=0.2).answer("pytanie spoza bazy", heard.append)
+    assert time.monotonic() - started < 0.5
+    assert answer.outcome == "timeout"
+    assert heard == [NOT_UNDERSTOOD_RESPONSE]
+
+
+def test_repeated_question_comes_from_cache(stub):
+    server = stub(["Nasze karkandaki smażymy na miejscu."])
+    llm = fallback(server)
+    first = llm.answer("Skąd są karkandaki?", lambda s: None)
+    heard = []
+    again = llm.answer("skąd są karkandaki", heard.append)
+    assert first.outcome == "ok" and again.outcome == "cache"
+    assert heard == ["Nasze karkandaki smażymy na miejscu."]
+    assert len(server.requests) == 1
+
+
+def test_unknown_price_is_replaced_by_verified_price_list(stub):
+    server = stub(["To świetny wybór na targi. ", "Kosztuje tylko 8 zł za sztukę. ", "Smacznego!"])
+    heard = []
+    llm = fallback(server)
+    answer = llm.answer("ile za sztukę na targach", heard.append)
+    assert answer.outcome == "guard:price"
+    assert heard[0] == "To świetny wybór na targi."
+    assert "tylko 8 zł" not in " ".join(heard) and heard[-1] == AnswerGuard(KNOWLEDGE).prices_response
+    assert llm.cache.get(1, "ile za sztukę na targach") is None
+
+
+def test_allergen_claims_are_never_spoken(stub):
+    server = stub(["Ten karkandak nie zawiera glutenu ani orzechów."])
+    heard = []
+    answer = fallback(server).answer("czy jest bez glutenu", heard.append)
+    assert answer.outcome == "guard:allergen"
+    assert heard == [ALLERGEN_RESPONSE]
+
+
+def test_forbidden_topic_never_reaches_the_model(stub):
+    server = stub(["Na tematy polityczne mogę rozmawiać godzinami."])
+    heard = []
+    answer = fallback(server).answer("Co sądzisz o polityce? Polityka!", heard.append)
+    assert answer.outcome == "guard:topic"
+    assert heard == [NOT_UNDERSTOOD_RESPONSE] and server.requests == []
+
+
+def test_guard_rules():
+    guard = AnswerGuard(KNOWLEDGE)
+    assert known_prices(KNOWLEDGE) == {28.0, 22.0, 10.0}
+    assert guard.check("Ormiański kosztuje 28 zł, a dowóz 10 złotych.") is None
+    assert guard.check("Możesz złożyć zamówienie przez telefon.") is None
+    assert guard.check("Kosztuje 25 zł.") == "price"
+    assert guard.check("Kosztuje osiem złotych.") == "price"
+    assert guard.check("Jest wegańskie.") == "allergen"
+    # Kwota bez waluty liczy się jako cena tylko tuż po słowie o cenie
+    assert guard.check("Kosztuje 25.") == "price"
+    assert guard.check("Cena to 25,50 za sztukę.") == "price"
+    assert guard.check("Ormiański kosztuje tylko 28, polecam.") is None
+    assert guard.check("Czynne od 8:00, zadzwoń pod 530 324 239.") is None
+    assert guard.check("Ormiański 28 zł, a z nutellą 25.") is None  # znane ograniczenie: kwota dalej w wyliczance
+    assert "Karkandak z nutellą - 22 zł" in build_prompt(KNOWLEDGE)
+
+
+def test_unreachable_server_falls_back_at_once():
+    llm = LLMFallback(Store(), OllamaClient("http://127.0.0.1:9", "stub"), first_sentence_s=1.0)
+    heard = []
+    answer = llm.answer("cokolwiek", heard.append)
+    assert answer.outcome == "error"
+    assert heard == [NOT_UNDERSTOOD_RESPONSE]
+
+
+def test_barge_in_stops_the_answer(stub):
+    server = stub(["Pierwsze zdanie odpowiedzi modelu. ", "Drugie zdanie odpowiedzi modelu. "], delay=0.1)
+    heard = []
+
+    def on_sentence(sentence):
+        heard.append(sentence)
+        return False
+
+    answer = fallback(server).answer("opowiedz coś", on_sentence)
+    assert answer.outcome == "interrupted"
+    assert heard == ["Pierwsze zdanie odpowiedzi modelu."]
@@ -0,0 +1,43 @@
+import os
+import random
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from src.nlp.matcher import Intent, IntentMatcher, KeywordAutomaton
+
+
+def test_automaton_finds_same_keywords_as_substring_scan():
+    rng = random.Random(1)
+    keywords = list({"".join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(40)})
+    automaton = KeywordAutomaton(keywords)
+    for _ in range(200):
+        text = "".join(rng.choice("abc ") for _ in range(rng.randint(0, 30)))
+        found = {keywords[i] for i in automaton.find(text)}
+        assert found == {k for k in keywords if k in text}
+
+
+def test_priority_order_and_excludes():
+    matcher = IntentMatcher([
+        Intent('greeting', ('hej', 'dzień dobry')),
+        Intent('karkandak', ('karkandak',), excludes=('mięsem',)),
+        Intent('dish', ('karkandak z mięsem',)),
+        Intent('prices', ('ile kosztuje', 'cena')),
+    ])
+    names = lambda q: [i.name for i in matcher.match(q)]
+    assert names("Ile kosztuje karkandak?") == ['karkandak', 'prices']
+    assert names("Dzień dobry, karkandak z mięsem - cena?") == ['greeting', 'dish', 'prices']
+    assert names("nic") == []
+
+
+def test_processor_answers_by_rule(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    from src.nlp.processor import NLPProcessor, NOT_UNDERSTOOD_RESPONSE
+
+    nlp = NLPProcessor()
+    assert nlp.match("Cześć, co polecacie?")[0] == 'greeting'
+    assert nlp.match("karkandak z mięsem")[0] == 'dish'
+    assert nlp.match("Karkandak, ile kosztuje?")[0] == 'karkandak'
+    assert nlp.match("gdzie jesteście")[0] == 'address'
+    assert nlp.match("yyy") == (None, NOT_UNDERSTOOD_RESPONSE)
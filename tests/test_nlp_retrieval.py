@@ -0,0 +1,40 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from src.nlp.retrieval import FuzzyRetriever, fold, ngrams
+
+
+def test_fold_and_ngrams():
+    assert fold("Karkandak z mięsem, proszę!") == "karkandak z miesem prosze"
+    assert fold("Łódź") == "lodz"
+    assert ngrams("ceny") == {" ce", "cen", "eny", "ny "}
+
+
+def test_scores_garbled_queries_and_rejects_noise():
+    retriever = FuzzyRetriever([
+        ("godziny", "hours"),
+        ("ile kosztuje", "prices"),
+        ("karkandak z mięsem", "meat"),
+        ("karkandak", "karkandak"),
+        ("thx", "thanks"),  # za krótkie, pomijane
+    ])
+    assert len(retriever) == 4
+    best = lambda q: [value for value, _ in retriever.search(q)][:1]
+    assert best("godzina otwarcia") == ["hours"]
+    assert best("a ile kosztuję") == ["prices"]
+    assert best("karkandak z miesem prosze") == ["meat"]  # dłuższy wpis wygrywa remis
+    assert best("halo raz dwa trzy") == []
+    assert best("") == []
+
+
+def test_processor_falls_back_to_fuzzy_match(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    from src.nlp.processor import NLPProcessor, NOT_UNDERSTOOD_RESPONSE
+
+    nlp = NLPProcessor()
+    assert nlp.match("godzina otwarci")[0] == 'hours'
+    assert nlp.match("nutela")[0] == 'dish'
+    assert nlp.match("kropka") == (None, NOT_UNDERSTOOD_RESPONSE)
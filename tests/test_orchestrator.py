@@ -0,0 +1,143 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.kiosk.orchestrator import BUTTON, STT_FINAL, TTS_DONE, Orchestrator
+
+
+class FakeTTS:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.spoken = []
+        self.generation = 0
+
+    def speak(self, text, on_done=None):
+        self.spoken.append(text)
+        threading.Timer(self.seconds, on_done).start()
+
+
+class FakeUIQueue:
+    def __init__(self):
+        self.calls = []
+
+    def post(self, fn, *args):
+        self.calls.append((fn, args))
+
+
+def run(orchestrator, coro, timeout=3):
+    return asyncio.run_coroutine_threadsafe(coro, orchestrator.loop).result(timeout)
+
+
+def test_events_from_threads_wake_waiter_immediately():
+    orchestrator = Orchestrator().start()
+    try:
+        waiter = asyncio.run_coroutine_threadsafe(
+            orchestrator.next_event(STT_FINAL, timeout=5), orchestrator.loop)
+        time.sleep(0.05)
+        posted = time.perf_counter()
+        threading.Thread(target=lambda: (orchestrator.post(TTS_DONE),
+                                         orchestrator.post(STT_FINAL, "jakie ceny"))).start()
+        event = waiter.result(1)
+        assert event.kind == STT_FINAL and event.payload == "jakie ceny"
+        assert time.perf_counter() - posted < 0.05  # bez 100 ms odpytywania
+    finally:
+        orchestrator.stop()
+
+
+def test_timeout_returns_none():
+    orchestrator = Orchestrator().start()
+    try:
+        start = time.perf_counter()
+        assert run(orchestrator, orchestrator.next_event(BUTTON, timeout=0.1)) is None
+        assert 0.09 <= time.perf_counter() - start < 0.3
+    finally:
+        orchestrator.stop()
+
+
+def test_say_and_blocking_calls_keep_loop_responsive():
+    ui_queue = FakeUIQueue()
+    orchestrator = Orchestrator(ui_queue).start()
+    tts = FakeTTS(0.2)
+
+    async def scenario():
+        speaking = asyncio.ensure_future(orchestrator.say(tts, "Dzień dobry"))
+        blocking = asyncio.ensure_future(orchestrator.run_blocking(time.sleep, 0.2))
+        orchestrator.post(BUTTON)
+        pressed = await orchestrator.next_event(BUTTON, timeout=0.1)
+        assert not speaking.done() and not blocking.done()
+        await asyncio.gather(speaking, blocking)
+        orchestrator.ui(ui_queue.calls.append, "reset")
+        return pressed
+
+    try:
+        assert run(orchestrator, scenario()).kind == BUTTON
+        assert tts.spoken == ["Dzień dobry"]
+        assert len(ui_queue.calls) == 1
+    finally:
+        orchestrator.stop()
+
+
+def test_say_stream_speaks_sentences_as_they_are_produced():
+    orchestrator = Orchestrator().start()
+    tts = FakeTTS(0.05)
+    heard_first = []
+
+    def produce(emit):
+        emit("Pierwsze zdanie.")
+        time.sleep(0.1)
+        heard_first.append(list(tts.spoken))  # TTS dostał zdanie, zanim powstało następne
+        emit("Drugie zdanie.")
+        tts.generation += 1  # barge-in
+        assert emit("Trzecie zdanie.") is False
+        return "wynik"
+
+    try:
+        start = time.perf_counter()
+        assert run(orchestrator, orchestrator.say_stream(tts, produce)) == "wynik"
+        assert heard_first == [["Pierwsze zdanie."]]
+        assert tts.spoken == ["Pierwsze zdanie.", "Drugie zdanie."]
+        assert time.perf_counter() - start >= 0.15  # czeka na koniec ostatniego zdania
+    finally:
+        orchestrator.stop()
+
+
+def test_clear_events_forgets_stale_speech():
+    orchestrator = Orchestrator().start()
+    try:
+        orchestrator.post(STT_FINAL, "stara fraza")
+        time.sleep(0.02)
+        orchestrator.loop.call_soon_threadsafe(orchestrator.clear_events)
+        orchestrator.post(STT_FINAL, "nowa fraza")
+        assert run(orchestrator, orchestrator.next_event(STT_FINAL, timeout=1)).payload == "nowa fraza"
+    finally:
+        orchestrator.stop()
+
+
+def test_tts_synthesizes_on_the_shared_loop(monkeypatch, tmp_path):
+    import src.tts.engine as tts_engine
+    from src.tts.backends import FakeBackend
+    from src.tts.engine import TTSEngine
+    from src.tts.player import StreamingPlayer
+
+    threads = []
+
+    class RecordingBackend(FakeBackend):
+        async def stream(self, text):
+            threads.append(threading.current_thread().name)
+            async for chunk in super().stream(text):
+                yield chunk
+
+    monkeypatch.setattr(tts_engine, "TTS_CACHE_DIR", str(tmp_path))
+    orchestrator = Orchestrator().start()
+    engine = TTSEngine(backends=[RecordingBackend(latency=0.01, chunks=1, chunk_size=10)], loop=orchestrator.loop)
+    engine.players[("mp3", 24000)] = StreamingPlayer(["cat"], bytes_per_second=1000)
+    try:
+        run(orchestrator, orchestrator.say(engine, "Wszystkie karkandaki za osiem złotych!"))
+        assert threads == ["kiosk-loop"]
+    finally:
+        engine.stop()
+        orchestrator.stop()
@@ -0,0 +1,88 @@
+import os
+import sys
+import wave
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from benchmarks.replay import StubTTS, load_transcripts, pair_recordings, replay, word_errors
+from src.stt.wavio import read_wav
+
+
+def write_tone(path, freq, rate=48000, seconds=0.5, amplitude=8000):
+    t = np.arange(int(rate * seconds)) / rate
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes((amplitude * np.sin(2 * np.pi * freq * t)).astype("<i2").tobytes())
+
+
+def test_read_wav_resamples_without_aliasing(tmp_path):
+    write_tone(tmp_path / "speech.wav", 1000)
+    write_tone(tmp_path / "alias.wav", 12000)  # powyżej 8 kHz - musi zniknąć, nie zawinąć się
+    speech = read_wav(tmp_path / "speech.wav")
+    assert len(speech) == 8000
+    assert 7000 < np.abs(speech[500:-500]).max() < 8500
+    assert np.abs(read_wav(tmp_path / "alias.wav")[500:-500]).max() < 800
+
+
+def test_word_errors():
+    assert word_errors("jakie są ceny", "Jakie są ceny?") == (0, 3)
+    assert word_errors("jakie są ceny", "jakie ceny dziś") == (2, 3)
+    assert word_errors("", "halo") == (1, 0)
+
+
+def test_pairs_recordings_with_lagging_transcripts():
+    pairs = pair_recordings(os.path.join(ROOT, "data/audio"),
+                            load_transcripts(os.path.join(ROOT, "data/transcripts")))
+    by_name = dict((p.name, ref) for p, ref in pairs)
+    assert by_name["audio_20260218_105835.wav"] == "що у вас є їсти"
+    assert sum(ref is not None for ref in by_name.values()) > 30
+
+
+class ScriptedSTT:
+    """Returns a fixed text per session, like STTEngine fed through feed()/flush()."""
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.fed = 0
+        self.queue = []
+
+    def start_listening(self):
+        self.queue = []
+
+    def feed(self, block):
+        self.fed += len(block)
+
+    def flush(self):
+        self.queue.append(self.texts.pop(0))
+
+    def get_text(self, block=True):
+        return self.queue.pop(0) if self.queue else ""
+
+    def stop_listening(self):
+        pass
+
+
+class EchoNLP:
+    def process_query(self, text):
+        return f"odp: {text}"
+
+
+def test_replay_report(tmp_path):
+    for i in range(2):
+        write_tone(tmp_path / f"audio_{i}.wav", 440)
+    pairs = [(tmp_path / "audio_0.wav", "jakie ceny"), (tmp_path / "audio_1.wav", None)]
+    tts = StubTTS()
+    stt = ScriptedSTT(["jakie są ceny", "halo"])
+    report = replay(pairs, stt, EchoNLP(), tts)
+
+    assert stt.fed == 2 * 8000 * 2
+    assert tts.spoken == ["odp: jakie są ceny", "odp: halo"]
+    assert report["wer"] == {"corpus": 0.5, "errors": 1, "reference_words": 2}
+    assert report["corpus"] == {"files": 2, "with_reference": 1, "audio_seconds": 1.0}
+    assert set(report["latency_ms"]["response"]) == {"p50", "p90", "p99", "max", "mean"}
+    assert "wer" not in report["files"][1]
@@ -0,0 +1,82 @@
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.soak import Soak, analyze, trend
+from src.audio.devices import VirtualInput, VirtualOutput
+
+
+class FakeKiosk:
+    """START -> listens until the customer stops talking, answers after `delay` s with 0.1 s of audio."""
+
+    def __init__(self, microphone, speaker, delay):
+        self.microphone, self.speaker, self.delay = microphone, speaker, delay
+        self.mode = "PROMO"
+        self.stt = SimpleNamespace(is_listening=False)
+        self.sessions = 0
+
+    def toggle_mode(self):
+        self.mode = "DIALOG"
+        self.stt.is_listening = True
+        self.sessions += 1
+        threading.Thread(target=self._dialog, daemon=True).start()
+
+    def _dialog(self):
+        stream = self.microphone.open(16000, 800)
+        deadline = time.monotonic() + 1
+        while not self.microphone.speaking():
+            if time.monotonic() > deadline:
+                return  # soak zatrzymany, zanim klient się odezwał
+            time.sleep(0.005)
+        while self.microphone.speaking():
+            stream.read(800)
+        self.stt.is_listening = False
+        time.sleep(self.delay)
+        player = self.speaker.player("pcm", 16000)
+        player.begin()
+        player.feed(b"\1\0" * 1600)
+        player.wait_done()
+        self.mode = "PROMO"
+
+
+def test_soak_driver_measures_reply_latency_per_window():
+    microphone = VirtualInput(realtime=False)
+    speaker = VirtualOutput()
+    kiosk = FakeKiosk(microphone, speaker, delay=0.05)
+    clips = [np.full(1600, 5000, dtype=np.int16)]
+    soak = Soak(kiosk, microphone, speaker, clips, window_s=0.5, pause_s=(0.0, 0.01)).start()
+    time.sleep(1.3)
+    soak.stop()
+
+    assert kiosk.sessions >= 3
+    assert len(soak.windows) >= 2
+    assert sum(w["turns"] for w in soak.windows) == len(soak.turns)
+    latencies = [latency for _, latency in soak.turns if latency is not None]
+    assert latencies and all(0.04 <= latency < 0.2 for latency in latencies)
+    row = soak.windows[0]
+    assert row["rss_mb"] > 0 and row["threads"] >= 3 and "p50" in row["latency_ms"]
+
+
+def test_analyze_flags_drift_and_leaks():
+    def row(t_h, p50, rss, threads, fds=20, turns=10, no_reply=0):
+        return {"t_h": t_h, "turns": turns, "no_reply": no_reply, "latency_ms": {"p50": p50},
+                "rss_mb": rss, "fds": fds, "threads": threads, "cpu": 30.0}
+
+    steady = [row(h, 800 + (h % 2) * 10, 180.0, 14) for h in range(8)]
+    result = analyze(steady)
+    assert result["failures"] == [] and result["turns"] == 80
+    assert abs(result["latency_drift_ms_per_h"]) < 5 and result["rss_growth_mb_per_h"] == 0
+
+    leaking = [row(h, 800 + 100 * h, 180.0 + 30 * h, 14 + h, no_reply=5) for h in range(8)]
+    result = analyze(leaking)
+    assert result["latency_drift_ms_per_h"] == 100 and result["rss_growth_mb_per_h"] == 30
+    assert result["thread_growth"] == 7 and result["no_reply_share"] == 0.5
+    assert [f.split()[0] for f in result["failures"]] == [
+        "latency_drift_ms_per_h", "rss_growth_mb_per_h", "thread_growth", "no_reply_share"]
+    assert trend([1.0], [5.0]) == 0.0
@@ -0,0 +1,69 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.nlp.processor import NLPProcessor
+from src.nlp.speculation import ResponseSpeculator
+from src.telemetry.tracing import tracer
+
+
+class KeywordNLP:
+    answers = {"cena": "Wszystko po 8 zł.", "adres": "Kolejowa 41."}
+
+    def process_query(self, query):
+        for word, answer in self.answers.items():
+            if word in query:
+                return answer
+        return "?"
+
+    peek = process_query
+
+    def match(self, query):
+        response = self.process_query(query)
+        return (None if response == "?" else "keyword"), response
+
+    def is_fallback(self, response):
+        return response == "?"
+
+
+def test_stable_partial_prefetches_and_final_commits():
+    prefetched = []
+    spec = ResponseSpeculator(KeywordNLP(), prefetch=prefetched.append)
+    spec.on_partial("jaka jest cena")
+    assert spec.resolve("jaka jest cena karkandaka") == ("keyword", "Wszystko po 8 zł.")
+    assert prefetched == ["Wszystko po 8 zł."]
+    assert spec.stats()["hits"] == 1 and spec.stats()["hit_rate"] == 1.0
+
+
+def test_changed_final_discards_guess():
+    spec = ResponseSpeculator(KeywordNLP())
+    spec.on_partial("cena")
+    assert spec.resolve("nie cena, tylko adres")[1] == "Wszystko po 8 zł."  # cena ma pierwszeństwo
+    spec.on_partial("adres")
+    spec.resolve("a gdzie to jest")
+    stats = spec.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_unmatched_partials_are_not_speculated():
+    prefetched = []
+    spec = ResponseSpeculator(KeywordNLP(), prefetch=prefetched.append)
+    spec.on_partial("yyy")
+    spec.resolve("yyy")
+    assert prefetched == []
+    assert spec.stats()["speculations"] == 0
+
+
+def test_partials_leave_no_trace_in_the_processor(monkeypatch):
+    monkeypatch.setattr(tracer, "enabled", True)
+    monkeypatch.setattr(tracer, "counters", {})
+    nlp = NLPProcessor(watch=False)
+    spec = ResponseSpeculator(nlp)
+    for partial in ("jakie", "jakie są", "jakie są ceny"):
+        spec.on_partial(partial)
+    final = spec.resolve("jakie są ceny")
+    assert final == nlp.match("jakie są ceny") and final[0] == "prices" and spec.stats()["hits"] == 1
+    # Tylko dwa ostateczne zapytania: jedno z resolve, jedno powyżej (z memo)
+    assert nlp.memo.stats()["misses"] == 1 and nlp.memo.stats()["hits"] == 1 and len(nlp.memo) == 1
+    assert sum(n for (name, _), n in tracer.counters.items() if name == "nlp.rule") == 2
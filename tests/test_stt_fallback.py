@@ -0,0 +1,100 @@
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.load_stt_server import ServerThread
+from src.stt.engine import STTEngine
+
+RATE = 16000
+BLOCK = 1600
+DECODE_S = 0.5
+
+
+class GrammarOrOpen:
+    """Grammar recognizer: the scripted (text, conf) per utterance; full vocabulary: slow, "pełny N"."""
+
+    def __init__(self, grammar, script, opened):
+        self.grammar = grammar
+        self.script = script
+        self.opened = opened
+        self.heard = 0
+
+    def AcceptWaveform(self, data):
+        self.heard += len(data)
+        return False
+
+    def FinalResult(self):
+        heard, self.heard = self.heard, 0
+        if not self.grammar:
+            self.opened.append(heard)
+            time.sleep(DECODE_S)
+            return json.dumps({"text": f"pełny {len(self.opened)}"})
+        text, conf = self.script.pop(0)
+        words = [{"word": w, "conf": conf} for w in text.split()]
+        return json.dumps({"text": text, "result": words})
+
+    def Result(self):
+        return self.FinalResult()
+
+    def PartialResult(self):
+        return json.dumps({"partial": ""})
+
+    def Reset(self):
+        self.heard = 0
+
+
+def tone(seconds, amplitude=6000):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+
+
+def feed(stt, samples):
+    data = samples.astype("<i2").tobytes()
+    for i in range(0, len(data), BLOCK * 2):
+        stt.feed(data[i:i + BLOCK * 2])
+
+
+def engine(server):
+    stt = STTEngine(server=server.path, capture=False)
+    stt.grammar = '["menu", "[unk]"]'
+    stt.recognizer = stt._make_recognizer(stt.grammar)
+    stt.start_listening()
+    feed(stt, np.random.default_rng(0).normal(0, 30, RATE // 2).astype(np.int16))  # podłoga szumu VAD
+    return stt
+
+
+def test_open_vocabulary_decode_does_not_block_capture_and_keeps_order():
+    script = [("[unk] [unk]", 0.9), ("menu", 0.95)]
+    opened = []
+    with ServerThread(lambda grammar=None, words=False: GrammarOrOpen(grammar, script, opened), 3, 2) as server:
+        stt = engine(server)
+        try:
+            started = time.monotonic()
+            feed(stt, np.concatenate([tone(0.8), np.zeros(RATE, dtype=np.int16)]))  # spoza gramatyki
+            feed(stt, np.concatenate([tone(0.8), np.zeros(RATE, dtype=np.int16)]))  # pewne "menu"
+            assert time.monotonic() - started < DECODE_S  # mikrofon nie czekał na pełny słownik
+            stt.flush()
+            assert [stt.get_text(block=False), stt.get_text(block=False)] == ["pełny 1", "menu"]
+            assert len(opened) == 1
+        finally:
+            stt.close()
+
+
+def test_noise_and_blips_skip_the_open_vocabulary():
+    script = [("", None), ("[unk]", 0.3)]
+    opened = []
+    with ServerThread(lambda grammar=None, words=False: GrammarOrOpen(grammar, script, opened), 3, 2) as server:
+        stt = engine(server)
+        try:
+            feed(stt, np.concatenate([tone(0.8), np.zeros(RATE, dtype=np.int16)]))   # pusty wynik: szum
+            feed(stt, np.concatenate([tone(0.1), np.zeros(RATE, dtype=np.int16)]))   # stuknięcie 0.1 s
+            stt.flush()
+            assert opened == [] and not script
+            assert stt.get_text(block=False) == "[unk]"
+        finally:
+            stt.close()
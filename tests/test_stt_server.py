@@ -0,0 +1,136 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.load_stt_server import ServerThread, run_load
+from src.stt.remote import RemoteError, RemoteNLP, RemoteRecognizer
+
+
+class FakeRecognizer:
+    """Endpoint after every 4 blocks; the text is the number of bytes heard."""
+
+    def __init__(self, grammar, words, decode_s=0.0):
+        self.grammar, self.words, self.decode_s = grammar, words, decode_s
+        self.heard = 0
+        self.blocks = 0
+
+    def AcceptWaveform(self, data):
+        time.sleep(self.decode_s)
+        self.heard += len(data)
+        self.blocks += 1
+        return self.blocks % 4 == 0
+
+    def _text(self):
+        return json.dumps({"text": f"menu {self.heard}" if self.heard else ""})
+
+    def Result(self):
+        return self._text()
+
+    def PartialResult(self):
+        return json.dumps({"partial": f"menu {self.heard}"})
+
+    def FinalResult(self):
+        return self._text()
+
+    def Reset(self):
+        self.heard = self.blocks = 0
+
+
+class Factory:
+    def __init__(self, decode_s=0.0):
+        self.made = []
+        self.decode_s = decode_s
+
+    def __call__(self, grammar=None, words=False):
+        recognizer = FakeRecognizer(grammar, words, self.decode_s)
+        self.made.append(recognizer)
+        return recognizer
+
+
+class FakeNLP:
+    def match(self, query):
+        return "menu", f"Odpowiedź na: {query}"
+
+
+def test_remote_recognizer_behaves_like_kaldi():
+    factory = Factory()
+    with ServerThread(factory, pool_size=2, workers=2, nlp=FakeNLP()) as server:
+        recognizer = RemoteRecognizer(server.path, grammar='["menu"]', words=True)
+        assert [recognizer.AcceptWaveform(b"\0" * 100) for _ in range(4)] == [False, False, False, True]
+        assert json.loads(recognizer.PartialResult()) == {"partial": "menu 400"}
+        result = json.loads(recognizer.Result())
+        assert result["text"] == "menu 400"
+        assert result["intent"] == "menu" and result["response"] == "Odpowiedź na: menu 400"
+        assert factory.made[0].grammar == '["menu"]' and factory.made[0].words
+        # Bez dźwięku nie zajmuje rozpoznawacza - pusty wynik
+        recognizer.Reset()
+        assert json.loads(recognizer.FinalResult()) == {"text": ""}
+        recognizer.close()
+
+        nlp = RemoteNLP(server.path)
+        assert nlp.match("ceny") == ("menu", "Odpowiedź na: ceny")
+        nlp.close()
+
+
+def test_recognizer_returns_to_pool_after_final_result():
+    factory = Factory()
+    with ServerThread(factory, pool_size=2, workers=2) as server:
+        a, b = RemoteRecognizer(server.path), RemoteRecognizer(server.path)
+        for _ in range(3):
+            a.AcceptWaveform(b"\0" * 10)
+            a.FinalResult()
+            b.AcceptWaveform(b"\0" * 10)
+            b.FinalResult()
+        pool = server.server.pool.stats()
+        # Po zamknięciu frazy rozpoznawacz wraca wyczyszczony i jest używany ponownie
+        assert pool["created"] == 1 and pool["leased"] == 0 and pool["idle"] == 1
+        assert json.loads(a.FinalResult()) == {"text": ""}
+        a.close()
+        b.close()
+
+
+def test_pool_limits_concurrent_utterances():
+    factory = Factory()
+    with ServerThread(factory, pool_size=1, workers=2) as server:
+        a, b = RemoteRecognizer(server.path), RemoteRecognizer(server.path)
+        a.AcceptWaveform(b"\0" * 10)
+        done = threading.Event()
+        waiter = threading.Thread(target=lambda: (b.AcceptWaveform(b"\0" * 10), done.set()))
+        waiter.start()
+        time.sleep(0.1)
+        assert not done.is_set()  # druga fraza czeka na wolny rozpoznawacz
+        a.close()  # rozłączenie oddaje rozpoznawacz
+        assert done.wait(2)
+        waiter.join()
+        assert server.server.pool.stats()["waits"] == 1
+        assert len(factory.made) == 1
+        b.close()
+
+
+def test_query_without_nlp_is_an_error():
+    with ServerThread(Factory(), pool_size=1, workers=1) as server:
+        nlp = RemoteNLP(server.path)
+        try:
+            nlp.match("ceny")
+        except RemoteError as e:
+            assert "NLP" in str(e)
+        else:
+            raise AssertionError("expected RemoteError")
+        nlp.close()
+
+
+def test_load_sessions_decode_in_parallel():
+    clips = [np.zeros(16000, dtype=np.int16)]
+    # 100 ms dźwięku w blokach po 20 ms, dekodowanie 10 ms/blok - 4 sesje muszą się mieścić w czasie rzeczywistym
+    report = run_load(Factory(decode_s=0.01), clips, sessions=4, seconds=0.3, block_size=320, pool_size=4,
+                      workers=4)
+    assert report["blocks"] == 4 * 15
+    assert report["late_blocks"] == 0
+    assert report["pool"]["created"] == 4 and report["pool"]["waits"] == 0
+    assert report["sessions_per_core"] > 0
@@ -0,0 +1,76 @@
+import json
+import os
+import sys
+import time
+import urllib.request
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.telemetry.tracing import NOOP_SPAN, RotatingJsonl, Tracer
+
+
+def test_disabled_tracer_is_a_noop():
+    tracer = Tracer(enabled=False)
+    with tracer.span("nlp.match") as span:
+        span.set(rule="prices")
+    tracer.mark("speech_end")
+    tracer.since("speech_end", "turn.response")
+    assert span is NOOP_SPAN
+    assert tracer.histograms == {}
+
+    started = time.perf_counter()
+    for _ in range(100000):
+        with tracer.span("stt.final"):
+            pass
+    assert (time.perf_counter() - started) / 100000 < 5e-6
+
+
+def test_spans_fill_histograms_and_prometheus_text():
+    tracer = Tracer(enabled=True)
+    tracer.begin_turn()
+    tracer.record("nlp.match", 0.0004)
+    tracer.record("nlp.match", 0.03)
+    with tracer.span("tts.synthesis") as span:
+        span.set(cached=True)
+    tracer.count("nlp.rule", rule="prices")
+    tracer.mark("speech_end")
+    tracer.since("speech_end", "turn.response")
+    tracer.since("speech_end", "turn.response")  # znacznik zużyty - drugi raz nic
+
+    text = tracer.prometheus()
+    assert 'kiosk_stage_duration_seconds_bucket{stage="nlp.match",le="0.001"} 1' in text
+    assert 'kiosk_stage_duration_seconds_bucket{stage="nlp.match",le="0.05"} 2' in text
+    assert 'kiosk_stage_duration_seconds_bucket{stage="nlp.match",le="+Inf"} 2' in text
+    assert 'kiosk_stage_duration_seconds_count{stage="turn.response"} 1' in text
+    assert 'kiosk_events_total{event="nlp.rule",rule="prices"} 1' in text
+
+
+def test_jsonl_sink_rotates(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    sink = RotatingJsonl(path, max_bytes=200, backups=2)
+    tracer = Tracer(enabled=True)
+    tracer.sinks.append(sink)
+    tracer.begin_turn()
+    for i in range(20):
+        tracer.record("stt.final", 0.01 * i, endpoint="vad")
+        sink.flush()
+    sink.close()
+
+    assert os.path.exists(path + ".1") and os.path.exists(path + ".2")
+    assert not os.path.exists(path + ".3")
+    record = json.loads(open(path + ".1", encoding="utf-8").readline())
+    assert record["span"] == "stt.final" and record["turn"] == 1 and record["endpoint"] == "vad"
+
+
+def test_metrics_endpoint():
+    tracer = Tracer(enabled=True)
+    tracer.record("tts.first_audio", 0.2)
+    server = tracer.serve("127.0.0.1", 0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=2) as response:
+            body = response.read().decode("utf-8")
+        assert response.headers["Content-Type"].startswith("text/plain")
+        assert 'stage="tts.first_audio"' in body
+    finally:
+        tracer.stop()
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.tts.backends import BackendRouter, FakeBackend, PiperBackend, TTSBackend
+
+
+def collect(router, text="Dzień dobry"):
+    async def run():
+        return [item async for item in router.stream(text)]
+    return asyncio.run(run())
+
+
+def test_primary_backend_serves_when_healthy():
+    cloud, local = FakeBackend("cloud"), FakeBackend("local", audio_format="pcm")
+    chunks = collect(BackendRouter([cloud, local]))
+    assert {backend for backend, _ in chunks} == {cloud}
+    assert local.calls == []
+
+
+def test_falls_back_when_primary_fails_and_skips_it_afterwards():
+    cloud, local = FakeBackend("cloud", fail=True), FakeBackend("local")
+    router = BackendRouter([cloud, local], cooldown=60)
+
+    assert {b for b, _ in collect(router)} == {local}
+    assert router.candidates() == [local, cloud]
+    collect(router)
+    assert len(cloud.calls) == 1  # offline backend not retried during cooldown
+
+
+def test_falls_back_when_first_chunk_is_too_late():
+    cloud, local = FakeBackend("cloud", latency=0.5), FakeBackend("local")
+    router = BackendRouter([cloud, local], first_chunk_timeout=0.1)
+
+    start = time.monotonic()
+    assert {b for b, _ in collect(router)} == {local}
+    assert time.monotonic() - start < 0.4
+
+
+def test_slow_primary_is_deprioritized_then_probed_again():
+    cloud, local = FakeBackend("cloud", latency=0.15), FakeBackend("local")
+    router = BackendRouter([cloud, local], latency_budget=0.1, cooldown=0.3)
+
+    assert {b for b, _ in collect(router)} == {cloud}
+    assert router.candidates()[0] is local
+    time.sleep(0.35)
+    assert router.candidates()[0] is cloud
+
+
+def test_raises_when_every_backend_fails():
+    router = BackendRouter([FakeBackend("a", fail=True), FakeBackend("b", fail=True)])
+    try:
+        collect(router)
+    except ConnectionError:
+        pass
+    else:
+        raise AssertionError("expected ConnectionError")
+
+
+class SlowPiperVoice:
+    """PiperVoice >= 1.3 stand-in: one AudioChunk per sentence, 0.2 s of synthesis each."""
+
+    def __init__(self):
+        self.synthesized = []
+
+    def synthesize(self, text):
+        for sentence in text.split(". "):
+            time.sleep(0.2)
+            self.synthesized.append(sentence)
+            yield SimpleNamespace(audio_int16_bytes=sentence.encode())
+
+
+def piper(voice):
+    backend = PiperBackend.__new__(PiperBackend)  # bez modelu ONNX
+    TTSBackend.__init__(backend, "piper:test")
+    backend._voice, backend.sample_rate = voice, 22050
+    return backend
+
+
+def test_backend_must_implement_stream():
+    with pytest.raises(TypeError):
+        TTSBackend("abstract")
+
+
+def test_piper_yields_each_chunk_as_it_is_synthesized():
+    voice = SlowPiperVoice()
+    backend = piper(voice)
+
+    async def run():
+        started, arrivals = time.monotonic(), []
+        async for chunk in backend.stream("Raz. Dwa. Trzy"):
+            arrivals.append((chunk, time.monotonic() - started))
+        return arrivals
+
+    arrivals = asyncio.run(run())
+    assert [chunk for chunk, _ in arrivals] == [b"Raz", b"Dwa", b"Trzy"]
+    assert arrivals[0][1] < 0.35  # pierwszy kawałek nie czeka na całą syntezę (~0.6 s)
+
+
+def test_piper_stops_synthesizing_when_the_stream_is_closed():
+    voice = SlowPiperVoice()
+    backend = piper(voice)
+
+    async def run():
+        chunks = backend.stream("Raz. Dwa. Trzy. Cztery")
+        first = await chunks.__anext__()
+        await chunks.aclose()  # barge-in
+        await asyncio.sleep(0.5)
+        return first
+
+    assert asyncio.run(run()) == b"Raz"
+    assert len(voice.synthesized) <= 3
@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.tts.cache import AudioCache
+
+
+def test_key_depends_on_voice_rate_and_text():
+    base = AudioCache.make_key("pl-PL-ZofiaNeural", "+5%", "Dzień dobry")
+    assert base == AudioCache.make_key("pl-PL-ZofiaNeural", "+5%", "Dzień dobry")
+    assert base != AudioCache.make_key("pl-PL-MarekNeural", "+5%", "Dzień dobry")
+    assert base != AudioCache.make_key("pl-PL-ZofiaNeural", "+0%", "Dzień dobry")
+    assert base != AudioCache.make_key("pl-PL-ZofiaNeural", "+5%", "Dzień dobry!")
+
+
+def test_put_get_and_persistence(tmp_path):
+    cache = AudioCache(tmp_path)
+    assert cache.get("a") is None
+    path = cache.put("a", b"mp3-bytes")
+    assert cache.get("a") == path
+    assert path.read_bytes() == b"mp3-bytes"
+
+    reopened = AudioCache(tmp_path)
+    assert "a" in reopened
+    assert reopened.stats()["bytes"] == len(b"mp3-bytes")
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = AudioCache(tmp_path, max_bytes=25)
+    cache.put("a", b"x" * 10)
+    cache.put("b", b"x" * 10)
+    cache.get("a")
+    cache.put("c", b"x" * 10)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert not (tmp_path / "b.mp3").exists()
@@ -0,0 +1,95 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import src.tts.engine as tts_engine
+from src.tts.backends import FakeBackend
+from src.tts.engine import TTSEngine, split_sentences
+from src.tts.player import StreamingPlayer
+
+
+class TimedBackend(FakeBackend):
+    def __init__(self, events):
+        super().__init__(latency=0.05, chunks=2, chunk_size=100)  # 0.2 s of "audio"
+        self.events = events
+
+    async def stream(self, text):
+        self.events.append(("synth", text, time.monotonic()))
+        async for chunk in super().stream(text):
+            yield chunk
+
+
+def test_split_sentences_glues_short_fragments():
+    assert split_sentences("Hmm, ok. Znajdziesz nas na ul. Kolejowej 41. Zapraszamy!") == [
+        "Hmm, ok. Znajdziesz nas na ul. Kolejowej 41. Zapraszamy!",
+    ]
+    parts = split_sentences("Pierwsze zdanie jest długie. Drugie zdanie też jest długie. Ok.")
+    assert parts == ["Pierwsze zdanie jest długie.", "Drugie zdanie też jest długie. Ok."]
+    assert split_sentences("") == []
+
+
+def make_engine(monkeypatch, tmp_path, events):
+    monkeypatch.setattr(tts_engine, "TTS_CACHE_DIR", str(tmp_path))
+    engine = TTSEngine(backends=[TimedBackend(events)])
+    engine.players[("mp3", 24000)] = StreamingPlayer(["cat"], bytes_per_second=1000)
+    return engine
+
+
+def test_next_sentence_is_synthesized_while_previous_plays(monkeypatch, tmp_path):
+    events = []
+    engine = make_engine(monkeypatch, tmp_path, events)
+    try:
+        start = time.monotonic()
+        engine.speak_wait("Pierwsze zdanie jest długie. Drugie zdanie też jest długie. Trzecie zdanie kończy wypowiedź.")
+        elapsed = time.monotonic() - start
+
+        assert [e[1][:5] for e in events] == ["Pierw", "Drugi", "Trzec"]
+        # Synthesis of sentence 2 starts long before sentence 1 (0.2 s) has finished playing
+        assert events[1][2] - events[0][2] < 0.15
+        # speak_wait covered all playback: 3 x 0.2 s, no per-clip synthesis gaps
+        assert 0.6 <= elapsed < 0.6 + 0.05 + 0.5
+    finally:
+        engine.stop()
+
+
+def test_repeated_sentences_come_from_cache(monkeypatch, tmp_path):
+    events = []
+    engine = make_engine(monkeypatch, tmp_path, events)
+    try:
+        engine.speak_wait("Wszystkie karkandaki za osiem złotych!")
+        engine.speak_wait("Wszystkie karkandaki za osiem złotych!")
+        assert len(events) == 1
+        assert engine.cache.stats()["hits"] == 1
+    finally:
+        engine.stop()
+
+
+def test_speak_reports_completion_and_stop_wakes_idle_workers(monkeypatch, tmp_path):
+    events = []
+    engine = make_engine(monkeypatch, tmp_path, events)
+    done = []
+    finished = threading.Event()
+    engine.speak("Pierwsze zdanie jest długie. Drugie zdanie też jest długie.",
+                 on_done=lambda: (done.append(time.monotonic()), finished.set()))
+    assert finished.wait(2)
+    assert len(done) == 1 and len(events) == 2
+
+    # Wątki śpią na kolejkach bez limitu czasu; stop() budzi je od razu
+    start = time.monotonic()
+    engine.stop()
+    assert time.monotonic() - start < 0.3
+    assert not engine.speaking_thread.is_alive()
+    assert not engine.playback_thread.is_alive()
+    assert not engine.prefetch_thread.is_alive()
+
+
+def test_stop_releases_pending_replies(monkeypatch, tmp_path):
+    engine = make_engine(monkeypatch, tmp_path, [])
+    released = []
+    for i in range(4):
+        engine.speak(f"Zdanie numer {i} jest wystarczająco długie.", on_done=lambda i=i: released.append(i))
+    engine.stop()
+    assert sorted(released) == [0, 1, 2, 3]
@@ -0,0 +1,34 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.tts.player import StreamingPlayer
+
+
+def test_wait_done_tracks_fed_audio_duration():
+    player = StreamingPlayer(["cat"], bytes_per_second=1000)
+    player.begin()
+    player.feed(b"\0" * 200)
+    process = player.process
+    start = time.monotonic()
+    assert player.wait_done()
+    assert time.monotonic() - start >= 0.2
+    player.feed(b"\0" * 10)
+    assert player.process is process  # decoder stays alive between chunks
+    player.close()
+    assert process.poll() is not None
+
+
+def test_cancel_releases_waiter_and_ignores_late_chunks():
+    player = StreamingPlayer(["cat"], bytes_per_second=100)
+    player.begin()
+    player.feed(b"\0" * 1000)
+    threading.Timer(0.05, player.cancel).start()
+    start = time.monotonic()
+    assert player.wait_done() is False
+    assert time.monotonic() - start < 1
+    player.feed(b"\0" * 10)
+    assert player.process is None
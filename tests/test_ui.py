@@ -0,0 +1,122 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from src.kiosk.ui import LevelMeter, UIQueue
+
+
+class FakeRoot:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay, fn, *args):
+        self.scheduled.append((delay, fn, args))
+
+    def run_tick(self):
+        _, fn, args = self.scheduled.pop(0)
+        fn(*args)
+
+
+class FakeCanvas:
+    def __init__(self):
+        self.created = 0
+        self.fills = {}
+        self.configs = 0
+
+    def create_rectangle(self, *coords, fill=None, outline=None):
+        self.created += 1
+        self.fills[self.created] = fill
+        return self.created
+
+    def itemconfig(self, item, fill=None):
+        self.configs += 1
+        self.fills[item] = fill
+
+
+def test_asset_cache_scales_once_per_size(tmp_path):
+    pytest.importorskip("PIL")
+    from src.kiosk.assets import AssetCache
+    source = os.path.join(ROOT, "src/assets/images/karkandaki_box.jpg")
+    cache = AssetCache(tmp_path)
+    started = time.perf_counter()
+    first = cache.get(source, (700, 450))
+    decoded = time.perf_counter() - started
+    started = time.perf_counter()
+    again = AssetCache(tmp_path).get(source, (700, 450))
+    cached = time.perf_counter() - started
+    assert first.size == again.size == (700, 450)
+    assert first.tobytes() == again.tobytes()
+    assert cached < decoded
+    assert cache.misses == 1
+    cache.get(source, (350, 225))
+    assert len(list(tmp_path.glob("*.rgb"))) == 2  # osobny wpis na rozdzielczość
+
+
+def test_asset_cache_notices_replaced_image(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    from src.kiosk.assets import AssetCache
+    source = tmp_path / "logo.png"
+    Image.new("RGB", (40, 40), "red").save(source)
+    cache = AssetCache(tmp_path / "cache")
+    assert cache.get(source, (10, 10)).getpixel((5, 5)) == (255, 0, 0)
+    Image.new("RGB", (40, 40), "blue").save(source)
+    os.utime(source, ns=(time.time_ns(), time.time_ns() + 10**9))
+    assert cache.get(source, (10, 10)).getpixel((5, 5)) == (0, 0, 255)
+    assert cache.misses == 2 and len(list((tmp_path / "cache").glob("*.rgb"))) == 1
+
+
+def test_scaled_size_follows_smaller_screens():
+    pytest.importorskip("PIL")
+    from src.kiosk.assets import scaled_size
+    assert scaled_size((700, 450), (1920, 1080)) == (700, 450)
+    assert scaled_size((700, 450), (1280, 720)) == (467, 300)
+    assert scaled_size((700, 450), (3840, 2160)) == (700, 450)
+
+
+def test_ui_queue_runs_thread_updates_on_tick_in_order():
+    root = FakeRoot()
+    ui = UIQueue(root, tick_ms=33)
+    seen = []
+    threads = [threading.Thread(target=lambda n=n: [ui.post(seen.append, (n, i)) for i in range(100)])
+               for n in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ui.post(lambda: 1 / 0)  # błąd jednej zmiany nie zatrzymuje taktu
+    ui.start()
+    assert seen == []  # nic nie dzieje się poza taktem Tk
+    while root.scheduled and len(seen) < 300:
+        root.run_tick()
+    assert len(seen) == 300
+    for n in range(3):
+        assert [i for m, i in seen if m == n] == list(range(100))
+    assert root.scheduled and root.scheduled[0][0] == 33
+
+
+def test_level_meter_only_recolours_changed_bars():
+    canvas = FakeCanvas()
+    level = [0.0]
+    meter = LevelMeter(canvas, lambda: level[0], 0, 0, 320, 24, bars=16, floor=100, ceiling=10000)
+    assert canvas.created == 16
+
+    level[0] = 10000
+    meter.tick()
+    assert meter.lit == 16 and canvas.configs == 16
+    meter.tick()
+    assert canvas.configs == 16  # bez zmiany - bez wywołań Tk
+
+    level[0] = 0.0
+    lit = []
+    for _ in range(30):
+        meter.tick()
+        lit.append(meter.lit)
+    assert lit == sorted(lit, reverse=True) and lit[0] > 0 and lit[-1] == 0  # opada płynnie
+    assert canvas.created == 16
+    assert meter.fraction(1000) == 0.5
@@ -0,0 +1,60 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.stt.vad import VoiceActivityDetector, frame_rms
+
+RATE = 16000
+rng = np.random.default_rng(0)
+
+
+def noise(seconds, level):
+    return (rng.standard_normal(int(RATE * seconds)) * level).astype("<i2")
+
+
+def tone(seconds, level):
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (np.sin(2 * np.pi * 220 * t) * level).astype("<i2")
+
+
+def feed(vad, samples, block=4000):
+    audio, ended = b"", False
+    for i in range(0, len(samples), block):
+        out, end = vad.process(samples[i:i + block].tobytes())
+        audio += out
+        ended = ended or end
+    return audio, ended
+
+
+def test_frame_rms_matches_reference():
+    samples = noise(0.1, 1000)
+    expected = [np.sqrt(np.mean(f.astype(float) ** 2)) for f in samples.reshape(-1, 320)]
+    assert np.allclose(frame_rms(samples, 320), expected, rtol=1e-4)
+
+
+def test_silence_is_not_forwarded():
+    vad = VoiceActivityDetector(min_threshold=300)
+    audio, ended = feed(vad, noise(2, 100))
+    assert audio == b"" and not ended
+
+
+def test_utterance_keeps_onset_and_tail():
+    vad = VoiceActivityDetector(min_threshold=300, attack_frames=3, hangover_frames=10)
+    speech = tone(0.5, 5000)
+    audio, ended = feed(vad, np.concatenate([noise(1, 100), speech, noise(1, 100)]))
+    assert ended and not vad.in_speech
+    forwarded = len(audio) // 2
+    # całe zdanie + 10 ramek "ogona", nic z długiej ciszy przed nim
+    assert len(speech) <= forwarded <= len(speech) + 12 * vad.frame_len
+
+
+def test_noise_floor_follows_louder_hall():
+    vad = VoiceActivityDetector(min_threshold=300)
+    feed(vad, noise(1, 100))
+    quiet = vad.threshold
+    feed(vad, noise(30, 1500))
+    assert vad.threshold > 3 * quiet
+    assert vad.stats()["cpu_us_per_frame"] > 0
@@ -0,0 +1,160 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.bench_wake import floor_audio, run
+from benchmarks.load_stt_server import ServerThread
+from src.audio.devices import VirtualInput
+from src.stt.bargein import EchoReference
+from src.stt.engine import STTEngine
+from src.stt.wake import WakeWordDetector, find_phrase, wake_grammar
+from tests.test_audio_devices import LoudnessRecognizer
+
+RATE = 16000
+BLOCK = 1600  # 100 ms, jak STT_BLOCK_SIZE poza sesją
+PHRASES = ["hej araks", "araks"]
+
+
+def tone(freq, seconds, amplitude=6000):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * RATE), dtype=np.int16)
+
+
+class ToneKeywords:
+    """Keyword recognizer stand-in: an 880 Hz tone reads as "hej araks", any other sound as [unk]."""
+
+    def __init__(self, grammar=None, words=False, conf=0.9):
+        self.conf = conf
+        self.audio = bytearray()
+        self.fed = 0
+
+    def AcceptWaveform(self, data):
+        self.audio += data
+        self.fed += len(data)
+        return False
+
+    def _text(self):
+        samples = np.frombuffer(bytes(self.audio), dtype="<i2")
+        if len(samples) < RATE // 5:
+            return ""
+        peak = np.argmax(np.abs(np.fft.rfft(samples))) * RATE / len(samples)
+        return "hej araks" if abs(peak - 880) < 50 else "[unk]"
+
+    def PartialResult(self):
+        return json.dumps({"partial": self._text()})
+
+    def FinalResult(self):
+        text = self._text()
+        self.audio = bytearray()
+        words = [{"word": w, "conf": self.conf} for w in text.split()]
+        return json.dumps({"text": text, "result": words})
+
+    def Result(self):
+        return self.FinalResult()
+
+    def Reset(self):
+        self.audio = bytearray()
+
+
+def feed(detector, audio, t0=100.0):
+    """Blocks of 100 ms on a synthetic clock; seconds into audio of the first wake, or None."""
+    data = np.asarray(audio, dtype="<i2").tobytes()
+    for i in range(0, len(data), BLOCK * 2):
+        end = (i + BLOCK * 2) / (RATE * 2)
+        if detector.process(data[i:i + BLOCK * 2], t0 + end):
+            return end
+    return None
+
+
+def test_phrase_matching_and_grammar():
+    assert find_phrase("hej araks [unk]", PHRASES) == "hej araks"
+    assert find_phrase("[unk] araks", PHRASES) == "araks"
+    assert find_phrase("karaksy", PHRASES) is None
+    assert json.loads(wake_grammar(PHRASES)) == ["hej araks", "araks", "[unk]"]
+
+
+def test_wake_phrase_fires_before_the_speaker_stops():
+    recognizer = ToneKeywords()
+    detector = WakeWordDetector(recognizer, PHRASES)
+    fired = feed(detector, np.concatenate([silence(0.5), tone(880, 1.0), silence(1.0)]))
+    assert fired is not None and fired < 1.5  # z wyniku częściowego, jeszcze w trakcie frazy
+    assert detector.stats()["wakes"] == 1
+
+
+def test_other_talk_is_decoded_only_up_to_the_cap():
+    recognizer = ToneKeywords()
+    detector = WakeWordDetector(recognizer, PHRASES, max_speech_s=1.0)
+    assert feed(detector, np.concatenate([silence(0.5), tone(440, 4.0), silence(1.0)])) is None
+    assert recognizer.fed <= 1.0 * RATE * 2
+    stats = detector.stats()
+    assert stats["wakes"] == 0 and stats["rejected"] == 1
+    assert stats["decoded_share"] < 0.25  # z 5.5 s dźwięku do rozpoznawania trafiła ~1 s
+
+
+def test_final_result_needs_confident_words():
+    unsure = WakeWordDetector(ToneKeywords(conf=0.4), PHRASES, stable_polls=100)
+    assert feed(unsure, np.concatenate([silence(0.5), tone(880, 0.8), silence(1.0)])) is None
+    sure = WakeWordDetector(ToneKeywords(conf=0.9), PHRASES, stable_polls=100)
+    assert feed(sure, np.concatenate([silence(0.5), tone(880, 0.8), silence(1.0)])) > 1.3  # po pauzie VAD
+
+
+def test_kiosk_voice_is_not_decoded():
+    echo = EchoReference()
+    echo.played(100.0, 103.0)  # promo gra przez 3 s
+    recognizer = ToneKeywords()
+    detector = WakeWordDetector(recognizer, PHRASES, echo=echo)
+    assert feed(detector, np.concatenate([silence(0.5), tone(880, 1.0), silence(1.0)])) is None
+    assert recognizer.fed == 0
+
+
+def test_cpu_governor_raises_the_gate_over_budget_and_lowers_it_back():
+    detector = WakeWordDetector(ToneKeywords(), PHRASES, cpu_budget=0.0, window_s=0.5)
+    run(detector, floor_audio(3.0, [tone(440, 1.0)], noise=60, every_s=1.0))
+    over = detector.stats()
+    assert over["gate"] > 1.0 and over["window_cpu_pct"] > 0
+    assert detector.vad.min_threshold > detector.base_threshold
+    detector.cpu_budget = 1e6
+    run(detector, floor_audio(5.0, [], noise=60))
+    assert detector.gate == 1.0 and detector.vad.min_threshold == detector.base_threshold
+
+
+def test_hall_noise_costs_almost_nothing():
+    recognizer = ToneKeywords()
+    detector = WakeWordDetector(recognizer, PHRASES)
+    stats = run(detector, floor_audio(20.0, [], noise=60))
+    assert recognizer.fed == 0 and stats["decoded_share"] == 0.0
+    assert stats["cpu_pct"] < 5.0 and stats["audio_s"] == 20.0
+
+
+def keywords_or_loudness(grammar=None, words=False):
+    return ToneKeywords() if grammar and "araks" in grammar else LoudnessRecognizer()
+
+
+def test_engine_hands_off_to_the_dialog_recognizer():
+    mic = VirtualInput(noise=30)
+    woken = threading.Event()
+    with ServerThread(keywords_or_loudness, pool_size=3, workers=1) as server:
+        stt = STTEngine(server=server.path, audio_input=mic)
+        try:
+            stt.on_wake = woken.set
+            stt.arm_wake(WakeWordDetector(stt.keyword_recognizer(PHRASES), PHRASES))
+            time.sleep(0.5)  # podłoga szumu VAD
+            mic.say(tone(880, 1.0))
+            assert woken.wait(3)
+            stt.start_listening()  # pre-roll bez samej frazy
+            mic.say(np.concatenate([tone(440, 0.8), silence(1.0)]))
+            assert stt.get_text(timeout=5).startswith("menu")
+            stt.stop_listening()
+            assert stt.wake.stats()["wakes"] == 1
+        finally:
+            stt.close()